@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Cancel-to-ready latency: how soon a client can run its next turn after cancelling one.
+
+Each iteration starts a turn against ``scripts/soak_agent.py``, lets it run for
+a moment, cancels it and immediately sends a short follow-up prompt. Two ways of
+cancelling are compared:
+
+- interrupt: ``interrupt()``, then draining the rest of the cancelled turn
+  through ``receive_messages()``, as callers had to before ``cancel()``
+- cancel: ``cancel()``, which fences the turn's messages, kills its terminals and
+  returns once the agent has acknowledged
+
+Two kinds of turn are cancelled: ``stream`` keeps the agent streaming chunks, and
+``terminal`` keeps it waiting on a ``sleep`` in a terminal. For each method and
+kind, the benchmark reports how long the cancel call itself took ("cancel") and
+how long until the follow-up turn's first message arrived ("ready").
+
+Usage: python scripts/bench_cancel.py [--iterations 20] [--sleep 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from simple_acp_client import PyACPAgentOptions, PyACPSDKClient
+
+AGENT = Path(__file__).with_name("soak_agent.py")
+
+
+async def first_message(client: PyACPSDKClient) -> None:
+    """Wait for the next turn's first message, then drain the rest of it."""
+    messages = client.receive_messages()
+    await anext(messages)
+    async for _ in messages:
+        pass
+
+
+async def cancel_once(client: PyACPSDKClient, method: str, prompt: str) -> tuple[float, float]:
+    await client.query(prompt)
+    # Let the turn get going: chunks streaming, or the terminal command running
+    await asyncio.sleep(0.2)
+    start = time.perf_counter()
+    if method == "cancel":
+        await client.cancel()
+    else:
+        await client.interrupt()
+        async for _ in client.receive_messages():
+            pass
+    cancelled = time.perf_counter()
+    await client.query("chunks=1")
+    await first_message(client)
+    # The follow-up's first message is its thought chunk, so draining adds little
+    return cancelled - start, time.perf_counter() - start
+
+
+def summary(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return f"{statistics.median(ordered) * 1000:>9.1f} {p95 * 1000:>9.1f}"
+
+
+async def bench(args: argparse.Namespace) -> None:
+    kinds = {"stream": "stream please", "terminal": f"wait sleep={args.sleep}"}
+    print(f"{'method':<10} {'turn':<9} {'cancel p50':>10} {'p95':>9} {'ready p50':>10} {'p95':>9}   (ms)")
+    with tempfile.TemporaryDirectory(prefix="acp-bench-cancel-") as workdir:
+        for method in ("interrupt", "cancel"):
+            for kind, prompt in kinds.items():
+                client = PyACPSDKClient(PyACPAgentOptions(cwd=workdir, interrupt_grace=args.sleep * 2))
+                await client.connect([sys.executable, str(AGENT)])
+                cancels, readies = [], []
+                try:
+                    for _ in range(args.iterations):
+                        cancel, ready = await cancel_once(client, method, prompt)
+                        cancels.append(cancel)
+                        readies.append(ready)
+                finally:
+                    await client.disconnect()
+                print(f"{method:<10} {kind:<9} {summary(cancels):>20} {summary(readies):>20}", flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=20, help="cancellations per method and turn kind")
+    parser.add_argument("--sleep", type=float, default=2.0, help="seconds the terminal command of a terminal turn runs")
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Memory and allocation benchmark for message objects in a 100k-message turn.
+
+Compares the slotted, integer-timestamped blocks in ``simple_acp_client.core``
+against the previous layout: plain dataclasses that formatted an ISO timestamp
+at construction and were re-stamped by ``receive_messages()``.
+
+Usage: python scripts/bench_messages.py [NUM_MESSAGES]
+"""
+
+from __future__ import annotations
+
+import gc
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from simple_acp_client.core import TextBlock
+
+
+def _legacy_timestamp() -> str:
+    return datetime.now().isoformat()
+
+
+@dataclass
+class LegacyTextBlock:
+    text: str
+    timestamp: str = field(default_factory=_legacy_timestamp)
+
+
+def build_legacy(texts: list[str]) -> list[LegacyTextBlock]:
+    messages = []
+    for text in texts:
+        message = LegacyTextBlock(text=text)
+        # receive_messages() used to overwrite the timestamp on delivery
+        setattr(message, "timestamp", datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3])
+        messages.append(message)
+    return messages
+
+
+def build_slotted(texts: list[str]) -> list[TextBlock]:
+    return [TextBlock(text=text) for text in texts]
+
+
+def measure(name: str, build, texts: list[str]) -> None:
+    # Time without tracing first, tracemalloc slows allocation down considerably
+    gc.collect()
+    start = time.perf_counter()
+    build(texts)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    messages = build(texts)
+    after = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    allocated_blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    print(
+        f"{name:<10} messages={len(messages):>7} "
+        f"retained={current / 1024 / 1024:7.2f} MiB "
+        f"peak={peak / 1024 / 1024:7.2f} MiB "
+        f"live_blocks={allocated_blocks:>8} "
+        f"bytes/msg={current / len(messages):7.1f} "
+        f"build={elapsed * 1000:8.1f} ms"
+    )
+    del messages
+
+
+def main(argv: list[str]) -> int:
+    count = int(argv[1]) if len(argv) > 1 else 100_000
+    # Texts are shared by both runs so only the message overhead is measured
+    texts = [f"chunk {i}" for i in range(count)]
+    measure("legacy", build_legacy, texts)
+    measure("slotted", build_slotted, texts)
+
+    messages = build_slotted(texts)
+    start = time.perf_counter()
+    for message in messages[:1000]:
+        message.timestamp
+    print(f"formatting 1000 timestamps on read: {(time.perf_counter() - start) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Soak test: thousands of client lifecycles against a local stand-in agent.
+
+Each cycle connects a fresh ``PyACPSDKClient`` to ``scripts/soak_agent.py``,
+runs a turn with a terminal command and one with a file write, and
+disconnects. A resident client stays connected for the whole run and serves a
+turn per sample, so its internal queues are watched too. Every ``--sample-every``
+cycles the harness records:
+
+- rss: resident set size of this process (MiB)
+- fds: open file descriptors
+- tasks: live asyncio tasks
+- children: child processes still around (zombies included)
+- objects: objects tracked by the garbage collector
+- backlog: items held in the resident client's queues, tool call index and terminals
+- latency: median turn latency since the previous sample (ms)
+
+After the warm-up, the median of the first quarter of samples is compared with
+the median of the last quarter. The run fails (exit status 1) if any metric grew
+by more than its threshold. A ``LoopMonitor`` watches the event loop throughout;
+its lag percentiles and the code behind the worst stalls are reported at the end.
+
+Usage: python scripts/soak.py [--cycles 2000] [--concurrency 4] [--json samples.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from simple_acp_client import LoopMonitor, PyACPAgentOptions, PyACPSDKClient
+
+AGENT = Path(__file__).with_name("soak_agent.py")
+
+
+@dataclass
+class Sample:
+    cycle: int
+    elapsed: float
+    rss: float
+    fds: int
+    tasks: int
+    children: int
+    objects: int
+    backlog: int
+    latency: float
+
+
+def rss_mib() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+
+        # Peak rather than current RSS, but still catches steady growth
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def open_fds() -> int:
+    for directory in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(directory))
+        except OSError:
+            continue
+    return -1
+
+
+def child_processes() -> int:
+    pid = str(os.getpid())
+    count = 0
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return -1
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # The command name may contain spaces; the fields after its closing paren don't
+                fields = stat.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if fields[1] == pid:
+            count += 1
+    return count
+
+
+def backlog(client: PyACPSDKClient) -> int:
+    """Items a long-lived client is still holding on to between turns."""
+    stats = client.stats()
+    return (
+        stats.queued_messages
+        + stats.pending_turns
+        + stats.undelivered_turns
+        + stats.terminals
+        + stats.tool_calls
+        + stats.inbound_frames
+        + stats.pending_requests
+        + stats.pending_callbacks
+    )
+
+
+async def run_turn(client: PyACPSDKClient, prompt: str, latencies: list[float]) -> None:
+    start = time.perf_counter()
+    await client.query(prompt)
+    async for message in client.receive_messages():
+        if getattr(message, "is_error", False):
+            raise RuntimeError(f"Turn failed: {message.result}")
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def cycle(options: PyACPAgentOptions, latencies: list[float]) -> None:
+    client = PyACPSDKClient(options)
+    await client.connect([sys.executable, str(AGENT)])
+    try:
+        await run_turn(client, "run the terminal please", latencies)
+        await run_turn(client, "write chunks=16", latencies)
+    finally:
+        await client.disconnect()
+
+
+def take_sample(index: int, started: float, resident: PyACPSDKClient, latencies: list[float], kept: int) -> Sample:
+    """Measure the process now; ``kept`` is the number of earlier samples, which are not counted as objects."""
+    gc.collect()
+    return Sample(
+        cycle=index,
+        elapsed=time.monotonic() - started,
+        rss=round(rss_mib(), 2),
+        fds=open_fds(),
+        tasks=len(asyncio.all_tasks()),
+        children=child_processes(),
+        objects=len(gc.get_objects()) - kept,
+        backlog=backlog(resident),
+        latency=round(statistics.median(latencies), 2) if latencies else 0.0,
+    )
+
+
+def trends(samples: list[Sample]) -> dict[str, tuple[float, float]]:
+    """(first-quarter median, last-quarter median) per metric."""
+    window = max(1, len(samples) // 4)
+    result = {}
+    for name in ("rss", "fds", "tasks", "children", "objects", "backlog", "latency"):
+        values = [getattr(sample, name) for sample in samples]
+        result[name] = (statistics.median(values[:window]), statistics.median(values[-window:]))
+    return result
+
+
+async def soak(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory(prefix="acp-soak-") as workdir:
+        return await soak_in(Path(workdir), args)
+
+
+async def soak_in(workdir: Path, args: argparse.Namespace) -> int:
+    options = PyACPAgentOptions(cwd=workdir)
+    resident = PyACPSDKClient(PyACPAgentOptions(cwd=workdir))
+    await resident.connect([sys.executable, str(AGENT)])
+    monitor = LoopMonitor(threshold=args.lag_threshold / 1000)
+    monitor.start()
+
+    samples: list[Sample] = []
+    latencies: list[float] = []
+    started = time.monotonic()
+    completed = 0
+
+    print(f"{'cycle':>7} {'secs':>7} {'rss MiB':>8} {'fds':>5} {'tasks':>5} {'kids':>4} {'objects':>8} {'backlog':>7} {'p50 ms':>7}")
+    try:
+        while completed < args.cycles:
+            batch = iter(range(min(args.sample_every, args.cycles - completed)))
+
+            async def worker() -> None:
+                # Workers share the batch iterator, so at most `concurrency` cycles overlap
+                for _ in batch:
+                    await cycle(options, latencies)
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            completed = min(args.cycles, completed + args.sample_every)
+            await run_turn(resident, "chunks=8", latencies)
+            sample = take_sample(completed, started, resident, latencies, len(samples))
+            latencies.clear()
+            samples.append(sample)
+            print(
+                f"{sample.cycle:>7} {sample.elapsed:>7.1f} {sample.rss:>8.1f} {sample.fds:>5} {sample.tasks:>5}"
+                f" {sample.children:>4} {sample.objects:>8} {sample.backlog:>7} {sample.latency:>7.1f}",
+                flush=True,
+            )
+    finally:
+        monitor.stop()
+        await resident.disconnect()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps([asdict(sample) for sample in samples], indent=1))
+
+    measured = [sample for sample in samples if sample.cycle > args.warmup]
+    if len(measured) < 4:
+        print("Not enough samples after the warm-up to judge trends; raise --cycles or lower --sample-every")
+        return 1
+    limits = {
+        "rss": args.max_rss_growth,
+        "fds": args.max_fd_growth,
+        "tasks": args.max_task_growth,
+        "children": args.max_child_growth,
+        "objects": args.max_object_growth,
+        "backlog": args.max_backlog_growth,
+    }
+    failed = False
+    print()
+    for name, (first, last) in trends(measured).items():
+        growth = last - first
+        if name == "latency":
+            drift = (last / first - 1) * 100 if first else 0.0
+            bad = drift > args.max_latency_drift
+            print(f"{name:>8}: {first:.1f} -> {last:.1f} ms ({drift:+.0f}%, limit +{args.max_latency_drift:g}%)", "FAIL" if bad else "ok")
+        else:
+            bad = growth > limits[name]
+            print(f"{name:>8}: {first:g} -> {last:g} ({growth:+g}, limit +{limits[name]:g})", "FAIL" if bad else "ok")
+        failed = failed or bad
+
+    lag = monitor.stats()
+    print(
+        f"\nloop lag: p50 {lag.p50 * 1000:.1f} ms, p99 {lag.p99 * 1000:.1f} ms, max {lag.max * 1000:.1f} ms,"
+        f" {lag.stalls} stalls over {args.lag_threshold:g} ms"
+    )
+    for where, stalls, total in lag.hot_spots[:5]:
+        print(f"  {total * 1000:8.1f} ms in {stalls:>4} stalls: {where}")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cycles", type=int, default=2000, help="connect/query/disconnect cycles to run")
+    parser.add_argument("--concurrency", type=int, default=4, help="cycles running at once")
+    parser.add_argument("--sample-every", type=int, default=50, help="cycles between samples")
+    parser.add_argument("--warmup", type=int, default=200, help="cycles ignored when judging trends")
+    parser.add_argument("--max-rss-growth", type=float, default=32.0, help="MiB")
+    parser.add_argument("--max-fd-growth", type=float, default=4)
+    parser.add_argument("--max-task-growth", type=float, default=2)
+    parser.add_argument("--max-child-growth", type=float, default=1)
+    parser.add_argument("--max-object-growth", type=float, default=5000)
+    parser.add_argument("--max-backlog-growth", type=float, default=0)
+    parser.add_argument("--max-latency-drift", type=float, default=50.0, help="percent")
+    parser.add_argument("--json", help="write every sample to this file")
+    parser.add_argument("--lag-threshold", type=float, default=20.0, help="ms of event-loop lag reported as a stall")
+    return asyncio.run(soak(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Stand-in ACP agent for the soak harness.
+
+Answers every prompt without a model, but exercises the same client paths a
+real agent does: streamed message and thought chunks, a tool call with a
+permission request, and, depending on the prompt:
+
+- ``terminal``: runs a short shell command through ``terminal/create``, waits
+  for it, reads its output and releases it
+- ``write``: writes a file in the session cwd through ``fs/write_text_file``
+- ``chunks=N``: streams N message chunks instead of 4
+- ``stream``: keeps streaming chunks every few milliseconds until cancelled
+- ``sleep=S``: runs ``sleep S`` in a terminal and waits for it to exit
+
+A ``session/cancel`` makes the turn answer ``cancelled`` as soon as it notices.
+
+Usage: python scripts/soak_agent.py   (spoken to over stdio by the client)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import uuid
+
+from acp import (
+    PROTOCOL_VERSION,
+    AgentSideConnection,
+    session_notification,
+    start_tool_call,
+    stdio_streams,
+    update_agent_message_text,
+    update_agent_thought_text,
+    update_tool_call,
+)
+from acp.schema import (
+    AgentCapabilities,
+    CreateTerminalRequest,
+    InitializeResponse,
+    NewSessionResponse,
+    PermissionOption,
+    PromptResponse,
+    RequestPermissionRequest,
+    ToolCall,
+    WriteTextFileRequest,
+)
+
+
+class SoakAgent:
+    def __init__(self, conn: AgentSideConnection) -> None:
+        self.conn = conn
+        self.cwd = os.getcwd()
+        self.turns = 0
+        self.cancelled = False
+
+    async def initialize(self, params):
+        return InitializeResponse(protocolVersion=PROTOCOL_VERSION, agentCapabilities=AgentCapabilities())
+
+    async def newSession(self, params):
+        self.cwd = params.cwd
+        return NewSessionResponse(sessionId=f"soak-{uuid.uuid4().hex[:8]}")
+
+    async def loadSession(self, params):
+        return None
+
+    async def authenticate(self, params):
+        return None
+
+    async def setSessionMode(self, params):
+        return None
+
+    async def setSessionModel(self, params):
+        return None
+
+    async def cancel(self, params):
+        self.cancelled = True
+
+    async def extMethod(self, method, params):
+        return {}
+
+    async def extNotification(self, method, params):
+        return None
+
+    async def prompt(self, params):
+        session_id = params.sessionId
+        text = "".join(getattr(block, "text", "") or "" for block in params.prompt)
+        self.turns += 1
+        self.cancelled = False
+
+        async def send(update):
+            await self.conn.sessionUpdate(session_notification(session_id, update))
+
+        await send(update_agent_thought_text("planning"))
+        match = re.search(r"chunks=(\d+)", text)
+        for index in range(int(match.group(1)) if match else 4):
+            await send(update_agent_message_text(f"chunk {index} "))
+
+        tool_call_id = f"call-{self.turns}"
+        await send(start_tool_call(tool_call_id, "Run checks", kind="execute", status="pending"))
+        await self.conn.requestPermission(
+            RequestPermissionRequest(
+                sessionId=session_id,
+                options=[
+                    PermissionOption(optionId="allow", name="Allow", kind="allow_once"),
+                    PermissionOption(optionId="reject", name="Reject", kind="reject_once"),
+                ],
+                toolCall=ToolCall(toolCallId=tool_call_id, title="Run checks", kind="execute"),
+            )
+        )
+        await send(update_tool_call(tool_call_id, status="in_progress"))
+        output = ""
+        if "stream" in text:
+            for index in range(20000):
+                if self.cancelled:
+                    return PromptResponse(stopReason="cancelled")
+                await send(update_agent_message_text(f"tick {index} "))
+                await asyncio.sleep(0.002)
+        match = re.search(r"sleep=([\d.]+)", text)
+        if match:
+            terminal = await self.conn.createTerminal(
+                CreateTerminalRequest(sessionId=session_id, command="sleep", args=[match.group(1)], cwd=self.cwd)
+            )
+            await terminal.wait_for_exit()
+            await terminal.release()
+            if self.cancelled:
+                return PromptResponse(stopReason="cancelled")
+        if "terminal" in text:
+            terminal = await self.conn.createTerminal(
+                # The client runs the command through /bin/sh and joins args unquoted, so pass one string
+                CreateTerminalRequest(sessionId=session_id, command="echo soak; echo err >&2", cwd=self.cwd)
+            )
+            await terminal.wait_for_exit()
+            output = (await terminal.current_output()).output
+            await terminal.release()
+        if "write" in text:
+            await self.conn.writeTextFile(
+                WriteTextFileRequest(
+                    sessionId=session_id, path=os.path.join(self.cwd, "soak-output.txt"), content=f"turn {self.turns}\n"
+                )
+            )
+        await send(update_tool_call(tool_call_id, status="completed", raw_output={"stdout": output}))
+        await send(update_agent_message_text("done"))
+        return PromptResponse(stopReason="end_turn")
+
+
+async def main() -> None:
+    reader, writer = await stdio_streams()
+    AgentSideConnection(lambda conn: SoakAgent(conn), writer, reader)
+    # Exit once the client closes stdin, as real agents do
+    while not reader.at_eof():
+        await asyncio.sleep(0.05)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,11 +5,26 @@ A high-level, async-friendly interface for interacting with ACP-compatible agent
 """
 
 from simple_acp_client.sdk.client import PyACPSDKClient, PyACPAgentOptions
+from simple_acp_client.sync import SyncPyACPSDKClient
+from simple_acp_client.supervisor import AgentSupervisor, RemoteClient
+from simple_acp_client.fanout import BackendResult, FanOut, FanOutResult
+from simple_acp_client.admission import AdmissionController, set_default_admission
+from simple_acp_client.pool import PrimingError, SessionPool, SessionTemplate
+from simple_acp_client.sdk.attachments import FileAttachment, file_attachment
+from simple_acp_client.sdk.broadcast import BroadcastHub, SubscriberLagged, Subscription
+from simple_acp_client.sdk.turns import AgentExitedError, Turn, TurnTimeoutError
+from simple_acp_client.capabilities.permissions import PermissionPolicy, PermissionRule
+from simple_acp_client.transcript import TranscriptStore
+from simple_acp_client.cache import TurnCache
+from simple_acp_client.introspection import ClientStats, ProcessStats, RuntimeStats, stats
+from simple_acp_client.monitor import LagEvent, LagStats, LoopMonitor
+from simple_acp_client.workspace import WorkspaceChanges, WorkspaceProvisioner
 from simple_acp_client.core import (
     TextBlock,
     ThinkingBlock,
     ToolUseBlock,
     ToolResultBlock,
+    ResourceBlock,
     OtherUpdate,
     UserMessage,
     AssistantMessage,
@@ -26,11 +41,48 @@ __all__ = [
     # Client
     "PyACPSDKClient",
     "PyACPAgentOptions",
+    "SyncPyACPSDKClient",
+    "AgentSupervisor",
+    "RemoteClient",
+    "FanOut",
+    "FanOutResult",
+    "BackendResult",
+    "AdmissionController",
+    "SessionPool",
+    "SessionTemplate",
+    "PrimingError",
+    "set_default_admission",
+    "stats",
+    "ClientStats",
+    "ProcessStats",
+    "RuntimeStats",
+    "LoopMonitor",
+    "LagEvent",
+    "LagStats",
+    "Turn",
+    "TurnTimeoutError",
+    "AgentExitedError",
+    # Broadcast
+    "BroadcastHub",
+    "Subscription",
+    "SubscriberLagged",
+    # Permissions
+    "PermissionPolicy",
+    "PermissionRule",
+    # Transcripts, caching and workspaces
+    "TranscriptStore",
+    "TurnCache",
+    "WorkspaceChanges",
+    "WorkspaceProvisioner",
+    # Prompt attachments
+    "FileAttachment",
+    "file_attachment",
     # Message types
     "TextBlock",
     "ThinkingBlock",
     "ToolUseBlock",
     "ToolResultBlock",
+    "ResourceBlock",
     "OtherUpdate",
     "UserMessage",
     "AssistantMessage",
@@ -0,0 +1,239 @@
+"""
+Process-wide admission control for agent turns.
+
+An ``AdmissionController`` caps how many turns run at once across every client that
+shares it. Queued turns are admitted by priority class first: a lower number wins,
+and ``INTERACTIVE`` goes ahead of ``BATCH``. Within a class, tenants share capacity
+through weighted fair queuing (start-time fair queuing on a per-class virtual clock).
+A tenant with a burst of turns can't starve the others, and a tenant with weight 2
+gets about twice the turns of one with weight 1 while both are backlogged.
+
+``class_limits`` caps how many slots a class may hold, so that low-priority work
+only fills spare capacity and some slots stay free for interactive turns.
+
+The controller is thread-safe and can be shared by clients running on different
+event loops, such as several ``SyncPyACPSDKClient``s. Clients use it through
+``PyACPAgentOptions.admission``, or the process default set with
+``set_default_admission()``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+INTERACTIVE = 0
+DEFAULT = 1
+BATCH = 2
+
+
+@dataclass(eq=False)
+class _Waiter:
+    tenant: str
+    priority: int
+    start_tag: float
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    granted: bool = False
+    abandoned: bool = False
+
+
+@dataclass(slots=True)
+class ClassMetrics:
+    """Counters and recent queue times (seconds) of one priority class."""
+
+    priority: int
+    in_flight: int
+    queued: int
+    admitted: int
+    wait_p50: float
+    wait_p99: float
+    wait_max: float
+
+
+@dataclass(slots=True)
+class AdmissionMetrics:
+    max_concurrent: int
+    in_flight: int
+    queued: int
+    classes: dict[int, ClassMetrics]
+    queued_by_tenant: dict[str, int]
+
+
+class Admission:
+    """A granted slot; release it when the turn is over (or use it as a context manager)."""
+
+    def __init__(self, controller: AdmissionController, priority: int, waited: float) -> None:
+        self.controller = controller
+        self.priority = priority
+        self.waited = waited  # Seconds spent queued
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.controller._release(self.priority)
+
+    def __enter__(self) -> Admission:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.release()
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AdmissionController:
+    """
+    Concurrency cap with priority classes and weighted-fair queuing per tenant.
+
+    Args:
+        max_concurrent: Turns allowed to run at once
+        class_limits: Optional per-class caps, e.g. ``{BATCH: 6}`` keeps two of eight
+            slots for higher classes
+        weights: Tenant -> share weight (default 1.0)
+        history: Recent queue times kept per class for the wait percentiles
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        *,
+        class_limits: Mapping[int, int] | None = None,
+        weights: Mapping[str, float] | None = None,
+        history: int = 1024,
+    ) -> None:
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.class_limits = dict(class_limits or {})
+        self.weights = dict(weights or {})
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        # Per class: heap of (start tag, arrival order, waiter)
+        self._queues: dict[int, list[tuple[float, int, _Waiter]]] = {}
+        self._virtual_time: dict[int, float] = {}
+        self._last_finish: dict[tuple[int, str], float] = {}
+        self._in_flight: dict[int, int] = {}
+        self._queued: dict[int, int] = {}
+        self._queued_by_tenant: dict[str, int] = {}
+        self._admitted: dict[int, int] = {}
+        self._waits: dict[int, deque[float]] = {}
+        self._history = history
+
+    async def acquire(self, tenant: str = "default", priority: int = DEFAULT) -> Admission:
+        """Wait for a slot. Cancelling the wait gives up the place in the queue."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            weight = self.weights.get(tenant, 1.0)
+            start = max(self._virtual_time.get(priority, 0.0), self._last_finish.get((priority, tenant), 0.0))
+            self._last_finish[(priority, tenant)] = start + 1.0 / weight
+            waiter = _Waiter(tenant, priority, start, loop, loop.create_future())
+            heapq.heappush(self._queues.setdefault(priority, []), (start, next(self._seq), waiter))
+            self._queued[priority] = self._queued.get(priority, 0) + 1
+            self._queued_by_tenant[tenant] = self._queued_by_tenant.get(tenant, 0) + 1
+            self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self._in_flight[priority] -= 1
+                    self._dispatch()
+                else:
+                    waiter.abandoned = True
+                    self._dequeued(waiter)
+            raise
+        return Admission(self, priority, time.monotonic() - waiter.enqueued_at)
+
+    def metrics(self) -> AdmissionMetrics:
+        with self._lock:
+            classes = {}
+            for priority in sorted(set(self._queued) | set(self._in_flight) | set(self._admitted)):
+                waits = sorted(self._waits.get(priority, ()))
+                classes[priority] = ClassMetrics(
+                    priority=priority,
+                    in_flight=self._in_flight.get(priority, 0),
+                    queued=self._queued.get(priority, 0),
+                    admitted=self._admitted.get(priority, 0),
+                    wait_p50=_percentile(waits, 0.50),
+                    wait_p99=_percentile(waits, 0.99),
+                    wait_max=waits[-1] if waits else 0.0,
+                )
+            return AdmissionMetrics(
+                max_concurrent=self.max_concurrent,
+                in_flight=sum(self._in_flight.values()),
+                queued=sum(self._queued.values()),
+                classes=classes,
+                queued_by_tenant={tenant: n for tenant, n in self._queued_by_tenant.items() if n},
+            )
+
+    def _release(self, priority: int) -> None:
+        with self._lock:
+            self._in_flight[priority] -= 1
+            self._dispatch()
+
+    def _dequeued(self, waiter: _Waiter) -> None:
+        self._queued[waiter.priority] -= 1
+        self._queued_by_tenant[waiter.tenant] -= 1
+
+    def _dispatch(self) -> None:
+        """Grant free slots to queued waiters. Called with the lock held."""
+        while sum(self._in_flight.values()) < self.max_concurrent:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self._dequeued(waiter)
+            priority = waiter.priority
+            self._virtual_time[priority] = waiter.start_tag
+            self._in_flight[priority] = self._in_flight.get(priority, 0) + 1
+            self._admitted[priority] = self._admitted.get(priority, 0) + 1
+            self._waits.setdefault(priority, deque(maxlen=self._history)).append(
+                time.monotonic() - waiter.enqueued_at
+            )
+            waiter.granted = True
+            if waiter.loop.is_closed():
+                self._in_flight[priority] -= 1
+                continue
+            waiter.loop.call_soon_threadsafe(_grant, waiter.future)
+
+    def _next_waiter(self) -> _Waiter | None:
+        for priority in sorted(self._queues):
+            limit = self.class_limits.get(priority)
+            if limit is not None and self._in_flight.get(priority, 0) >= limit:
+                continue
+            queue = self._queues[priority]
+            while queue and queue[0][2].abandoned:
+                heapq.heappop(queue)
+            if queue:
+                return heapq.heappop(queue)[2]
+        return None
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_default: AdmissionController | None = None
+
+
+def set_default_admission(controller: AdmissionController | None) -> None:
+    """Make ``controller`` gate the turns of every client without its own ``admission`` option."""
+    global _default
+    _default = controller
+
+
+def get_default_admission() -> AdmissionController | None:
+    return _default
@@ -0,0 +1,330 @@
+"""
+On-disk cache of whole agent turns.
+
+CI jobs and eval reruns often send the same prompt to the same agent, on the same
+tree, again and again. ``TurnCache`` keys a turn by:
+
+- the agent command and model
+- the message delivery options
+- the prompt blocks
+- the conversation before the turn (the keys of the session's earlier turns)
+- a content hash of the workspace, or a caller-supplied key instead
+
+On a hit, the client replays the stored messages and the workspace files the turn
+wrote, and the agent is not asked at all.
+
+Entries are pickled to one file each under ``directory``. When the total size
+exceeds ``max_bytes``, the least recently used entries are evicted; a hit counts as
+a use. Only cache directories you trust: loading an entry unpickles it.
+"""
+
+from __future__ import annotations
+
+import errno
+import hashlib
+import json
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+import zlib
+from collections.abc import Collection, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from simple_acp_client.core import _jsonable
+from simple_acp_client.workspace.watcher import DEFAULT_IGNORE
+
+_FORMAT = 1
+_SUFFIX = ".turn"
+_READ_CHUNK = 1 << 20
+# Files modified this recently are re-hashed even if their stat is unchanged, since
+# a write within the same mtime tick would not show up in it
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+@dataclass(slots=True)
+class CachedTurn:
+    """
+    A stored turn.
+
+    ``files`` maps workspace-relative paths to the content the turn left them with,
+    or to None for files it deleted.
+    """
+
+    stop_reason: str
+    messages: list[Any]
+    files: dict[str, bytes | None] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+
+
+class TurnCache:
+    """
+    Size-bounded, LRU-evicted store of finished turns, shared by any number of clients.
+
+    Args:
+        directory: Where entries are kept; created if missing
+        max_bytes: Total size of the stored entries before the least recently used are evicted
+        ignore: Directory names left out of the workspace hash
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        max_bytes: int = 512 << 20,
+        *,
+        ignore: Collection[str] = DEFAULT_IGNORE,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ignore = frozenset(ignore)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(size for _, size, _ in self._entries())
+        # Absolute path -> (size, mtime_ns, inode, digest), so unchanged files are not re-read
+        self._digests: dict[str, tuple[int, int, int, bytes]] = {}
+
+    @property
+    def size(self) -> int:
+        """Bytes taken by stored entries."""
+        return self._size
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.directory.glob(f"*{_SUFFIX}"))
+
+    def key(
+        self,
+        *,
+        agent_command: Iterable[str],
+        prompt: Iterable[Any],
+        model: str | None = None,
+        workspace: str = "",
+        previous: str = "",
+        delivery: Any = None,
+    ) -> str:
+        """
+        The cache key of a turn.
+
+        Args:
+            agent_command: Program and arguments of the agent
+            prompt: The turn's ACP prompt blocks
+            model: Model the session was set to
+            workspace: ``workspace_digest()`` of the session cwd, or a caller-supplied key
+            previous: Key of the session's previous turn ("" for the first)
+            delivery: Client options that change which messages a turn produces
+        """
+        material = {
+            "format": _FORMAT,
+            "agent": list(agent_command),
+            "model": model,
+            "delivery": _jsonable(delivery),
+            "previous": previous,
+            "workspace": workspace,
+            "prompt": [_jsonable(block) for block in prompt],
+        }
+        encoded = json.dumps(material, sort_keys=True, separators=(",", ":")).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def workspace_digest(self, root: str | Path) -> str:
+        """
+        Hash of every file path and file content under ``root``.
+
+        Content hashes are remembered by path, size, mtime and inode, so hashing a tree
+        again only reads the files that changed since the last call.
+        """
+        root = Path(root)
+        digest = hashlib.blake2b(digest_size=32)
+        seen: set[str] = set()
+        for relative, entry in sorted(self._walk(root, "")):
+            digest.update(relative.encode("utf-8", "surrogateescape") + b"\0")
+            if stat.S_ISLNK(entry.st_mode):
+                digest.update(b"L" + os.readlink(root / relative).encode("utf-8", "surrogateescape"))
+            else:
+                path = str(root / relative)
+                seen.add(path)
+                digest.update(b"F" + self._file_digest(path, entry))
+            digest.update(b"\0")
+        prefix = os.path.join(root, "")
+        with self._lock:
+            for path in [path for path in self._digests if path.startswith(prefix) and path not in seen]:
+                del self._digests[path]
+        return digest.hexdigest()
+
+    def get(self, key: str) -> CachedTurn | None:
+        """The stored turn for ``key``, or None. A hit marks the entry as recently used."""
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            entry = pickle.loads(zlib.decompress(data))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # Truncated or written by an incompatible version
+            self._remove(path)
+            self.misses += 1
+            return None
+        if not isinstance(entry, CachedTurn):
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: CachedTurn) -> None:
+        """Store ``entry`` under ``key``, evicting least recently used entries if over budget."""
+        data = zlib.compress(pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=".tmp-", delete=False) as handle:
+            handle.write(data)
+        with self._lock:
+            try:
+                replaced = path.stat().st_size
+            except OSError:
+                replaced = 0
+            os.replace(handle.name, path)
+            self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def discard(self, key: str) -> None:
+        """Remove the entry for ``key``, if there is one."""
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = path.stat().st_size
+            except OSError:
+                return
+            self._remove(path)
+            self._size -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            for path, _, _ in self._entries():
+                self._remove(path)
+            self._size = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{_SUFFIX}"
+
+    def _entries(self) -> list[tuple[Path, int, float]]:
+        """(path, size, last use) of every stored entry."""
+        entries = []
+        for path in self.directory.glob(f"*{_SUFFIX}"):
+            try:
+                info = path.stat()
+            except OSError:
+                continue
+            entries.append((path, info.st_size, info.st_mtime))
+        return entries
+
+    def _evict(self) -> None:
+        """Delete the least recently used entries until the rest fit. Called with the lock held."""
+        # Other processes may share the directory, so the listing is the source of truth
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._size <= self.max_bytes:
+                break
+            self._remove(path)
+            self._size -= size
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _walk(self, root: Path, prefix: str) -> Iterable[tuple[str, os.stat_result]]:
+        try:
+            entries = list(os.scandir(root / prefix if prefix else root))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name in self.ignore:
+                continue
+            relative = f"{prefix}/{entry.name}" if prefix else entry.name
+            try:
+                info = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if stat.S_ISDIR(info.st_mode):
+                yield from self._walk(root, relative)
+            elif stat.S_ISREG(info.st_mode) or stat.S_ISLNK(info.st_mode):
+                yield relative, info
+
+    def _file_digest(self, path: str, info: os.stat_result) -> bytes:
+        signature = (info.st_size, info.st_mtime_ns, info.st_ino)
+        with self._lock:
+            known = self._digests.get(path)
+        if known is not None and known[:3] == signature:
+            return known[3]
+        digest = hashlib.blake2b(digest_size=32)
+        try:
+            with open(path, "rb") as handle:
+                while chunk := handle.read(_READ_CHUNK):
+                    digest.update(chunk)
+        except OSError:
+            return b"?"
+        value = digest.digest()
+        if time.time_ns() - info.st_mtime_ns > _RACY_WINDOW_NS:
+            with self._lock:
+                self._digests[path] = (*signature, value)
+        return value
+
+
+def read_files(root: str | Path, paths: Iterable[str]) -> dict[str, bytes | None]:
+    """
+    Current content of workspace-relative ``paths``; None for those that no longer exist.
+
+    Paths that are directories now are left out: only files are stored.
+    """
+    root = Path(root)
+    files: dict[str, bytes | None] = {}
+    for relative in paths:
+        try:
+            files[relative] = (root / relative).read_bytes()
+        except FileNotFoundError:
+            files[relative] = None
+        except IsADirectoryError:
+            continue
+    return files
+
+
+def apply_files(root: str | Path, files: dict[str, bytes | None]) -> list[tuple[Path, bool]]:
+    """
+    Write (or delete) cached files under ``root``; returns (path, created) for each file written.
+
+    Raises:
+        IsADirectoryError: If one of the paths is a directory; nothing is written then
+    """
+    root = Path(root)
+    for relative in files:
+        if (root / relative).is_dir():
+            raise IsADirectoryError(errno.EISDIR, "Cached file is a directory in the workspace", str(root / relative))
+    written = []
+    for relative, content in files.items():
+        path = root / relative
+        if content is None:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        created = not path.exists()
+        path.write_bytes(content)
+        written.append((path, created))
+    return written
@@ -1,6 +1,14 @@
-"""Capabilities module - Terminal and filesystem controllers."""
+"""Capabilities module - Terminal, filesystem and permission controllers."""
 
 from simple_acp_client.capabilities.terminal import TerminalController, TerminalInfo
 from simple_acp_client.capabilities.filesystem import FileSystemController
+from simple_acp_client.capabilities.permissions import PermissionController, PermissionPolicy, PermissionRule
 
-__all__ = ["TerminalController", "TerminalInfo", "FileSystemController"]
+__all__ = [
+    "TerminalController",
+    "TerminalInfo",
+    "FileSystemController",
+    "PermissionController",
+    "PermissionPolicy",
+    "PermissionRule",
+]
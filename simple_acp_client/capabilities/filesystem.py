@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections.abc import Callable
 from pathlib import Path
 
 from acp import RequestError
@@ -23,6 +24,12 @@ def _slice_text(content: str, line: int | None, limit: int | None) -> str:
 
 
 class FileSystemController:
+    def __init__(self, on_write: Callable[[Path, bool], None] | None = None):
+        # Called with (path, created) after every successful write
+        self.on_write = on_write
+        # Set while writes the client has already applied are repeated; they are acknowledged, not performed
+        self.discard_writes = False
+
     async def writeTextFile(
         self,
         params: WriteTextFileRequest,
@@ -30,9 +37,14 @@ class FileSystemController:
         path = Path(params.path)
         if not path.is_absolute():
             raise RequestError.invalid_params({"path": params.path, "reason": "path must be absolute"})
+        if self.discard_writes:
+            return WriteTextFileResponse()
         path.parent.mkdir(parents=True, exist_ok=True)
+        created = not path.exists()
         path.write_text(params.content)
         # Intentionally quiet; WorkerFormat emission handled elsewhere
+        if self.on_write is not None:
+            self.on_write(path, created)
         return WriteTextFileResponse()
 
     async def readTextFile(
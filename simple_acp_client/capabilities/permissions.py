@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from collections.abc import Awaitable, Callable, Collection, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from acp.schema import (
+    AllowedOutcome,
+    DeniedOutcome,
+    PermissionOption,
+    RequestPermissionRequest,
+    RequestPermissionResponse,
+)
+
+# Decisions a rule or fallback can make. The "_always" variants pick the agent's
+# allow_always / reject_always option when it offers one, which is then cached.
+DECISIONS = frozenset({"allow", "allow_always", "deny", "deny_always"})
+
+_OPTION_PREFERENCE = {
+    "allow": ("allow_once", "allow_always"),
+    "allow_always": ("allow_always", "allow_once"),
+    "deny": ("reject_once", "reject_always"),
+    "deny_always": ("reject_always", "reject_once"),
+}
+
+# rawInput keys agents commonly use for the file a tool acts on
+_PATH_KEYS = ("path", "file_path", "abs_path", "filePath")
+
+PermissionFallback = Callable[[RequestPermissionRequest], Awaitable[str | None]]
+
+
+def _pick_preferred_option(options: Iterable[PermissionOption]) -> PermissionOption | None:
+    best: PermissionOption | None = None
+    for option in options:
+        if option.kind in {"allow_once", "allow_always"}:
+            return option
+        best = best or option
+    return best
+
+
+def _pick_option(options: Iterable[PermissionOption], decision: str) -> PermissionOption | None:
+    by_kind: dict[str, PermissionOption] = {}
+    for option in options:
+        by_kind.setdefault(option.kind, option)
+    for kind in _OPTION_PREFERENCE[decision]:
+        if kind in by_kind:
+            return by_kind[kind]
+    return None
+
+
+def _tool_command(raw_input: Any) -> str | None:
+    if not isinstance(raw_input, dict):
+        return None
+    command = raw_input.get("command", raw_input.get("cmd"))
+    if isinstance(command, (list, tuple)):
+        return " ".join(str(part) for part in command)
+    return command if isinstance(command, str) else None
+
+
+def _tool_paths(request: RequestPermissionRequest) -> list[str]:
+    paths = [location.path for location in request.toolCall.locations or []]
+    raw_input = request.toolCall.rawInput
+    if isinstance(raw_input, dict):
+        paths.extend(raw_input[key] for key in _PATH_KEYS if isinstance(raw_input.get(key), str))
+    return paths
+
+
+def _is_under(path: str, root: Path) -> bool:
+    resolved = Path(os.path.realpath(root / path))
+    return resolved.is_relative_to(root)
+
+
+@dataclass
+class PermissionRule:
+    """
+    A compiled permission rule. All conditions that are set must match.
+
+    Args:
+        decision: "allow", "allow_always", "deny" or "deny_always"
+        kinds: ACP tool kinds the rule applies to (read, edit, execute, ...); None matches any
+        command: Regex searched in the tool's command (``rawInput["command"]``)
+        title: Regex searched in the tool call title
+        paths_under_cwd: Only match if the tool touches paths and all of them are inside the session cwd
+    """
+
+    decision: str
+    kinds: Collection[str] | None = None
+    command: str | None = None
+    title: str | None = None
+    paths_under_cwd: bool = False
+    _command_re: re.Pattern[str] | None = field(default=None, init=False, repr=False)
+    _title_re: re.Pattern[str] | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.decision not in DECISIONS:
+            raise ValueError(f"Unknown permission decision {self.decision!r}, expected one of {sorted(DECISIONS)}")
+        if self.kinds is not None:
+            self.kinds = frozenset(self.kinds)
+        self._command_re = re.compile(self.command) if self.command is not None else None
+        self._title_re = re.compile(self.title) if self.title is not None else None
+
+    def matches(self, request: RequestPermissionRequest, cwd: Path | None) -> bool:
+        tool_call = request.toolCall
+        if self.kinds is not None and tool_call.kind not in self.kinds:
+            return False
+        if self._title_re is not None and not self._title_re.search(tool_call.title or ""):
+            return False
+        if self._command_re is not None:
+            command = _tool_command(tool_call.rawInput)
+            if command is None or not self._command_re.search(command):
+                return False
+        if self.paths_under_cwd:
+            paths = _tool_paths(request)
+            if cwd is None or not paths or not all(_is_under(path, cwd) for path in paths):
+                return False
+        return True
+
+
+class PermissionPolicy:
+    """
+    Answers ``session/request_permission`` from rules, without a round trip to a human.
+
+    Rules are checked in order and the first match decides. Requests no rule matches go
+    to the async ``fallback`` (which may return a decision, or None for ``default``).
+    Whenever an ``allow_always``/``reject_always`` option is chosen, the decision is
+    cached for that session and identical requests are answered from the cache.
+    """
+
+    def __init__(
+        self,
+        rules: Iterable[PermissionRule] = (),
+        *,
+        fallback: PermissionFallback | None = None,
+        default: str = "allow",
+    ) -> None:
+        if default not in DECISIONS:
+            raise ValueError(f"Unknown permission decision {default!r}, expected one of {sorted(DECISIONS)}")
+        self.rules = list(rules)
+        self.fallback = fallback
+        self.default = default
+        self._cache: dict[str, dict[tuple[Any, ...], str]] = {}
+
+    @staticmethod
+    def _cache_key(request: RequestPermissionRequest) -> tuple[Any, ...]:
+        tool_call = request.toolCall
+        raw_input = json.dumps(tool_call.rawInput, sort_keys=True, default=str)
+        return (tool_call.kind, tool_call.title, raw_input)
+
+    async def decide(self, request: RequestPermissionRequest, cwd: str | Path | None = None) -> str:
+        """Return the decision for a request, consulting the cache, the rules and the fallback."""
+        cached = self._cache.get(request.sessionId, {}).get(self._cache_key(request))
+        if cached is not None:
+            return cached
+
+        root = Path(os.path.realpath(cwd)) if cwd is not None else None
+        for rule in self.rules:
+            if rule.matches(request, root):
+                return rule.decision
+
+        if self.fallback is not None:
+            decision = await self.fallback(request)
+            if decision is not None:
+                if decision not in DECISIONS:
+                    raise ValueError(f"Permission fallback returned unknown decision {decision!r}")
+                return decision
+        return self.default
+
+    async def respond(self, request: RequestPermissionRequest, cwd: str | Path | None = None) -> RequestPermissionResponse:
+        decision = await self.decide(request, cwd)
+        option = _pick_option(request.options, decision)
+        if option is None:
+            return RequestPermissionResponse(outcome=DeniedOutcome(outcome="cancelled"))
+        if option.kind in {"allow_always", "reject_always"}:
+            self._cache.setdefault(request.sessionId, {})[self._cache_key(request)] = decision
+        return RequestPermissionResponse(outcome=AllowedOutcome(optionId=option.optionId, outcome="selected"))
+
+    def forget(self, session_id: str | None = None) -> None:
+        """Drop cached decisions for one session, or for all sessions."""
+        if session_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(session_id, None)
+
+
+class PermissionController:
+    def __init__(self, policy: PermissionPolicy | None = None, cwd: str | Path | None = None):
+        self.permission_policy = policy
+        self.permission_cwd = cwd
+
+    async def requestPermission(
+        self,
+        params: RequestPermissionRequest,
+    ) -> RequestPermissionResponse:  # type: ignore[override]
+        if self.permission_policy is not None:
+            return await self.permission_policy.respond(params, self.permission_cwd)
+        option = _pick_preferred_option(params.options)
+        if option is None:
+            return RequestPermissionResponse(outcome=DeniedOutcome(outcome="cancelled"))
+        return RequestPermissionResponse(outcome=AllowedOutcome(optionId=option.optionId, outcome="selected"))
@@ -34,6 +34,18 @@ class TerminalInfo:
     signal: str | None = None
     _output_task: asyncio.Task | None = None
 
+    def kill(self) -> None:
+        """Kill the command and everything it started.
+
+        The shell is the leader of its own process group; killing only the shell would
+        leave its children holding the output pipes open, and waits on it hanging.
+        """
+        import signal
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            self.process.kill()
+
     def add_output(self, data: bytes) -> None:
         """Add output data, enforcing byte limit with UTF-8 character boundary truncation."""
         self.output_buffer.extend(data)
@@ -143,6 +155,7 @@ class TerminalController:
                 stderr=asyncio.subprocess.PIPE,
                 cwd=cwd,
                 env=env,
+                start_new_session=True,
             )
 
             # Create terminal info
@@ -207,7 +220,7 @@ class TerminalController:
         # Kill the process if it's still running
         if terminal_info.process.returncode is None:
             try:
-                terminal_info.process.kill()
+                terminal_info.kill()
                 # Wait briefly for the process to terminate
                 try:
                     await asyncio.wait_for(terminal_info.process.wait(), timeout=2.0)
@@ -250,6 +263,21 @@ class TerminalController:
             signal=terminal_info.signal
         )
 
+    async def kill_terminals(self) -> int:
+        """Kill every terminal process that is still running; returns how many were killed.
+
+        Terminals stay registered so the agent can still read their output or release them.
+        """
+        killed = 0
+        for terminal_info in list(self.terminals.values()):
+            if terminal_info.process.returncode is None:
+                try:
+                    terminal_info.kill()
+                    killed += 1
+                except Exception:
+                    pass
+        return killed
+
     async def killTerminal(
         self,
         params: KillTerminalCommandRequest,
@@ -264,7 +292,7 @@ class TerminalController:
         # Kill the process if it's still running
         if terminal_info.process.returncode is None:
             try:
-                terminal_info.process.kill()
+                terminal_info.kill()
                 pass
             except Exception:
                 pass
@@ -1,72 +1,250 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+import binascii
+import functools
+import io
+import mmap
+import re
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field, fields, is_dataclass
 from datetime import datetime
-from typing import Union, Any
+from pathlib import Path
+from typing import IO, Union, Any
 
 
-def _default_timestamp() -> str:
-    """Generate a default timestamp in ISO format."""
-    return datetime.now().isoformat()
+def _format_timestamp(timestamp_ns: int) -> str:
+    """Format a ``time.time_ns()`` value as local time with millisecond precision."""
+    seconds, nanos = divmod(timestamp_ns, 1_000_000_000)
+    moment = datetime.fromtimestamp(seconds).replace(microsecond=nanos // 1000)
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
 
 
-@dataclass
-class TextBlock:
+def _parse_timestamp(timestamp: str) -> int:
+    """``time.time_ns()`` value of an ISO timestamp; naive ones are local time."""
+    moment = datetime.fromisoformat(timestamp)
+    return int(moment.replace(microsecond=0).timestamp()) * 1_000_000_000 + moment.microsecond * 1000
+
+
+def _legacy_init(cls):
+    """
+    Keep accepting the constructor arguments of the earlier message types.
+
+    Blocks used to take ``timestamp=`` as an ISO string, and ``OtherUpdate`` took its
+    payload as ``update=``; both are translated to the current fields.
+    """
+    init = cls.__init__
+
+    @functools.wraps(init)
+    def __init__(self, *args: Any, timestamp: str | None = None, **kwargs: Any) -> None:
+        if "update" in kwargs and "raw" not in kwargs:
+            kwargs["raw"] = kwargs.pop("update")
+        init(self, *args, **kwargs)
+        if timestamp is not None:
+            self.timestamp_ns = _parse_timestamp(timestamp)
+        elif isinstance(self.timestamp_ns, str):  # Passed positionally where it used to be
+            self.timestamp_ns = _parse_timestamp(self.timestamp_ns)
+
+    cls.__init__ = __init__
+    return cls
+
+
+class _Timestamped:
+    """Mixin for blocks that store an integer creation time and format it on read."""
+    __slots__ = ()
+
+    @property
+    def timestamp(self) -> str:
+        return _format_timestamp(self.timestamp_ns)  # type: ignore[attr-defined]
+
+
+@_legacy_init
+@dataclass(slots=True)
+class TextBlock(_Timestamped):
     """Text content block."""
     text: str
-    timestamp: str = field(default_factory=_default_timestamp)
+    timestamp_ns: int = field(default_factory=time.time_ns)
 
-@dataclass
-class ThinkingBlock:
+@_legacy_init
+@dataclass(slots=True)
+class ThinkingBlock(_Timestamped):
     """Thinking content block (for models with thinking capability)."""
     thinking: str
     signature: str = ""
-    timestamp: str = field(default_factory=_default_timestamp)
+    timestamp_ns: int = field(default_factory=time.time_ns)
 
-@dataclass
-class ToolUseBlock:
+@_legacy_init
+@dataclass(slots=True)
+class ToolUseBlock(_Timestamped):
     """Tool use request block."""
     id: str
     name: str
     input: dict[str, Any]
-    timestamp: str = field(default_factory=_default_timestamp)
+    kind: str | None = None
+    timestamp_ns: int = field(default_factory=time.time_ns)
+
+@_legacy_init
+@dataclass(slots=True)
+class OtherUpdate(_Timestamped):
+    """Other update block.
 
-@dataclass
-class OtherUpdate:
-    """Other update block."""
+    ``raw`` keeps the ACP update model as received; the ``update`` dict is only
+    built (via ``model_dump()``) the first time it is read.
+    """
     update_name: str
-    update: dict[str, Any]
-    timestamp: str = field(default_factory=_default_timestamp)
+    raw: Any
+    timestamp_ns: int = field(default_factory=time.time_ns)
+    _update: dict[str, Any] | None = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def update(self) -> dict[str, Any]:
+        if self._update is None:
+            raw = self.raw
+            self._update = raw.model_dump() if hasattr(raw, "model_dump") else dict(raw or {})
+        return self._update
 
-@dataclass
-class ToolResultBlock:
+@_legacy_init
+@dataclass(slots=True)
+class ToolResultBlock(_Timestamped):
     """Tool execution result block."""
     tool_use_id: str
     content: str | list[dict[str, Any]] | None = None
     is_error: bool | None = None
-    timestamp: str = field(default_factory=_default_timestamp)
+    raw_output: Any = None
+    input: dict[str, Any] | None = None  # Tool input merged from all of the call's updates
+    timestamp_ns: int = field(default_factory=time.time_ns)
+
+# Decode spilled blobs this many base64 characters at a time (a multiple of 4)
+_DECODE_CHUNK = 4 * 256 * 1024
+_WHITESPACE = re.compile(r"\s")
+
+
+def _decoded_size(encoded: str) -> int:
+    # Tolerates MIME-style line wrapping
+    length = len(encoded) - encoded.count("\n") - encoded.count("\r")
+    tail = encoded[-4:].rstrip()
+    return length * 3 // 4 - (len(tail) - len(tail.rstrip("=")))
+
+
+@dataclass(slots=True)
+class ResourceBlock(_Timestamped):
+    """Binary embedded resource (an ACP ``resource`` block carrying a base64 ``blob``).
+
+    The payload is decoded on first access, not when the block is received. Blobs
+    larger than ``spill_threshold`` bytes are decoded in chunks into a temporary file,
+    which is deleted with the block; ``data`` then maps that file instead of holding
+    the bytes in memory.
+    """
+    uri: str
+    mime_type: str | None
+    size: int  # Decoded size in bytes (computed from the base64 length)
+    timestamp_ns: int = field(default_factory=time.time_ns)
+    _encoded: str | None = field(default=None, repr=False, compare=False)
+    _spill_threshold: int | None = field(default=None, repr=False, compare=False)
+    _bytes: bytes | None = field(default=None, init=False, repr=False, compare=False)
+    _file: Any = field(default=None, init=False, repr=False, compare=False)
+    _map: mmap.mmap | None = field(default=None, init=False, repr=False, compare=False)
 
-ContentBlock = Union[TextBlock, ThinkingBlock, ToolUseBlock, ToolResultBlock]
+    @classmethod
+    def from_base64(
+        cls, blob: str, uri: str, mime_type: str | None = None, spill_threshold: int | None = None
+    ) -> ResourceBlock:
+        """Wrap an encoded blob without decoding it. ``spill_threshold=None`` never spills."""
+        return cls(uri=uri, mime_type=mime_type, size=_decoded_size(blob), _encoded=blob, _spill_threshold=spill_threshold)
 
-@dataclass
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None or (
+            self._bytes is None and self._spill_threshold is not None and self.size > self._spill_threshold
+        )
+
+    @property
+    def data(self) -> memoryview:
+        """The decoded payload (backed by a read-only mapping of the temp file if spilled)."""
+        if self.spilled:
+            self._spill()
+            if self._map is None:
+                if self.size == 0:
+                    return memoryview(b"")
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(self._map)
+        if self._bytes is None:
+            self._bytes = binascii.a2b_base64(self._encoded or "")
+            self._encoded = None
+        return memoryview(self._bytes)
+
+    @property
+    def path(self) -> Path | None:
+        """Temporary file holding the payload, for blobs above the spill threshold."""
+        if not self.spilled:
+            return None
+        self._spill()
+        return Path(self._file.name)
+
+    def open(self) -> IO[bytes]:
+        """A binary file object reading the payload."""
+        if self.spilled:
+            return open(self.path, "rb")
+        return io.BytesIO(self.data)
+
+    def save(self, destination: str | Path) -> Path:
+        """Write the payload to ``destination``."""
+        destination = Path(destination)
+        with self.open() as source, destination.open("wb") as target:
+            shutil.copyfileobj(source, target)
+        return destination
+
+    def __reduce__(self):
+        # Temp files and mappings don't survive pickling; the payload is re-encoded instead
+        encoded = self._encoded
+        if encoded is None:
+            encoded = binascii.b2a_base64(self.data, newline=False).decode("ascii")
+        return _restore_resource, (encoded, self.uri, self.mime_type, self._spill_threshold, self.timestamp_ns)
+
+    def _spill(self) -> None:
+        if self._file is not None:
+            return
+        encoded, self._encoded = self._encoded or "", None
+        if _WHITESPACE.search(encoded):
+            # Line-wrapped base64 can't be decoded at fixed offsets
+            encoded = _WHITESPACE.sub("", encoded)
+        suffix = Path(self.uri).suffix
+        spill = tempfile.NamedTemporaryFile(prefix="acp-resource-", suffix=suffix if suffix[1:].isalnum() else "")
+        for start in range(0, len(encoded), _DECODE_CHUNK):
+            spill.write(binascii.a2b_base64(encoded[start:start + _DECODE_CHUNK]))
+        spill.flush()
+        self._file = spill
+
+
+def _restore_resource(
+    encoded: str, uri: str, mime_type: str | None, spill_threshold: int | None, timestamp_ns: int
+) -> ResourceBlock:
+    block = ResourceBlock.from_base64(encoded, uri, mime_type, spill_threshold)
+    block.timestamp_ns = timestamp_ns
+    return block
+
+ContentBlock = Union[TextBlock, ThinkingBlock, ToolUseBlock, ToolResultBlock, ResourceBlock]
+
+@dataclass(slots=True)
 class UserMessage:
     """User input message."""
     content: str | list[ContentBlock]
 
-@dataclass
+@dataclass(slots=True)
 class AssistantMessage:
     """Assistant response message with content blocks."""
     content: list[ContentBlock]
     model: str
 
-@dataclass
+@dataclass(slots=True)
 class SystemMessage:
     """System message with metadata."""
     subtype: str
     data: dict[str, Any]
 
-@dataclass
+@dataclass(slots=True)
 class ResultMessage:
     """Final result message with cost and usage information."""
     subtype: str
@@ -78,11 +256,56 @@ class ResultMessage:
     total_cost_usd: float | None = None
     usage: dict[str, Any] | None = None
     result: str | None = None
+    stop_reason: str | None = None  # ACP stop reason, None if the turn failed
+    # Workspace files the turn changed: {"created": [...], "modified": [...], "deleted": [...]}
+    changed_files: dict[str, list[str]] | None = None
+    cached: bool = False  # Replayed from a TurnCache instead of asking the agent
 
-@dataclass
+@dataclass(slots=True)
 class EndOfTurnMessage:
     """Sentinel message indicating the agent turn has completed."""
-    pass
+    turn_id: int | None = None
 
 
 Message = Union[UserMessage, AssistantMessage, SystemMessage, ResultMessage, EndOfTurnMessage]
+
+
+def _jsonable(value: Any, compact: bool = True) -> Any:
+    # compact: ACP models use their wire aliases and leave out unset fields
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "model_dump"):
+        if compact:
+            return value.model_dump(mode="json", by_alias=True, exclude_none=True)
+        return value.model_dump(mode="json")
+    if is_dataclass(value) and not isinstance(value, type):
+        return message_to_dict(value) if compact else _worker_fields(value)
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item, compact) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item, compact) for item in value]
+    return str(value)
+
+
+def message_to_dict(message: Any) -> dict[str, Any]:
+    """The public fields of a message as JSON-compatible values (ACP models are dumped)."""
+    return {f.name: _jsonable(getattr(message, f.name)) for f in fields(message) if not f.name.startswith("_")}
+
+
+def _worker_fields(message: Any) -> dict[str, Any]:
+    # WorkerFormat predates timestamp_ns, and dumps models with their field names and None values
+    data = {
+        f.name: _jsonable(getattr(message, f.name), compact=False)
+        for f in fields(message)
+        if not f.name.startswith("_") and f.name != "timestamp_ns"
+    }
+    if isinstance(message, ThinkingBlock) and not message.signature:
+        del data["signature"]  # Thinking events have always carried just the text
+    return data
+
+
+def worker_event(message: Message) -> dict[str, Any]:
+    """WorkerFormat event (``{"type": ..., "message": {...}}``) for an SDK message."""
+    if isinstance(message, OtherUpdate):
+        return {"type": message.update_name, "message": {"update": _jsonable(message.raw, compact=False)}}
+    return {"type": type(message).__name__, "message": _worker_fields(message)}
@@ -0,0 +1,261 @@
+"""
+Send one prompt to several agent backends and take the best answer.
+
+``FanOut`` wraps a set of connected clients (``PyACPSDKClient`` or supervisor
+``RemoteClient``), typically running different agent commands or models. Each
+``query()`` runs in one of three modes:
+
+- ``first``: the prompt goes to every backend and the first successful result
+  wins; the others are interrupted
+- ``hedge``: the prompt goes to the first backend, and to each further backend
+  only if no result has arrived after another hedge delay. Losers are interrupted,
+  as in ``first``. Most turns cost one backend; only the slow tail pays for a backup
+- ``all``: every backend runs to completion; the fastest successful result wins
+
+Unless a fixed ``hedge_delay`` is given, the delay tracks a quantile (p95 by
+default) of the primary backend's recent turn durations, so backups only start
+for turns that are already in its tail.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses
+import statistics
+from collections import deque
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+from simple_acp_client.core import Message, ResultMessage
+
+MODES = ("first", "hedge", "all")
+
+
+@dataclass(slots=True)
+class BackendResult:
+    """
+    What one backend did during a fan-out query.
+
+    Times are seconds since the fan-out started. ``started_at`` is when the backend
+    was asked, which may be before the turn went out if the backend was still
+    finishing an interrupted turn. ``status`` is one of "won", "completed",
+    "interrupted", "failed" or "not_started" (hedge backups that were never needed).
+    The result of an interrupted backend is a snapshot taken when the query
+    returned; the rest of its turn is drained and discarded.
+    """
+
+    name: str
+    status: str = "not_started"
+    started_at: float | None = None
+    first_message_at: float | None = None
+    finished_at: float | None = None
+    result: ResultMessage | None = None
+    messages: list[Message] = field(default_factory=list)
+    error: BaseException | None = None
+
+    @property
+    def duration(self) -> float | None:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+@dataclass(slots=True)
+class FanOutResult:
+    """Merged outcome of a fan-out query: the winner's messages plus per-backend timing."""
+
+    mode: str
+    winner: str | None
+    elapsed: float  # Seconds until the result was decided
+    backends: dict[str, BackendResult]
+
+    @property
+    def result(self) -> ResultMessage | None:
+        return self.backends[self.winner].result if self.winner is not None else None
+
+    @property
+    def messages(self) -> list[Message]:
+        return self.backends[self.winner].messages if self.winner is not None else []
+
+
+class FanOut:
+    """
+    Hedged / racing queries across several connected clients.
+
+    Clients are used in the given order; the first one is the primary for hedging.
+    The clients stay owned by the caller, but should not be queried directly while a
+    ``FanOut`` uses them: an interrupted backend is drained in the background, and the
+    next query waits for that before reusing it. A backend whose turn is still running
+    ``interrupt_grace`` seconds (from its options) after the interrupt is cancelled
+    with ``cancel()``, so the wait is bounded.
+
+    Args:
+        clients: Backend name -> connected client
+        hedge_delay: Fixed seconds between starting hedge backends; None adapts it
+        hedge_quantile: Quantile of the primary's recent durations used as adaptive delay
+        initial_hedge_delay: Adaptive delay used until ``min_samples`` turns were observed
+        min_samples: Completed primary turns needed before the adaptive delay is used
+        history: Number of recent durations kept per backend
+    """
+
+    def __init__(
+        self,
+        clients: Mapping[str, Any],
+        *,
+        hedge_delay: float | None = None,
+        hedge_quantile: float = 0.95,
+        initial_hedge_delay: float = 2.0,
+        min_samples: int = 20,
+        history: int = 200,
+    ) -> None:
+        if not clients:
+            raise ValueError("FanOut needs at least one client")
+        self.clients = dict(clients)
+        self.hedge_delay = hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_samples = min_samples
+        self._durations: dict[str, deque[float]] = {name: deque(maxlen=history) for name in self.clients}
+        # Background tasks finishing interrupted turns, per backend
+        self._draining: dict[str, asyncio.Task] = {}
+
+    def current_hedge_delay(self) -> float:
+        """Delay before the next hedge backend starts."""
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        samples = self._durations[next(iter(self.clients))]
+        if len(samples) < self.min_samples:
+            return self.initial_hedge_delay
+        cuts = statistics.quantiles(samples, n=100, method="inclusive")
+        return cuts[min(98, max(0, round(self.hedge_quantile * 100) - 1))]
+
+    def latencies(self) -> dict[str, list[float]]:
+        """Recent successful turn durations (seconds) per backend."""
+        return {name: list(samples) for name, samples in self._durations.items()}
+
+    async def query(self, prompt: Any, mode: str = "first", *, timeout: float | None = None) -> FanOutResult:
+        """
+        Send ``prompt`` to the backends according to ``mode``.
+
+        Args:
+            prompt: Anything ``PyACPSDKClient.query()`` accepts
+            mode: "first", "hedge" or "all"
+            timeout: Give up after this many seconds; running backends are interrupted
+                and the result has no winner
+
+        Returns:
+            The winner's messages and result plus every backend's timing. If no backend
+            succeeded, ``winner`` is the first one that finished (with an error result)
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown fan-out mode {mode!r}, expected one of {MODES}")
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        backends = {name: BackendResult(name) for name in self.clients}
+        decided = asyncio.Event()  # A backend succeeded
+        finished = asyncio.Event()  # Any backend finished, successfully or not
+        finish_order: list[str] = []
+        tasks: dict[str, asyncio.Task] = {}
+        # Set once a backend's prompt reached its agent, which can then cancel it
+        sent = {name: asyncio.Event() for name in self.clients}
+
+        async def run(name: str) -> None:
+            backend = backends[name]
+            client = self.clients[name]
+            backend.started_at = loop.time() - start
+            backend.status = "running"
+            previous = self._draining.pop(name, None)
+            if previous is not None:
+                with contextlib.suppress(Exception):
+                    await previous
+            try:
+                turn = await client.query(prompt)
+                # A remote turn is only known to be sent once its first message arrives
+                turn.sent.add_done_callback(lambda _: sent[name].set())
+                async for message in client.receive_messages():
+                    if backend.first_message_at is None:
+                        backend.first_message_at = loop.time() - start
+                        sent[name].set()
+                    backend.messages.append(message)
+                    if isinstance(message, ResultMessage):
+                        backend.result = message
+            except Exception as exc:
+                backend.error = exc
+            backend.finished_at = loop.time() - start
+            if backend.status == "running":
+                backend.status = "failed" if backend.error is not None or _failed(backend.result) else "completed"
+            if backend.status == "completed" and backend.duration is not None:
+                self._durations[name].append(backend.duration)
+            finish_order.append(name)
+            finished.set()
+            if backend.status == "completed" and mode != "all":
+                decided.set()
+
+        names = list(self.clients)
+        try:
+            async with asyncio.timeout(timeout):
+                if mode == "hedge":
+                    for index, name in enumerate(names):
+                        tasks[name] = asyncio.create_task(run(name))
+                        if index + 1 == len(names):
+                            break
+                        # Start the next backup after the hedge delay, or right away if a backend failed
+                        finished.clear()
+                        with contextlib.suppress(TimeoutError):
+                            await asyncio.wait_for(finished.wait(), self.current_hedge_delay())
+                        if decided.is_set():
+                            break
+                else:
+                    for name in names:
+                        tasks[name] = asyncio.create_task(run(name))
+                pending = set(tasks.values())
+                while pending and not decided.is_set():
+                    waiter = asyncio.ensure_future(decided.wait())
+                    done, pending = await asyncio.wait(pending | {waiter}, return_when=asyncio.FIRST_COMPLETED)
+                    pending.discard(waiter)
+                    waiter.cancel()
+        except TimeoutError:
+            pass
+        elapsed = loop.time() - start
+
+        winner = next((name for name in finish_order if backends[name].status == "completed"), None)
+        if winner is not None:
+            backends[winner].status = "won"
+        elif finish_order:
+            winner = finish_order[0]
+
+        for name, task in tasks.items():
+            if not task.done():
+                backends[name].status = "interrupted"
+                self._draining[name] = asyncio.create_task(self._interrupt(name, task, sent[name]))
+                # ``run`` keeps filling in the original while the turn drains
+                backends[name] = dataclasses.replace(backends[name], messages=list(backends[name].messages))
+        return FanOutResult(mode=mode, winner=winner, elapsed=elapsed, backends=backends)
+
+    async def _interrupt(self, name: str, task: asyncio.Task, sent: asyncio.Event) -> None:
+        """Interrupt a losing backend's turn and let ``task`` drain its remaining messages."""
+        client = self.clients[name]
+        # Agents ignore a cancel that arrives before the prompt, so wait until it was sent
+        sent_wait = asyncio.ensure_future(sent.wait())
+        await asyncio.wait({task, sent_wait}, return_when=asyncio.FIRST_COMPLETED)
+        sent_wait.cancel()
+        if not task.done():
+            with contextlib.suppress(Exception):
+                await client.interrupt()
+            done, _ = await asyncio.wait({task}, timeout=client.options.interrupt_grace)
+            if not done:
+                # The agent ignored the interrupt; cancel() replaces it if it ignores that too
+                with contextlib.suppress(Exception):
+                    await client.cancel()
+        await task
+
+    async def drain(self) -> None:
+        """Wait until every interrupted backend has finished its turn."""
+        draining, self._draining = list(self._draining.values()), {}
+        await asyncio.gather(*draining, return_exceptions=True)
+
+
+def _failed(result: ResultMessage | None) -> bool:
+    return result is None or result.is_error or result.stop_reason != "end_turn"
@@ -0,0 +1,140 @@
+"""
+Snapshots of what clients are holding on to: queued messages, buffers, terminals,
+subprocesses, JSON-RPC requests in flight and asyncio tasks.
+
+``PyACPSDKClient.stats()`` reports on one client, and ``stats()`` reports on the
+whole process and every live client in it. Both only count what is already in
+memory, plus one ``/proc/<pid>/stat`` read per process, so they are cheap enough to
+poll every second. CPU percentages are measured between two snapshots of the same
+process, so the first snapshot of a process has none. Outside Linux the
+process-level fields are None.
+
+If a ``LoopMonitor`` watches the calling thread's loop, ``stats()`` includes its lag
+statistics.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any
+
+from simple_acp_client.monitor import LagStats, current_monitor
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+# Live clients, for the process-wide snapshot
+_clients: weakref.WeakSet[Any] = weakref.WeakSet()
+_lock = threading.Lock()
+# pid -> (monotonic time, CPU seconds) of the previous snapshot, for CPU percentages
+_cpu_samples: dict[int, tuple[float, float]] = {}
+
+
+@dataclass(slots=True)
+class ProcessStats:
+    pid: int
+    rss_bytes: int | None = None
+    cpu_seconds: float | None = None  # User plus system time since the process started
+    cpu_percent: float | None = None  # Since the previous snapshot of this process
+    threads: int | None = None
+
+
+@dataclass(slots=True)
+class ClientStats:
+    """What one client holds; counts are of items currently held, not totals over time."""
+
+    session_id: str | None
+    connected: bool
+    queued_messages: int  # Delivered but not yet read through receive_messages()
+    pending_turns: int  # Queued and not yet sent to the agent
+    undelivered_turns: int  # Submitted turns whose ResultMessage was not read yet
+    accumulated_bytes: int  # Memory held by streamed text chunks not yet flushed into a block
+    tool_calls: int  # Tool calls started and not finished
+    terminals: int  # Live TerminalInfos (created and not released)
+    terminal_output_bytes: int  # Output those terminals retain
+    subprocesses: int  # Running agent, standby and terminal processes
+    pending_requests: int  # Requests sent to the agent awaiting a reply
+    pending_callbacks: int  # Agent requests (permissions, fs, terminals) being handled
+    inbound_frames: int  # JSON-RPC frames received and not yet dispatched
+    tasks: int  # Unfinished asyncio tasks run on behalf of the client
+    agent: ProcessStats | None = None
+
+
+@dataclass(slots=True)
+class RuntimeStats:
+    process: ProcessStats
+    clients: list[ClientStats] = field(default_factory=list)
+    tasks: int | None = None  # All unfinished tasks of the calling thread's event loop, if one runs
+    loop_lag: LagStats | None = None  # From the LoopMonitor watching that loop, if one runs
+
+    @property
+    def subprocesses(self) -> int:
+        return sum(client.subprocesses for client in self.clients)
+
+    @property
+    def terminal_output_bytes(self) -> int:
+        return sum(client.terminal_output_bytes for client in self.clients)
+
+    @property
+    def queued_messages(self) -> int:
+        return sum(client.queued_messages for client in self.clients)
+
+
+def register(client: Any) -> None:
+    """Include ``client`` in process-wide snapshots for as long as it is alive."""
+    with _lock:
+        _clients.add(client)
+
+
+def process_stats(pid: int | None = None) -> ProcessStats:
+    """Memory and CPU use of a process (this one by default), read from ``/proc``."""
+    pid = os.getpid() if pid is None else pid
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as stat:
+            # The command name may contain spaces and parens; the fields after the last paren don't
+            fields = stat.read().rsplit(b")", 1)[1].split()
+    except (OSError, IndexError):
+        return ProcessStats(pid)
+    now = time.monotonic()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    with _lock:
+        previous = _cpu_samples.get(pid)
+        _cpu_samples[pid] = (now, cpu_seconds)
+    cpu_percent = None
+    if previous is not None and now > previous[0]:
+        cpu_percent = round(100 * (cpu_seconds - previous[1]) / (now - previous[0]), 1)
+    return ProcessStats(
+        pid=pid,
+        rss_bytes=int(fields[21]) * _PAGE_SIZE,
+        cpu_seconds=cpu_seconds,
+        cpu_percent=cpu_percent,
+        threads=int(fields[17]),
+    )
+
+
+def forget_process(pid: int) -> None:
+    """Drop the CPU sample of an exited process."""
+    with _lock:
+        _cpu_samples.pop(pid, None)
+
+
+def stats() -> RuntimeStats:
+    """Snapshot of this process and every live client in it."""
+    with _lock:
+        clients = list(_clients)
+    try:
+        tasks = sum(1 for task in asyncio.all_tasks() if not task.done())
+    except RuntimeError:
+        tasks = None  # No running loop in this thread
+    monitor = current_monitor()
+    return RuntimeStats(
+        process=process_stats(),
+        clients=[client.stats() for client in clients],
+        tasks=tasks,
+        loop_lag=monitor.stats() if monitor is not None else None,
+    )
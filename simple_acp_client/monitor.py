@@ -0,0 +1,309 @@
+"""
+Event-loop lag monitoring with attribution of the code that blocked the loop.
+
+Handlers that block the event loop, such as file I/O, console writes or large
+decodes, make every stream on the loop stutter. ``LoopMonitor`` measures that
+continuously. A heartbeat task sleeps for ``interval`` seconds at a time and
+records how late it woke up: that delay is the loop's lag. Every sample goes into
+a histogram.
+
+A watchdog thread notices when a heartbeat is overdue by ``threshold`` seconds
+while the loop is still blocked. It then samples the loop thread's stack and
+notes the running task and the ACP callback being handled, if any. Once the loop
+catches up, the stall is recorded as a ``LagEvent`` with that sample. Stalls
+shorter than about a quarter of ``threshold`` past it can end before the
+watchdog looks, and are recorded without a stack.
+
+The watchdog only wakes a few times per ``threshold``, and the heartbeat costs
+one timer per ``interval``, so the monitor can stay on in production.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import concurrent.futures
+import os
+import sys
+import sysconfig
+import threading
+import time
+import weakref
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from types import FrameType
+
+from acp import Client
+
+# Upper bounds (seconds) of the lag histogram buckets; the last bucket is unbounded
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+# Lags kept for percentiles
+_WINDOW = 4096
+
+# Methods an agent can call on the client; a stack running one is attributed to it
+_ACP_CALLBACKS = frozenset(name for name in dir(Client) if not name.startswith("_"))
+# Frames in the standard library (json, asyncio, ...) are attributed to their caller
+_STDLIB_DIR = os.path.join(sysconfig.get_paths()["stdlib"], "")
+
+# Monitors by the loop they watch, for ``introspection.stats()``
+_monitors: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LoopMonitor] = weakref.WeakKeyDictionary()
+
+
+@dataclass(slots=True)
+class LagEvent:
+    """A stall of the event loop longer than the monitor's threshold."""
+
+    lag: float  # Seconds the loop was late
+    at: float  # Wall-clock time the loop caught up
+    callback: str | None = None  # ACP client method being handled, e.g. "writeTextFile"
+    task: str | None = None  # Name and coroutine of the task that was running
+    location: str | None = None  # Innermost frame outside the standard library, "file:line in function"
+    stack: list[str] = field(default_factory=list)  # Sampled frames, outermost first; empty if not sampled
+
+    @property
+    def where(self) -> str:
+        """Best available description of what blocked the loop."""
+        if self.callback and self.location:
+            return f"{self.callback} @ {self.location}"
+        return self.callback or self.location or self.task or "unknown"
+
+
+@dataclass(slots=True)
+class LagStats:
+    samples: int
+    stalls: int  # Samples at or over the threshold
+    max: float
+    p50: float  # Percentiles over the last few thousand samples, seconds
+    p95: float
+    p99: float
+    histogram: list[tuple[float, int]]  # (bucket upper bound in seconds, samples); the last bound is inf
+    hot_spots: list[tuple[str, int, float]]  # (where, stalls, total lag), most total lag first
+
+
+class LoopMonitor:
+    """
+    Measures an event loop's lag and records what was running when it stalled.
+
+    Args:
+        threshold: Lag in seconds from which a sample counts as a stall and is attributed
+        interval: Seconds the heartbeat sleeps between samples
+        max_events: Most recent stalls kept in ``events``
+        stack_depth: Frames kept per sampled stack
+        on_lag: Called on the loop with every ``LagEvent``; keep it cheap
+
+    Example:
+        async with LoopMonitor(threshold=0.05) as monitor:
+            ...
+            for where, stalls, total in monitor.stats().hot_spots:
+                print(f"{total * 1000:8.0f} ms in {stalls} stalls: {where}")
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.05,
+        interval: float = 0.01,
+        *,
+        max_events: int = 256,
+        stack_depth: int = 32,
+        on_lag: Callable[[LagEvent], None] | None = None,
+    ) -> None:
+        if threshold <= 0 or interval <= 0:
+            raise ValueError("threshold and interval must be positive")
+        self.threshold = threshold
+        self.interval = interval
+        self.stack_depth = stack_depth
+        self.on_lag = on_lag
+        self.events: deque[LagEvent] = deque(maxlen=max_events)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._heartbeat_task: asyncio.Task | concurrent.futures.Future | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        # Written by the loop thread, read by the watchdog
+        self._thread_id: int | None = None
+        self._beat = 0  # Number of the current heartbeat sleep
+        self._beat_started = 0.0  # Monotonic time it started
+        # Beat number -> (monotonic time, callback, task, location, stack) sampled during its stall
+        self._samples: dict[int, tuple[float, str | None, str | None, str | None, list[str]]] = {}
+        self._reset_counters()
+
+    async def __aenter__(self) -> LoopMonitor:
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat_task is not None
+
+    def start(self, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        """
+        Start monitoring ``loop``, by default the running one.
+
+        The loop may belong to another thread, e.g. ``LoopThread.shared().loop`` of the
+        synchronous client.
+        """
+        if self._heartbeat_task is not None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        loop = loop or running
+        if loop is None:
+            raise RuntimeError("No running event loop; pass the loop to monitor")
+        self._loop = loop
+        self._stopping.clear()
+        if loop is running:
+            self._heartbeat_task = loop.create_task(self._heartbeat(), name="loop-monitor")
+        else:
+            self._heartbeat_task = asyncio.run_coroutine_threadsafe(self._heartbeat(), loop)
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+        _monitors[loop] = self
+
+    def stop(self) -> None:
+        """Stop monitoring; collected statistics and events are kept."""
+        if self._heartbeat_task is None:
+            return
+        self._stopping.set()
+        # Futures of run_coroutine_threadsafe() cancel their task through the loop, thread-safely
+        self._heartbeat_task.cancel()
+        self._heartbeat_task = None
+        if self._watchdog is not None and self._watchdog is not threading.current_thread():
+            self._watchdog.join()
+        self._watchdog = None
+        if _monitors.get(self._loop) is self:
+            del _monitors[self._loop]
+        self._thread_id = None
+        with self._lock:
+            self._samples.clear()
+
+    def stats(self) -> LagStats:
+        with self._lock:
+            recent = sorted(self._recent)
+            histogram = list(zip((*BUCKETS, float("inf")), self._histogram))
+            hot_spots = sorted(
+                ((where, count, total) for where, (count, total) in self._hot_spots.items()),
+                key=lambda spot: spot[2],
+                reverse=True,
+            )
+            samples, stalls, worst = self._count, self._stalls, self._max
+
+        def percentile(fraction: float) -> float:
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))] if recent else 0.0
+
+        return LagStats(
+            samples=samples,
+            stalls=stalls,
+            max=worst,
+            p50=percentile(0.5),
+            p95=percentile(0.95),
+            p99=percentile(0.99),
+            histogram=histogram,
+            hot_spots=hot_spots,
+        )
+
+    def reset(self) -> None:
+        """Forget the statistics and events collected so far."""
+        with self._lock:
+            self._reset_counters()
+        self.events.clear()
+
+    def _reset_counters(self) -> None:
+        self._count = 0
+        self._stalls = 0
+        self._max = 0.0
+        self._recent: deque[float] = deque(maxlen=_WINDOW)
+        self._histogram = [0] * (len(BUCKETS) + 1)
+        self._hot_spots: dict[str, list] = {}  # where -> [stalls, total lag]
+
+    # ------------------------------------------------------------------ loop side
+    async def _heartbeat(self) -> None:
+        self._thread_id = threading.get_ident()
+        while True:
+            self._beat += 1
+            self._beat_started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            resumed = time.monotonic()
+            self._record(max(0.0, resumed - self._beat_started - self.interval), resumed)
+
+    def _record(self, lag: float, resumed: float) -> None:
+        event = None
+        with self._lock:
+            self._count += 1
+            self._max = max(self._max, lag)
+            self._recent.append(lag)
+            self._histogram[bisect.bisect_left(BUCKETS, lag)] += 1
+            sample = self._samples.pop(self._beat, None)
+            self._samples.clear()  # Taken too late for an earlier beat
+            if lag >= self.threshold:
+                self._stalls += 1
+                # A sample taken after the loop resumed shows the heartbeat, not the stall
+                if sample is not None and sample[0] <= resumed:
+                    _, callback, task, location, stack = sample
+                    event = LagEvent(lag, time.time(), callback, task, location, stack)
+                else:
+                    event = LagEvent(lag, time.time())
+                spot = self._hot_spots.setdefault(event.where, [0, 0.0])
+                spot[0] += 1
+                spot[1] += lag
+        if event is not None:
+            self.events.append(event)
+            if self.on_lag is not None:
+                self.on_lag(event)
+
+    # ------------------------------------------------------------------ watchdog side
+    def _watch(self) -> None:
+        poll = max(self.threshold / 4, 0.001)
+        sampled = 0
+        while not self._stopping.wait(poll):
+            beat, started = self._beat, self._beat_started
+            if beat == sampled or self._thread_id is None:
+                continue
+            if time.monotonic() - started - self.interval >= self.threshold:
+                sample = self._sample()
+                if sample is not None:
+                    with self._lock:
+                        self._samples[beat] = sample
+                sampled = beat
+
+    def _sample(self) -> tuple[float, str | None, str | None, str | None, list[str]] | None:
+        frame: FrameType | None = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return None
+        frames = []
+        callback = location = None
+        while frame is not None:
+            code = frame.f_code
+            line = f"{os.path.basename(code.co_filename)}:{frame.f_lineno} in {code.co_qualname}"
+            if location is None and not code.co_filename.startswith(_STDLIB_DIR):
+                location = line
+            if callback is None and code.co_name in _ACP_CALLBACKS:
+                callback = code.co_name
+            if len(frames) < self.stack_depth:
+                frames.append(f"{code.co_filename}:{frame.f_lineno} in {code.co_qualname}")
+            frame = frame.f_back
+        frames.reverse()
+        task = None
+        try:
+            current = asyncio.current_task(self._loop)
+        except RuntimeError:
+            current = None
+        if current is not None:
+            coro = current.get_coro()
+            task = f"{current.get_name()} ({getattr(coro, '__qualname__', type(coro).__name__)})"
+        return time.monotonic(), callback, task, location, frames
+
+
+def current_monitor(loop: asyncio.AbstractEventLoop | None = None) -> LoopMonitor | None:
+    """The monitor watching ``loop`` (by default the running one), if any."""
+    if loop is None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+    return _monitors.get(loop)
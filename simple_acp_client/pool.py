@@ -0,0 +1,282 @@
+"""
+Pre-warmed sessions that already hold a shared preamble.
+
+Many prompts start with the same large context, such as repo instructions, style
+guides or attached files. A ``SessionTemplate`` holds that preamble as a priming
+prompt. A ``SessionPool`` keeps ``size`` sessions connected and primed in the
+background, so ``lease()`` hands out a session whose agent has already processed
+the preamble. The preamble's cost is paid off the request path.
+
+With ``clone=True`` the pool primes one template session and forks each pooled
+session from it (``session/fork``) instead of priming them one by one. The
+template session is never leased, so forks never see another caller's turns. If
+the agent does not advertise ``session/fork`` in its capabilities, every session is
+primed instead; if it advertises it but the first fork fails, the template session
+is leased like the rest.
+
+Leased sessions belong to the caller, who disconnects them; each lease makes the
+pool prepare a replacement.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from simple_acp_client.sdk.client import PromptItem, PyACPAgentOptions, PyACPSDKClient
+
+# Seconds to wait before retrying after a session failed to start; doubles up to the cap
+_RETRY_DELAY = 0.5
+_MAX_RETRY_DELAY = 30.0
+
+
+class PrimingError(RuntimeError):
+    """The priming prompt of a session template ended with an error."""
+
+
+@dataclass
+class SessionTemplate:
+    """
+    A priming prompt and the options of the sessions it primes.
+
+    Args:
+        priming: Prompt run once per session (or once per pool, when cloning) before it
+            is leased; anything ``PyACPSDKClient.query()`` accepts except async iterables
+        agent_command: Agent to connect to, as for ``PyACPSDKClient.connect()``
+        options: Options of every pooled session
+        clone: Fork primed sessions from one template session when the agent supports it
+    """
+
+    priming: str | list[PromptItem]
+    agent_command: str | list[str] | None = None
+    options: PyACPAgentOptions = field(default_factory=PyACPAgentOptions)
+    clone: bool = True
+
+
+@dataclass(slots=True)
+class PoolStats:
+    ready: int  # Primed sessions waiting to be leased
+    preparing: int
+    leased: int  # Sessions handed out so far
+    primed: int  # Priming prompts run
+    forked: int  # Sessions cloned from the template session
+    failures: int
+    cloning: bool | None  # None until the pool found out whether the agent can fork
+    lease_wait_p50: float  # Recent lease() waits, seconds
+    lease_wait_max: float
+
+
+class SessionPool:
+    """
+    Keeps ``size`` primed sessions of a template ready to lease.
+
+    Example:
+        template = SessionTemplate([file_attachment("STYLE.md"), "Follow this style guide."], ["codex-acp"])
+        async with SessionPool(template, size=4) as pool:
+            async with pool.session() as client:
+                await client.query("Review main.py")
+                async for message in client.receive_messages():
+                    ...
+    """
+
+    def __init__(self, template: SessionTemplate, size: int = 2) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.template = template
+        self.size = size
+        self._ready: asyncio.Queue[PyACPSDKClient] | None = None
+        self._preparing = 0
+        self._wakeup: asyncio.Event | None = None
+        self._filler: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._closed = False
+        self._last_error: BaseException | None = None
+        self._retry_delay = 0.0
+        # Clone source: a primed session that is never leased
+        self._source: PyACPSDKClient | None = None
+        self._source_lock: asyncio.Lock | None = None
+        self._cloning: bool | None = None if template.clone else False
+        self._leased = 0
+        self._primed = 0
+        self._forked = 0
+        self._failures = 0
+        self._lease_waits: list[float] = []
+
+    async def __aenter__(self) -> SessionPool:
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        """Start preparing sessions in the background; returns at once."""
+        if self._closed:
+            raise RuntimeError("Session pool is closed")
+        if self._filler is None:
+            self._ready = asyncio.Queue()
+            self._wakeup = asyncio.Event()
+            self._source_lock = asyncio.Lock()
+            self._filler = asyncio.create_task(self._fill())
+
+    async def lease(self, timeout: float | None = None) -> PyACPSDKClient:
+        """
+        A connected, primed session, waiting for one if none is ready.
+
+        The caller owns the session and must disconnect it.
+
+        Raises:
+            TimeoutError: If no session was ready within ``timeout``; the message includes
+                the last error the pool ran into, if any
+        """
+        await self.start()
+        started = time.monotonic()
+        try:
+            while True:
+                client = await asyncio.wait_for(self._ready.get(), timeout)
+                if client._connected and not client._agent_exited:
+                    break
+                # Its agent died while it waited in the pool
+                self._spawn(client.disconnect())
+                self._wakeup.set()
+        except asyncio.TimeoutError:
+            reason = f": {self._last_error}" if self._last_error is not None else ""
+            raise TimeoutError(f"No primed session within {timeout}s{reason}") from None
+        self._leased += 1
+        self._lease_waits = [*self._lease_waits[-255:], time.monotonic() - started]
+        self._wakeup.set()
+        return client
+
+    @contextlib.asynccontextmanager
+    async def session(self, timeout: float | None = None) -> AsyncIterator[PyACPSDKClient]:
+        """Lease a session for the duration of a ``with`` block and disconnect it afterwards."""
+        client = await self.lease(timeout)
+        try:
+            yield client
+        finally:
+            await client.disconnect()
+
+    def stats(self) -> PoolStats:
+        waits = sorted(self._lease_waits)
+        return PoolStats(
+            ready=self._ready.qsize() if self._ready is not None else 0,
+            preparing=self._preparing,
+            leased=self._leased,
+            primed=self._primed,
+            forked=self._forked,
+            failures=self._failures,
+            cloning=self._cloning,
+            lease_wait_p50=waits[len(waits) // 2] if waits else 0.0,
+            lease_wait_max=waits[-1] if waits else 0.0,
+        )
+
+    async def close(self) -> None:
+        """Stop preparing sessions and disconnect every session that was not leased."""
+        self._closed = True
+        if self._filler is not None:
+            self._filler.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._filler
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        clients = [self._source] if self._source is not None else []
+        self._source = None
+        while self._ready is not None and not self._ready.empty():
+            clients.append(self._ready.get_nowait())
+        for client in clients:
+            with contextlib.suppress(Exception):
+                await client.disconnect()
+
+    # ------------------------------------------------------------------ background side
+    def _spawn(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fill(self) -> None:
+        while True:
+            while self._ready.qsize() + self._preparing < self.size:
+                self._preparing += 1
+                self._spawn(self._prepare())
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+    async def _prepare(self) -> None:
+        client: PyACPSDKClient | None = None
+        try:
+            if self._retry_delay:
+                await asyncio.sleep(self._retry_delay)
+            client = PyACPSDKClient(self.template.options)
+            await client.connect(self.template.agent_command)
+            if not await self._clone_into(client):
+                await self._prime(client)
+        except asyncio.CancelledError:
+            if client is not None:
+                with contextlib.suppress(Exception):
+                    await asyncio.shield(client.disconnect())
+            raise
+        except Exception as exc:
+            self._failures += 1
+            self._last_error = exc
+            self._retry_delay = min(max(self._retry_delay * 2, _RETRY_DELAY), _MAX_RETRY_DELAY)
+            if client is not None:
+                with contextlib.suppress(Exception):
+                    await client.disconnect()
+        else:
+            self._retry_delay = 0.0
+            self._ready.put_nowait(client)
+        finally:
+            self._preparing -= 1
+            self._wakeup.set()
+
+    async def _prime(self, client: PyACPSDKClient) -> None:
+        await client.query(self.template.priming)
+        async for message in client.receive_messages():
+            if getattr(message, "is_error", False):
+                raise PrimingError(f"Priming prompt failed: {message.result}")
+        self._primed += 1
+
+    async def _clone_into(self, client: PyACPSDKClient) -> bool:
+        """Fork ``client`` from the template session; False if the pool does not clone."""
+        if self._cloning is False:
+            return False
+        if not client.can_fork:
+            # Found before priming a template session that no other session could fork from
+            self._cloning = False
+            return False
+        async with self._source_lock:
+            if self._source is None and self._cloning is not False:
+                # The first session becomes the template session instead of a pooled one
+                source = PyACPSDKClient(self.template.options)
+                await source.connect(self.template.agent_command)
+                try:
+                    await self._prime(source)
+                except BaseException:
+                    await source.disconnect()
+                    raise
+                self._source = source
+            source = self._source
+        if source is None or self._cloning is False:
+            return False
+        try:
+            await client.fork_session(source._session_id)
+        except RuntimeError as exc:
+            if self._cloning:
+                raise  # Forking worked before; this failure is about this session
+            if self._cloning is None:
+                # The agent can't fork: the template session is primed, so it joins the pool
+                self._cloning = False
+                self._last_error = exc
+                self._source = None
+                self._ready.put_nowait(source)
+            return False
+        self._cloning = True
+        # The fork's history is the template session's; cached turns still match
+        client._cache_chain = source._cache_chain
+        self._forked += 1
+        return True
@@ -0,0 +1,317 @@
+"""
+Record and replay of ACP sessions.
+
+``SessionRecorder`` is attached as a stream observer to the connection created in
+``PyACPSDKClient.connect()`` and appends every JSON-RPC frame, in both directions,
+to a gzip-compressed JSONL log. ``ReplayAgent`` serves such a log back over stdio,
+so it can be used as the agent command of a regular client:
+
+    python -m simple_acp_client.recording session.acp.gz --speed 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import sys
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+
+from acp.connection import StreamDirection, StreamEvent
+
+RECORDING_VERSION = 1
+
+# Agent -> client requests that ``ReplayAgent`` answers from the recording by default
+_RECORDED_CALLBACK_PREFIXES = ("fs/", "terminal/")
+
+
+@dataclass
+class RecordedFrame:
+    """A single JSON-RPC frame captured by ``SessionRecorder``."""
+    t_ns: int  # Monotonic nanoseconds since the session header
+    sender: str  # "client" or "agent"
+    message: dict[str, Any]
+
+
+@dataclass
+class Recording:
+    """One recorded session: the header written at connect time and its frames."""
+    header: dict[str, Any]
+    frames: list[RecordedFrame] = field(default_factory=list)
+
+
+class SessionRecorder:
+    """
+    Stream observer that appends JSON-RPC frames to a compressed, append-only log.
+
+    Each session starts a new gzip member with a header line, so several sessions can
+    share one file and a crash only loses the frames that were not flushed yet. Frames
+    observed before the first ``open()`` (e.g. a standby agent's initialize) are held
+    and written after the header.
+    """
+
+    def __init__(self, path: str | Path, *, flush_interval: float = 1.0, compresslevel: int = 6) -> None:
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.compresslevel = compresslevel
+        self._file: gzip.GzipFile | None = None
+        self._origin_ns = 0
+        self._last_flush = 0.0
+        self._early: list[tuple[int, str, Any]] | None = []  # Frames seen before the first open()
+
+    def open(self, **meta: Any) -> None:
+        """Start a new recorded session, writing a header with the given metadata."""
+        if self._file is not None:
+            self.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = gzip.open(self.path, "ab", compresslevel=self.compresslevel)
+        early, self._early = self._early or [], None
+        self._origin_ns = early[0][0] if early else time.monotonic_ns()
+        self._last_flush = time.monotonic()
+        header = {"version": RECORDING_VERSION, "started_at": time.time(), **meta}
+        self._write({"session": header})
+        for t_ns, sender, message in early:
+            self._write({"t": t_ns - self._origin_ns, "from": sender, "msg": message})
+
+    def __call__(self, event: StreamEvent) -> None:
+        sender = "client" if event.direction is StreamDirection.OUTGOING else "agent"
+        if self._file is None:
+            if self._early is not None:
+                self._early.append((time.monotonic_ns(), sender, event.message))
+            return
+        self._write({"t": time.monotonic_ns() - self._origin_ns, "from": sender, "msg": event.message})
+
+    def _write(self, record: dict[str, Any]) -> None:
+        assert self._file is not None
+        self._file.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._file.flush()
+            self._last_flush = now
+
+    def close(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            finally:
+                self._file = None
+
+
+def read_recording(path: str | Path) -> list[Recording]:
+    """Read every session stored in a recording log, tolerating a truncated tail."""
+    sessions: list[Recording] = []
+    for record in _iter_records(Path(path)):
+        if "session" in record:
+            sessions.append(Recording(header=record["session"]))
+        elif sessions:
+            sessions[-1].frames.append(RecordedFrame(record["t"], record["from"], record["msg"]))
+    return sessions
+
+
+def _iter_records(path: Path) -> Iterator[dict[str, Any]]:
+    with gzip.open(path, "rb") as fh:
+        try:
+            for line in fh:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Partially written line at the end of an interrupted session
+                    return
+        except (EOFError, gzip.BadGzipFile, zlib.error):
+            return
+
+
+def _is_request(message: dict[str, Any]) -> bool:
+    return "method" in message and "id" in message
+
+
+def _is_response(message: dict[str, Any]) -> bool:
+    return "method" not in message and "id" in message
+
+
+class ReplayAgent:
+    """
+    Agent that serves a recorded session back to a live client.
+
+    Agent frames are sent with their original spacing divided by ``speed``; ``speed=None``
+    sends them as fast as possible. Whenever the recording shows a client frame, replay
+    waits for the live client to send the matching request or response, and re-anchors
+    the timeline there. Request ids are remapped so the live client's ids are answered.
+
+    fs/* and terminal/* callbacks are answered from the recording and never reach the
+    client, unless ``live_callbacks`` is set, in which case they are forwarded and the
+    client's replies are awaited. Other callbacks (e.g. permission requests) are always
+    forwarded.
+    """
+
+    def __init__(
+        self,
+        recording: Recording,
+        *,
+        speed: float | None = 1.0,
+        live_callbacks: bool = False,
+    ) -> None:
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive, or None for as fast as possible")
+        self.recording = recording
+        self.speed = speed
+        self.live_callbacks = live_callbacks
+        self._incoming: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+        self._backlog: deque[dict[str, Any]] = deque()
+        self._responses: dict[Any, dict[str, Any]] = {}
+        self._response_waiters: dict[Any, asyncio.Future[dict[str, Any]]] = {}
+
+    async def run(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve the recording over the given streams until it ends and the client hangs up."""
+        read_task = asyncio.create_task(self._read_loop(reader))
+        try:
+            await self._replay(writer)
+            # Recording exhausted: reject anything else the client asks for
+            while (message := await self._next_client_message()) is not None:
+                if _is_request(message):
+                    await self._send_error(writer, message["id"], "Request not present in recording")
+        finally:
+            read_task.cancel()
+
+    async def _replay(self, writer: asyncio.StreamWriter) -> None:
+        id_map: dict[Any, Any] = {}
+        answered_from_recording: set[Any] = set()
+        anchor_t_ns = 0
+        anchor_clock = time.monotonic()
+
+        for frame in self.recording.frames:
+            message = frame.message
+            if frame.sender == "client":
+                if _is_response(message):
+                    if message["id"] in answered_from_recording:
+                        continue
+                    await self._wait_for_response(message["id"])
+                else:
+                    live = await self._wait_for_client(message.get("method"), writer)
+                    if live is None:
+                        return
+                    if "id" in message:
+                        id_map[message["id"]] = live["id"]
+                anchor_t_ns, anchor_clock = frame.t_ns, time.monotonic()
+                continue
+
+            if self.speed is not None:
+                due = anchor_clock + (frame.t_ns - anchor_t_ns) / 1e9 / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            if _is_request(message):
+                if not self.live_callbacks and message["method"].startswith(_RECORDED_CALLBACK_PREFIXES):
+                    answered_from_recording.add(message["id"])
+                    continue
+                await self._send(writer, message)
+            elif _is_response(message):
+                await self._send(writer, {**message, "id": id_map.get(message["id"], message["id"])})
+            else:
+                await self._send(writer, message)
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if _is_response(message):
+                    waiter = self._response_waiters.pop(message["id"], None)
+                    if waiter is not None and not waiter.done():
+                        waiter.set_result(message)
+                    else:
+                        self._responses[message["id"]] = message
+                else:
+                    await self._incoming.put(message)
+        finally:
+            await self._incoming.put(None)
+
+    async def _next_client_message(self) -> dict[str, Any] | None:
+        if self._backlog:
+            return self._backlog.popleft()
+        message = await self._incoming.get()
+        if message is None:
+            # Keep signalling end of input to any later caller
+            self._incoming.put_nowait(None)
+        return message
+
+    async def _wait_for_client(self, method: str | None, writer: asyncio.StreamWriter) -> dict[str, Any] | None:
+        """Wait for the live client frame matching the next recorded one."""
+        while (message := await self._next_client_message()) is not None:
+            if message.get("method") == method:
+                return message
+            if _is_request(message):
+                await self._send_error(writer, message["id"], f"Expected {method} from recording")
+            # Unexpected notifications (e.g. an extra session/cancel) are dropped
+        return None
+
+    async def _wait_for_response(self, request_id: Any) -> dict[str, Any]:
+        if request_id in self._responses:
+            return self._responses.pop(request_id)
+        waiter: asyncio.Future[dict[str, Any]] = asyncio.get_running_loop().create_future()
+        self._response_waiters[request_id] = waiter
+        return await waiter
+
+    async def _send(self, writer: asyncio.StreamWriter, message: dict[str, Any]) -> None:
+        writer.write(json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def _send_error(self, writer: asyncio.StreamWriter, request_id: Any, message: str) -> None:
+        await self._send(
+            writer,
+            {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32603, "message": message}},
+        )
+
+
+async def run_replay(path: str | Path, *, session: int = 0, speed: float | None = 1.0, live_callbacks: bool = False) -> None:
+    """Serve one session of a recording on this process' stdin/stdout."""
+    from acp import stdio_streams
+
+    sessions = read_recording(path)
+    if not sessions:
+        raise ValueError(f"No sessions recorded in {path}")
+    agent = ReplayAgent(sessions[session], speed=speed, live_callbacks=live_callbacks)
+    reader, writer = await stdio_streams()
+    await agent.run(reader, writer)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a recorded ACP session as an agent over stdio.")
+    parser.add_argument("recording", help="Path to a log written by SessionRecorder")
+    parser.add_argument("--session", type=int, default=0, help="Index of the recorded session to serve")
+    timing = parser.add_mutually_exclusive_group()
+    timing.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier (default: original speed)")
+    timing.add_argument("--max-speed", action="store_true", help="Send frames as fast as possible")
+    parser.add_argument(
+        "--live-callbacks",
+        action="store_true",
+        help="Forward fs/terminal requests to the client instead of answering them from the recording",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(
+            run_replay(
+                args.recording,
+                session=args.session,
+                speed=None if args.max_speed else args.speed,
+                live_callbacks=args.live_callbacks,
+            )
+        )
+    except (ValueError, IndexError, OSError) as exc:
+        print(f"Replay failed: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,7 @@
 """SDK module - High-level client interface."""
 
 from simple_acp_client.sdk.client import PyACPSDKClient, PyACPAgentOptions
+from simple_acp_client.sdk.attachments import FileAttachment, file_attachment
+from simple_acp_client.sdk.turns import AgentExitedError, Turn, TurnTimeoutError
 
-__all__ = ["PyACPSDKClient", "PyACPAgentOptions"]
+__all__ = ["PyACPSDKClient", "PyACPAgentOptions", "Turn", "TurnTimeoutError", "AgentExitedError", "FileAttachment", "file_attachment"]
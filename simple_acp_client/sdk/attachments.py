@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import mimetypes
+import mmap
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from acp import (
+    embedded_blob_resource,
+    embedded_text_resource,
+    resource_block,
+    resource_link_block,
+    text_block as acp_text_block,
+)
+
+# Files at least this large are mapped instead of read into a bytes object
+MMAP_THRESHOLD = 1024 * 1024
+
+
+@dataclass(slots=True)
+class FileAttachment:
+    """A file to attach to a prompt, turned into an ACP content block when the prompt is sent."""
+
+    path: Path
+    mime_type: str | None = None
+    name: str | None = None
+    embed: bool = True  # False always sends a resource link, never the content
+
+    @property
+    def uri(self) -> str:
+        return self.path.as_uri()
+
+
+def file_attachment(
+    path: str | Path,
+    *,
+    mime_type: str | None = None,
+    name: str | None = None,
+    embed: bool = True,
+) -> FileAttachment:
+    """
+    Attach a file to a prompt.
+
+    Args:
+        path: File to attach; made absolute so its ``file://`` URI is meaningful to the agent
+        mime_type: Content type, guessed from the file name if omitted
+        name: Display name, defaults to the file name
+        embed: Embed the file contents; if False only a resource link is sent
+    """
+    path = Path(path).expanduser().resolve()
+    if not path.is_file():
+        raise FileNotFoundError(f"Attachment not found: {path}")
+    return FileAttachment(
+        path=path,
+        mime_type=mime_type or mimetypes.guess_type(path.name)[0],
+        name=name or path.name,
+        embed=embed,
+    )
+
+
+class AttachmentCache:
+    """
+    Content hashes of attachments already embedded in one session.
+
+    Only add content once the prompt embedding it was sent; content of a prompt that
+    never reached the agent must be embedded again.
+    """
+
+    def __init__(self) -> None:
+        self._sent: dict[bytes, str] = {}  # digest -> URI it was embedded under
+
+    def seen(self, digest: bytes) -> bool:
+        return digest in self._sent
+
+    def uri(self, digest: bytes) -> str | None:
+        """URI the content was embedded under, or None if it was not sent yet."""
+        return self._sent.get(digest)
+
+    def add(self, digest: bytes, uri: str) -> None:
+        self._sent[digest] = uri
+
+    def update(self, embedded: dict[bytes, str]) -> None:
+        self._sent.update(embedded)
+
+    def clear(self) -> None:
+        self._sent.clear()
+
+    def __len__(self) -> int:
+        return len(self._sent)
+
+
+def attachment_block(
+    attachment: FileAttachment,
+    cache: AttachmentCache | None = None,
+    embedded: dict[bytes, str] | None = None,
+) -> Any:
+    """
+    Build the content block for an attachment.
+
+    Content the session has already received (same hash) is sent as a link to the URI
+    it was embedded under, instead of being embedded again. Large files are read
+    through ``mmap`` so hashing and encoding work on the mapped pages without an
+    intermediate copy.
+
+    Args:
+        attachment: File to attach
+        cache: Content the session has received
+        embedded: Content embedded earlier in the same prompt; newly embedded content is
+            added to it, for the caller to add to ``cache`` once the prompt was sent. Without
+            it, embedded content is added to ``cache`` right away
+    """
+    name = attachment.name or attachment.path.name
+    if not attachment.embed:
+        return resource_link_block(name, attachment.uri, mime_type=attachment.mime_type)
+
+    with open(attachment.path, "rb") as fh:
+        size = os.fstat(fh.fileno()).st_size
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size >= MMAP_THRESHOLD else None
+        try:
+            data = memoryview(mapped) if mapped is not None else fh.read()
+            try:
+                digest = hashlib.blake2b(data, digest_size=16).digest()
+                uri = cache.uri(digest) if cache is not None else None
+                if uri is None and embedded is not None:
+                    uri = embedded.get(digest)
+                if uri is not None:
+                    return resource_link_block(name, uri, mime_type=attachment.mime_type, size=size)
+                resource = _embedded_resource(attachment, data)
+            finally:
+                if isinstance(data, memoryview):
+                    data.release()
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+    if embedded is not None:
+        embedded[digest] = attachment.uri
+    elif cache is not None:
+        cache.add(digest, attachment.uri)
+    return resource_block(resource)
+
+
+def _embedded_resource(attachment: FileAttachment, data: bytes | memoryview) -> Any:
+    mime_type = attachment.mime_type
+    if mime_type is None or mime_type.startswith("text/") or mime_type in {"application/json", "application/xml"}:
+        try:
+            return embedded_text_resource(attachment.uri, str(data, "utf-8"), mime_type=mime_type)
+        except UnicodeDecodeError:
+            pass
+    blob = base64.b64encode(data).decode("ascii")
+    return embedded_blob_resource(attachment.uri, blob, mime_type=mime_type)
+
+
+def prompt_block(
+    item: Any,
+    cache: AttachmentCache | None = None,
+    embedded: dict[bytes, str] | None = None,
+) -> Any:
+    """
+    Convert one prompt item (str, FileAttachment, ACP block or dict) into an ACP content block.
+
+    ``cache`` and ``embedded`` are as for ``attachment_block()``.
+    """
+    if isinstance(item, str):
+        return acp_text_block(item)
+    if isinstance(item, FileAttachment):
+        return attachment_block(item, cache, embedded)
+    return item
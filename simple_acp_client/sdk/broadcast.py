@@ -0,0 +1,197 @@
+"""
+Broadcast of a client's message stream to several consumers.
+
+``receive_messages()`` hands each message to exactly one reader. A ``BroadcastHub``
+keeps the stream in a bounded ring buffer, and every ``Subscription`` is just a
+cursor into it. Subscribers share the stored messages and nothing is copied per
+subscriber, so a UI, a logger and a metrics collector can all follow the same
+turn.
+
+When a subscriber falls a full buffer behind, its policy decides what happens:
+
+- ``lag``: publishing waits until the subscriber catches up. This is backpressure:
+  a slow reader slows the agent down instead of missing messages
+- ``skip``: the subscriber jumps ahead to the oldest message still buffered;
+  ``Subscription.skipped`` counts what it missed
+- ``disconnect``: the subscriber's next read raises ``SubscriberLagged``
+"""
+
+from __future__ import annotations
+
+import asyncio
+import weakref
+from typing import Any
+
+POLICIES = ("lag", "skip", "disconnect")
+REPLAY = ("turn", "oldest", "latest")
+
+
+class SubscriberLagged(Exception):
+    """A ``disconnect``-policy subscriber fell further behind than the buffer holds."""
+
+    def __init__(self, missed: int) -> None:
+        self.missed = missed
+        super().__init__(f"Subscriber fell {missed} messages behind and was disconnected")
+
+
+class Subscription:
+    """
+    A cursor into a hub's buffer; iterate it asynchronously to receive messages.
+
+    Iteration ends after the hub is closed and everything published was read. Close
+    subscriptions that are no longer read (or use them as context managers), since an
+    open ``lag`` subscription holds up publishing once the buffer is full.
+    """
+
+    def __init__(self, hub: BroadcastHub, cursor: int, policy: str) -> None:
+        self.hub = hub
+        self.cursor = cursor  # Sequence number of the next message to read
+        self.policy = policy
+        self.skipped = 0
+        self.closed = False
+
+    @property
+    def lag(self) -> int:
+        """Messages published but not read yet."""
+        return self.hub._end - self.cursor
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.hub._unsubscribe(self)
+
+    def __enter__(self) -> Subscription:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __aiter__(self) -> Subscription:
+        return self
+
+    async def __anext__(self) -> Any:
+        hub = self.hub
+        while not self.closed:
+            oldest = hub._oldest
+            if self.cursor < oldest:
+                missed = oldest - self.cursor
+                if self.policy == "disconnect":
+                    self.close()
+                    raise SubscriberLagged(missed)
+                self.skipped += missed
+                self.cursor = oldest
+            if self.cursor < hub._end:
+                message = hub._ring[self.cursor % hub.capacity]
+                self.cursor += 1
+                if self.policy == "lag":
+                    hub._on_progress()
+                return message
+            if hub._closed:
+                break
+            await hub._wait_for_publish()
+        self.close()
+        raise StopAsyncIteration
+
+
+class BroadcastHub:
+    """
+    Bounded, shared message log with cursor-based subscribers.
+
+    Args:
+        capacity: Messages kept in the buffer
+        policy: Default slow-subscriber policy: "lag", "skip" or "disconnect"
+    """
+
+    def __init__(self, capacity: int = 1024, policy: str = "skip") -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown subscriber policy {policy!r}, expected one of {POLICIES}")
+        self.capacity = capacity
+        self.policy = policy
+        self._ring: list[Any] = [None] * capacity
+        self._end = 0  # Sequence number the next message gets
+        self._turn_start = 0
+        self._closed = False
+        # Subscriptions dropped without close() stop counting once garbage-collected
+        self._subscribers: weakref.WeakSet[Subscription] = weakref.WeakSet()
+        # Resolved on every publish / every step of a lag subscriber; shared by all waiters
+        self._published: asyncio.Future[None] | None = None
+        self._progress: asyncio.Future[None] | None = None
+
+    @property
+    def _oldest(self) -> int:
+        return max(0, self._end - self.capacity)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(
+        self, *, policy: str | None = None, replay: str = "turn", turn_start: int | None = None
+    ) -> Subscription:
+        """
+        Start following the stream.
+
+        Args:
+            policy: Slow-subscriber policy, overriding the hub default
+            replay: Where to start: "turn" (the current turn's first message still buffered),
+                "oldest" (everything buffered) or "latest" (only new messages)
+            turn_start: Position returned by ``begin_turn()`` that ``replay="turn"`` starts at;
+                defaults to the latest ``begin_turn()``, whichever publisher called it
+        """
+        policy = policy or self.policy
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown subscriber policy {policy!r}, expected one of {POLICIES}")
+        if replay not in REPLAY:
+            raise ValueError(f"Unknown replay position {replay!r}, expected one of {REPLAY}")
+        if replay == "latest":
+            cursor = self._end
+        elif replay == "turn":
+            cursor = max(self._turn_start if turn_start is None else turn_start, self._oldest)
+        else:
+            cursor = self._oldest
+        subscription = Subscription(self, cursor, policy)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def begin_turn(self) -> int:
+        """Mark where the current turn starts, for ``replay="turn"``; returns that position."""
+        self._turn_start = self._end
+        return self._end
+
+    async def publish(self, message: Any) -> None:
+        """Append a message; waits while a full buffer would overwrite what a lag subscriber hasn't read."""
+        while not self._closed and self._end - self.capacity >= 0 and self._lag_blocked():
+            if self._progress is None or self._progress.done():
+                self._progress = asyncio.get_running_loop().create_future()
+            await self._progress
+        self._ring[self._end % self.capacity] = message
+        self._end += 1
+        if self._published is not None and not self._published.done():
+            self._published.set_result(None)
+
+    def close(self) -> None:
+        """Stop the stream; subscribers finish once they have read everything."""
+        self._closed = True
+        for waiter in (self._published, self._progress):
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+    def _lag_blocked(self) -> bool:
+        oldest = self._end - self.capacity  # Overwritten by the next publish
+        return any(s.policy == "lag" and s.cursor <= oldest for s in list(self._subscribers))
+
+    async def _wait_for_publish(self) -> None:
+        if self._published is None or self._published.done():
+            self._published = asyncio.get_running_loop().create_future()
+        await self._published
+
+    def _on_progress(self) -> None:
+        if self._progress is not None and not self._progress.done():
+            self._progress.set_result(None)
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        if subscription.policy == "lag":
+            self._on_progress()
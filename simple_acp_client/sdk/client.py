@@ -4,108 +4,208 @@ from __future__ import annotations
 import asyncio
 import asyncio.subprocess as aio_subprocess
 import contextlib
+import functools
+import importlib.metadata
 import os
+from collections import deque
 from collections.abc import AsyncIterator, Mapping
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 import asyncio
 import asyncio.subprocess
-import json
 import os
 import sys
 import time
-from datetime import datetime
+import uuid
 from pathlib import Path
-from typing import Iterable, AsyncIterable, Union, AsyncIterator, Any
+from typing import Callable, Collection, Iterable, AsyncIterable, Union, AsyncIterator, Any
 from dataclasses import dataclass, field
 
 from acp import (
+    AGENT_METHODS,
+    CLIENT_METHODS,
     Client,
     ClientSideConnection,
     PROTOCOL_VERSION,
     RequestError,
-    text_block as acp_text_block,
 )
 from acp.transports import default_environment
+from acp.utils import serialize_params
 from acp.schema import (
-    AllowedOutcome,
+    AgentCapabilities,
+    BlobResourceContents,
     CancelNotification,
     ClientCapabilities,
-    DeniedOutcome,
     EmbeddedResourceContentBlock,
     FileSystemCapability,
     InitializeRequest,
+    InitializeResponse,
+    LoadSessionRequest,
     NewSessionRequest,
-    PermissionOption,
     PromptRequest,
-    RequestPermissionRequest,
-    RequestPermissionResponse,
+    PromptResponse,
     ResourceContentBlock,
     SessionNotification,
     SetSessionModelRequest,
     TextContentBlock,
+    ToolCallProgress,
+    ToolCallStart,
     AgentMessageChunk,
     AgentThoughtChunk,
     UserMessageChunk,
 )
-from acp.task.state import InMemoryMessageStateStore
+from acp.task import DefaultMessageDispatcher, InMemoryMessageQueue, InMemoryMessageStateStore
+from acp.task.state import IncomingMessage
 
 from simple_acp_client.core import (
     TextBlock,
     ThinkingBlock,
+    ToolUseBlock,
+    ToolResultBlock,
+    ResourceBlock,
     OtherUpdate,
     EndOfTurnMessage,
     ResultMessage,
     Message,
+    worker_event,
 )
 from simple_acp_client.capabilities.filesystem import FileSystemController
 from simple_acp_client.capabilities.terminal import TerminalController
+from simple_acp_client.capabilities.permissions import PermissionController, PermissionPolicy
+from simple_acp_client.cache import CachedTurn, TurnCache, apply_files, read_files
+from simple_acp_client import introspection
+from simple_acp_client.introspection import ClientStats
+from simple_acp_client.admission import DEFAULT as DEFAULT_PRIORITY, Admission, AdmissionController, get_default_admission
+from simple_acp_client.recording import SessionRecorder
+from simple_acp_client.transcript import TranscriptStore
+from simple_acp_client.workspace.provision import Workspace, WorkspaceProvisioner
+from simple_acp_client.workspace.watcher import WorkspaceWatcher, watch_workspace
+from simple_acp_client.sdk.broadcast import BroadcastHub, Subscription
+from simple_acp_client.sdk.jsonl import JsonlWriter
+from simple_acp_client.sdk.attachments import AttachmentCache, FileAttachment, prompt_block
+from simple_acp_client.sdk.tool_calls import ToolCallIndex, ToolCallState
+from simple_acp_client.sdk.turns import AgentExitedError, Turn, TurnTimeoutError
 
+# A single prompt block: text, file attachment, ACP content block or its dict form
+PromptItem = Union[str, FileAttachment, Any]
 
-def _pick_preferred_option(options: Iterable[PermissionOption]) -> PermissionOption | None:
-    best: PermissionOption | None = None
-    for option in options:
-        if option.kind in {"allow_once", "allow_always"}:
-            return option
-        best = best or option
-    return best
 
+# Unstable ACP method, not in the schema this SDK is built against
+_SESSION_FORK = "session/fork"
 
-class MyInMemoryMessageStateStore(InMemoryMessageStateStore):
-    def __init__(self, client_impl):
-        super().__init__()
-        self._client_impl = client_impl
+# Session update kinds that are accumulated into text/thinking blocks
+_CHUNK_UPDATES = frozenset({"agent_message_chunk", "agent_thought_chunk", "user_message_chunk"})
 
-    def resolve_outgoing(self, request_id: int, result):
-        # Flush accumulated message when a turn ends
-        try:
-            stop_reason = None
-            if isinstance(result, dict):
-                stop_reason = result.get("stopReason")
-            else:
-                # Fallback for objects with attribute access
-                stop_reason = getattr(result, "stopReason", None)
-            if stop_reason == "end_turn":
-                # Schedule the async flush and queue end-of-turn sentinel
-                asyncio.create_task(self._client_impl._on_end_turn())
-        except Exception:
-            # Never let flushing interfere with state resolution
-            pass
-        super().resolve_outgoing(request_id, result)
+
+class _TurnQueue(asyncio.Queue):
+    """
+    Message queue whose items are ``(turn_id, message)`` pairs.
+
+    ``turn_id`` is the turn running when a message was put. Once a turn is fenced by
+    ``PyACPSDKClient.cancel()``, messages still arriving for it are dropped, and the
+    reader skips those already queued.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.turn_id = 0  # Turn the agent is working on
+        self.fence = 0  # Turns up to this id were cancelled; their messages are stale
+
+    @property
+    def fenced(self) -> bool:
+        return self.turn_id <= self.fence
+
+    def put_nowait(self, message: Message) -> None:
+        if isinstance(message, EndOfTurnMessage) and message.turn_id is not None:
+            super().put_nowait((message.turn_id, message))
+        elif not self.fenced:
+            super().put_nowait((self.turn_id, message))
+
+    def purge(self) -> None:
+        """Drop queued messages of fenced turns."""
+        kept = []
+        while not self.empty():
+            item = super().get_nowait()
+            if item[0] > self.fence:
+                kept.append(item)
+        for item in kept:
+            super().put_nowait(item)
+
+
+class _SessionStateStore(InMemoryMessageStateStore):
+    """State store that forgets agent requests once answered; the base class keeps them all."""
+
+    def complete_incoming(self, record: IncomingMessage, result: Any) -> None:
+        super().complete_incoming(record, result)
+        self._forget(record)
+
+    def fail_incoming(self, record: IncomingMessage, error: Any) -> None:
+        super().fail_incoming(record, error)
+        self._forget(record)
+
+    def _forget(self, record: IncomingMessage) -> None:
+        with contextlib.suppress(ValueError):
+            self._incoming.remove(record)
+
+    @property
+    def pending_outgoing(self) -> int:
+        """Requests sent to the agent that have not been answered."""
+        return len(self._outgoing)
+
+    @property
+    def pending_incoming(self) -> int:
+        """Agent requests still being handled."""
+        return len(self._incoming)
+
+
+def _tool_result_block(state: ToolCallState) -> ToolResultBlock:
+    content: str | list[dict[str, Any]] | None = None
+    if state.content:
+        content = [item.model_dump() if hasattr(item, "model_dump") else item for item in state.content]
+    elif isinstance(state.raw_output, str):
+        content = state.raw_output
+    return ToolResultBlock(
+        tool_use_id=state.tool_call_id,
+        content=content,
+        is_error=state.status == "failed",
+        raw_output=state.raw_output,
+        input=state.raw_input if isinstance(state.raw_input, dict) else None,
+    )
 
 
 class EventEmitter:
-    def __init__(self):
+    def __init__(
+        self,
+        subscribed_updates: Collection[str] | None = None,
+        event_writer: JsonlWriter | None = None,
+        resource_spill_threshold: int | None = None,
+    ):
         self.accumulated_message = ""
         self.current_message_type = None
-        self.state_store = MyInMemoryMessageStateStore(self)
+        self.state_store = _SessionStateStore()
+        # ACP ``sessionUpdate`` kinds to deliver; None delivers everything
+        self.subscribed_updates = frozenset(subscribed_updates) if subscribed_updates is not None else None
+        # WorkerFormat output; a buffered stdout writer is created on first use
+        self.event_writer = event_writer
+        # Binary resources larger than this are decoded to a temp file; None keeps them in memory
+        self.resource_spill_threshold = resource_spill_threshold
+
+    def _wants_update(self, kind: str) -> bool:
+        return self.subscribed_updates is None or kind in self.subscribed_updates
+
+    async def _on_dropped_update(self, kind: str) -> None:
+        # A dropped non-chunk update still separates the text around it
+        if kind not in _CHUNK_UPDATES:
+            await self._flush_accumulated_message(trigger="other_update")
 
     # ------------------------- WorkerFormat emitters -------------------------
-    async def _emit_worker_event(self, payload: dict) -> None:
+    async def _emit_message(self, message: Message) -> None:
+        """Write ``message`` to ``event_writer`` as a WorkerFormat line; subclasses deliver it instead."""
+        if self.event_writer is None:
+            self.event_writer = JsonlWriter()
         try:
-            sys.stdout.write(json.dumps(payload) + "\n")
-            sys.stdout.flush()
+            await self.event_writer.write(worker_event(message))
         except Exception:
             import traceback
             traceback.print_exc()
@@ -113,12 +213,23 @@ class EventEmitter:
     async def _emit_text(self, text: str) -> None:
         if not text:
             return
-        await self._emit_worker_event({"type": "TextBlock", "message": {"text": text}})
+        await self._emit_message(TextBlock(text=text))
 
     async def _emit_thinking(self, thinking: str) -> None:
         if not thinking:
             return
-        await self._emit_worker_event({"type": "ThinkingBlock", "message": {"thinking": thinking}})
+        await self._emit_message(ThinkingBlock(thinking=thinking))
+
+    async def _emit_other_update(self, update: Any) -> None:
+        # Keep the pydantic model; the dict is only built if the consumer reads it
+        await self._emit_message(OtherUpdate(update_name=f"OtherUpdate:{update.__class__.__name__}", raw=update))
+
+    async def _emit_resource(self, block: ResourceBlock) -> None:
+        # The payload is not written; consumers of the event stream get its metadata
+        await self._emit_message(block)
+
+    async def _on_tool_call_update(self, session_id: str, update: ToolCallStart | ToolCallProgress) -> None:
+        await self._emit_other_update(update)
     # Accumulation helpers -------------------------------------------------
     def _extract_text(self, content: object) -> str:
         if isinstance(content, TextContentBlock):
@@ -127,11 +238,8 @@ class EventEmitter:
             return content.name or content.uri or ""
         if isinstance(content, EmbeddedResourceContentBlock):
             resource = content.resource
-            text = getattr(resource, "text", None)
-            if text:
-                return text
-            blob = getattr(resource, "blob", None)
-            return blob or ""
+            # Binary (blob) resources are emitted as ResourceBlocks, never accumulated
+            return getattr(resource, "text", None) or ""
         if isinstance(content, dict):
             # Attempt to pull text field if present
             return str(content.get("text", ""))
@@ -145,6 +253,18 @@ class EventEmitter:
         if self.current_message_type != msg_type:
             self.current_message_type = msg_type
 
+        if isinstance(content, EmbeddedResourceContentBlock) and isinstance(content.resource, BlobResourceContents):
+            # Keeps text before and after the resource as separate blocks, in order
+            await self._flush_accumulated_message(trigger="resource")
+            if msg_type != "user_message":
+                resource = content.resource
+                await self._emit_resource(
+                    ResourceBlock.from_base64(
+                        resource.blob, resource.uri, resource.mimeType, self.resource_spill_threshold
+                    )
+                )
+            return
+
         text = self._extract_text(content)
         if text:
             self.accumulated_message += text
@@ -160,27 +280,37 @@ class EventEmitter:
         # Reset regardless of whether there was content
         self.accumulated_message = ""
         self.current_message_type = None
-        
+
+    async def _on_end_turn(self, turn_id: int | None = None) -> None:
+        """Called once the agent has answered a prompt and its updates were processed."""
+        await self._flush_accumulated_message(trigger="end_turn")
+        if self.event_writer is not None:
+            with contextlib.suppress(Exception):
+                await self.event_writer.flush()
 
     async def sessionUpdate(
         self,
         params: SessionNotification,
     ) -> None:  # type: ignore[override]
         update = params.update
-        if isinstance(update, AgentMessageChunk):
+        if not self._wants_update(update.sessionUpdate):
+            await self._on_dropped_update(update.sessionUpdate)
+        elif isinstance(update, AgentMessageChunk):
             await self._accumulate_chunk("agent_message", update.content)
         elif isinstance(update, AgentThoughtChunk):
             await self._accumulate_chunk("agent_thought", update.content)
         elif isinstance(update, UserMessageChunk):
             await self._accumulate_chunk("user_message", update.content)
+        elif isinstance(update, (ToolCallStart, ToolCallProgress)):
+            await self._flush_accumulated_message(trigger="other_update")
+            await self._on_tool_call_update(params.sessionId, update)
         else:
             await self._flush_accumulated_message(trigger="other_update")
-            await self._emit_worker_event({"type": f"OtherUpdate:{update.__class__.__name__}", "message": {"update": update.model_dump()}})
-            
+            await self._emit_other_update(update)
 
 
 
-class _SDKClientImplementation(EventEmitter, TerminalController, FileSystemController, Client):
+class _SDKClientImplementation(EventEmitter, TerminalController, FileSystemController, PermissionController, Client):
     """
     Internal ACP client implementation that queues messages for PyACPSDKClient.
 
@@ -188,56 +318,208 @@ class _SDKClientImplementation(EventEmitter, TerminalController, FileSystemContr
     into Message objects that are queued for consumption by the SDK client.
     """
 
-    def __init__(self, message_queue: asyncio.Queue[Message]):
+    def __init__(
+        self,
+        message_queue: _TurnQueue,
+        subscribed_updates: Collection[str] | None = None,
+        collapse_tool_updates: bool = False,
+        permission_policy: PermissionPolicy | None = None,
+        cwd: str | Path | None = None,
+        on_write: Callable[[Path, bool], None] | None = None,
+        resource_spill_threshold: int | None = None,
+        broadcast: BroadcastHub | None = None,
+    ):
         """
         Initialize the SDK client implementation.
 
         Args:
             message_queue: Queue to put Message objects into
-            model: Model identifier for AssistantMessage objects
+            subscribed_updates: Session update kinds to deliver; None delivers everything
+            collapse_tool_updates: Only emit ToolUseBlock/ToolResultBlock for tool calls,
+                not an OtherUpdate per progress delta
+            permission_policy: Policy answering permission requests; None approves the first allow option
+            cwd: Session working directory, used by path rules of the permission policy
+            on_write: Called with (path, created) after each fs/write_text_file
+            resource_spill_threshold: Size above which binary resources are decoded to a temp file
+            broadcast: Hub that every delivered message is also published to
         """
         # Initialize all parent classes
-        EventEmitter.__init__(self)
+        EventEmitter.__init__(self, subscribed_updates, resource_spill_threshold=resource_spill_threshold)
         TerminalController.__init__(self)
-        # FileSystemController has no __init__, Client.__init__ is handled by EventEmitter chain
-
-        self.tool_call_requests = {}
+        PermissionController.__init__(self, permission_policy, cwd)
+        FileSystemController.__init__(self, on_write)
+        # Client.__init__ is handled by EventEmitter chain
+
+        self.tool_call_requests = ToolCallIndex()
+        # Watchdog bookkeeping: last time the agent sent anything, and callbacks still running
+        self.last_activity = time.monotonic()
+        self.callbacks_in_flight = 0
+        # Set while session/load replays history the consumer has already seen
+        self.replaying_history = False
+        self.collapse_tool_updates = collapse_tool_updates
         self._message_queue = message_queue
-
-
-    async def requestPermission(
-        self,
-        params: RequestPermissionRequest,
-    ) -> RequestPermissionResponse:  # type: ignore[override]
-        option = _pick_preferred_option(params.options)
-        if option is None:
-            return RequestPermissionResponse(outcome=DeniedOutcome(outcome="cancelled"))
-        return RequestPermissionResponse(outcome=AllowedOutcome(optionId=option.optionId, outcome="selected"))
-
-    async def _emit_worker_event(self, payload: dict) -> None:
-
-        # Also queue messages for SDK consumption
-        if payload["type"] == "TextBlock":
-            msg = TextBlock(text=payload["message"]["text"])
-        elif payload["type"] == "ThinkingBlock":
-            msg = ThinkingBlock(thinking=payload["message"]["thinking"])
-        elif payload["type"].startswith("OtherUpdate"):
-            msg = OtherUpdate(update_name=payload["type"], update=payload["message"]["update"])
-        else:
-            raise ValueError(f"Unknown message type: {payload['type']}")
-        await self._message_queue.put(msg)
-
-    async def _on_end_turn(self) -> None:
-        """Called when the agent turn completes."""
+        self.broadcast = broadcast
+        # Last message delivered in the current turn, for the ResultMessage text
+        self.last_message: Message | None = None
+        # Collects the turn's messages while it is recorded for the turn cache
+        self.recording: list[Message] | None = None
+        # Records each delivered message of the running turn in the client's transcript
+        self.transcript: Callable[[Message], None] | None = None
+
+    async def _emit_message(self, message: Message) -> None:
+        # Delivered to the SDK consumer instead of written as a WorkerFormat line
+        await self._publish(message)
+
+    async def _on_tool_call_update(self, session_id: str, update: ToolCallStart | ToolCallProgress) -> None:
+        state, is_new = self.tool_call_requests.apply(session_id, update)
+        if state is None:
+            return  # A late update for a call that already ended
+        if is_new:
+            await self._publish(
+                ToolUseBlock(
+                    id=state.tool_call_id,
+                    name=state.title or "",
+                    input=state.raw_input if isinstance(state.raw_input, dict) else {},
+                    kind=state.kind,
+                )
+            )
+        if not self.collapse_tool_updates:
+            await self._emit_other_update(update)
+        if state.finished:
+            await self._publish(_tool_result_block(state))
+
+    async def _publish(self, message: Message) -> None:
+        if self._message_queue.fenced:
+            return  # The turn was cancelled; nobody is waiting for its messages
+        self.last_message = message
+        if self.recording is not None:
+            self.recording.append(message)
+        if self.transcript is not None:
+            self.transcript(message)
+        await self._message_queue.put(message)
+        if self.broadcast is not None:
+            await self.broadcast.publish(message)
+
+    async def _on_end_turn(self, turn_id: int | None = None) -> Message | None:
+        """Called when the agent turn completes. Returns the turn's last message."""
         # Flush any accumulated messages
         await self._flush_accumulated_message(trigger="end_turn")
+        # Calls the agent never finished (e.g. in a cancelled turn) will not be updated again
+        self.tool_call_requests.end_turn()
+        last_message, self.last_message = self.last_message, None
         # Queue the end-of-turn sentinel
-        await self._message_queue.put(EndOfTurnMessage())
+        await self._message_queue.put(EndOfTurnMessage(turn_id=turn_id))
+        return last_message
 
     
 
 
 
+def _cached_history(turns: list[tuple[list[Any], list[Any]]]) -> str:
+    """Quote turns answered from the turn cache, for an agent that did not see them."""
+    lines = ["Earlier turns of this conversation, answered without you:"]
+    for prompt, messages in turns:
+        asked = "".join(block.text for block in prompt if isinstance(block, TextContentBlock))
+        answered = "".join(message.text for message in messages if isinstance(message, TextBlock))
+        lines.append(f"User: {asked}")
+        lines.append(f"Assistant: {answered}")
+    return "\n\n".join(lines)
+
+
+def _advertises_fork(response: Any) -> bool:
+    """Whether a raw initialize response lists ``session/fork`` among the agent's capabilities."""
+    capabilities = response.get("agentCapabilities") if isinstance(response, dict) else None
+    sessions = capabilities.get("sessionCapabilities") if isinstance(capabilities, dict) else None
+    return isinstance(sessions, dict) and sessions.get("fork") is not None
+
+
+# Version range of agent-client-protocol whose private internals (below) this module
+# builds on; pyproject.toml pins the same range
+_ACP_SUPPORTED = ">=0.6.3,<0.7"
+
+
+def _check_acp_internals(connection: ClientSideConnection, store: InMemoryMessageStateStore) -> None:
+    """Raise if the installed agent-client-protocol lacks the private attributes the client relies on."""
+    required = {
+        "ClientSideConnection._create_handler": hasattr(ClientSideConnection, "_create_handler"),
+        "DefaultMessageDispatcher._dispatch_notification": hasattr(DefaultMessageDispatcher, "_dispatch_notification"),
+        "InMemoryMessageStateStore._incoming/_outgoing": hasattr(store, "_incoming") and hasattr(store, "_outgoing"),
+        "ClientSideConnection._conn.send_request": hasattr(getattr(connection, "_conn", None), "send_request"),
+    }
+    missing = [name for name, present in required.items() if not present]
+    if missing:
+        try:
+            version = importlib.metadata.version("agent-client-protocol")
+        except importlib.metadata.PackageNotFoundError:
+            version = "unknown"
+        raise RuntimeError(
+            f"agent-client-protocol {version} is not supported (missing {', '.join(missing)}); "
+            f"simple-acp-client needs agent-client-protocol{_ACP_SUPPORTED}"
+        )
+
+
+class _OrderedMessageDispatcher(DefaultMessageDispatcher):
+    """Dispatcher that runs notifications inline, in arrival order.
+
+    The default dispatcher starts a task per notification, so session updates may be
+    handled out of order or after the prompt response that follows them. Running them
+    inline means that once the inbound queue is joined, every update received before
+    a response has been handled.
+    """
+
+    def __init__(self, *, notification_runner: Any, **kwargs: Any) -> None:
+        super().__init__(notification_runner=notification_runner, **kwargs)
+        # Kept here rather than read from the base class's private attribute
+        self._run_notification = notification_runner
+
+    async def _dispatch_notification(self, message: dict[str, Any]) -> None:
+        await self._run_notification(message)
+
+
+class _SDKClientSideConnection(ClientSideConnection):
+    """ClientSideConnection that tracks agent activity and drops unsubscribed session updates.
+
+    Updates the client did not subscribe to are dropped before they are validated, as
+    is the history an agent replays while a session is being reloaded.
+    """
+
+    initialize_response: Any = None
+
+    async def initialize(self, params: InitializeRequest) -> InitializeResponse:
+        # Kept as sent: validating it drops capabilities newer than this schema, such as
+        # sessionCapabilities.fork
+        response = await self._conn.send_request(AGENT_METHODS["initialize"], serialize_params(params))
+        self.initialize_response = response
+        return InitializeResponse.model_validate(response)
+
+    def _create_handler(self, client: _SDKClientImplementation):  # type: ignore[override]
+        handler = super()._create_handler(client)
+        session_update = CLIENT_METHODS["session_update"]
+
+        async def sdk_handler(method: str, params: Any | None, is_notification: bool) -> Any:
+            client.last_activity = time.monotonic()
+            if is_notification:
+                if client.replaying_history and method == session_update:
+                    return None
+                if client.subscribed_updates is not None and method == session_update and isinstance(params, dict):
+                    update = params.get("update")
+                    kind = update.get("sessionUpdate") if isinstance(update, dict) else None
+                    if isinstance(kind, str) and not client._wants_update(kind):
+                        await client._on_dropped_update(kind)
+                        return None
+                return await handler(method, params, is_notification)
+
+            # The agent is waiting on us while a callback runs, so it does not count as idle
+            client.callbacks_in_flight += 1
+            try:
+                return await handler(method, params, is_notification)
+            finally:
+                client.callbacks_in_flight -= 1
+                client.last_activity = time.monotonic()
+
+        return sdk_handler
+
+
 @dataclass
 class PyACPAgentOptions:
     """Configuration options for ACP agent queries.
@@ -252,6 +534,50 @@ class PyACPAgentOptions:
     # Additional ACP-specific options
     agent_program: str | None = None  # Path to ACP agent executable
     agent_args: list[str] = field(default_factory=list)  # Args for agent
+    record_path: str | Path | None = None  # Append every JSON-RPC frame to this gzip log
+    # ACP sessionUpdate kinds to deliver (e.g. {"agent_message_chunk"}); None delivers everything
+    subscribed_updates: Collection[str] | None = None
+    # Emit only ToolUseBlock/ToolResultBlock per tool call instead of every progress update
+    collapse_tool_updates: bool = False
+    # Binary resource blocks larger than this many bytes are decoded to a temp file, not memory
+    resource_spill_threshold: int | None = 1 << 20
+
+    # Turn watchdog: seconds a turn may run in total / without hearing from the agent
+    turn_timeout: float | None = None
+    idle_timeout: float | None = None
+    interrupt_grace: float = 5.0  # Seconds to wait after each escalation step on expiry
+
+    # Answers permission requests; None approves the first allow option offered
+    permission_policy: PermissionPolicy | None = None
+
+    # Persist delivered messages and turn summaries: a TranscriptStore (may be shared
+    # between clients) or a SQLite file path for a store owned by this client
+    transcript: TranscriptStore | str | Path | None = None
+    # Also publish every delivered message, and each ResultMessage, to a hub (see subscribe()):
+    # a BroadcastHub owned by the caller (left open on disconnect; clients sharing one share its
+    # stream), or True for a hub of this client's own, created on connect and closed on disconnect
+    broadcast: BroadcastHub | bool | None = None
+    # Watch the session cwd and report the files each turn changed in its ResultMessage
+    track_changes: bool = False
+    # Answer repeated turns (same agent, model, prompt, history and workspace) from this cache
+    cache: TurnCache | None = None
+    # Before the next prompt that misses the cache, send the agent the prompts it answered
+    # again so its history is its own. This re-runs their tools and costs a model turn each;
+    # by default the cached turns are instead quoted as text ahead of that prompt
+    cache_catch_up: bool = False
+    # Run each session in its own copy of a source tree (overrides cwd); released on disconnect
+    workspace: WorkspaceProvisioner | None = None
+
+    # Admission control: queued turns wait for a slot of this controller (None: the process
+    # default from set_default_admission(), if any) under this tenant key and priority class
+    admission: AdmissionController | None = None
+    tenant: str = "default"
+    priority: int = DEFAULT_PRIORITY
+
+    # Crash recovery: keep a spare initialized agent process to fail over to, and reload
+    # the session on the replacement (session/load) when the agent supports it
+    warm_standby: bool = False
+    restore_session: bool = True
 
 
 
@@ -320,6 +646,31 @@ async def my_spawn_stdio_transport(
                 await process.wait()
 
 
+@dataclass
+class _AgentProcess:
+    """An agent process with an initialized connection, not yet bound to a session."""
+    transport_cm: Any
+    process: aio_subprocess.Process
+    connection: _SDKClientSideConnection
+    client_impl: _SDKClientImplementation
+    rpc_queue: InMemoryMessageQueue
+    capabilities: AgentCapabilities | None
+    recorder: SessionRecorder | None
+    can_fork: bool = False  # Advertises session/fork (agentCapabilities.sessionCapabilities.fork)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def close(self) -> None:
+        with contextlib.suppress(Exception):
+            await self.connection.close()
+        with contextlib.suppress(Exception):
+            await self.transport_cm.__aexit__(None, None, None)
+        if self.recorder is not None:
+            self.recorder.close()
+
+
 class PyACPSDKClient:
     """
     High-level SDK client that maintains conversation sessions across multiple exchanges.
@@ -338,13 +689,46 @@ class PyACPSDKClient:
         self._connection: ClientSideConnection | None = None
         self._session_id: str | None = None
         self._client_impl: _SDKClientImplementation | None = None
-        self._message_queue: asyncio.Queue[Message] = asyncio.Queue()
+        self._message_queue = _TurnQueue()
+        self._rpc_queue: InMemoryMessageQueue | None = None  # Inbound JSON-RPC frames awaiting dispatch
         self._connected = False
         self._transport_cm = None  # Context manager for the transport
-
-        # Timing and turn tracking
-        self._turn_start_time: float | None = None
+        self._agent_command: list[str] = []
+        self._recorder: SessionRecorder | None = None
+        self._attachment_cache = AttachmentCache()
+        self._transcript: TranscriptStore | None = None
+        self._owns_transcript = False
+        self._broadcast: BroadcastHub | None = None
+        self._owns_broadcast = False
+        self._broadcast_turn_start = 0  # Hub position where this client's current turn starts
+        self._watcher: WorkspaceWatcher | None = None
+        self._workspace: Workspace | None = None
+        self._cwd: str = ""
+
+        # Turn cache: key of the session's last turn, turns (prompt, messages) the agent has not
+        # seen because they were answered from the cache, and files written through
+        # fs/write_text_file this turn
+        self._cache_chain = ""
+        self._cache_skipped: list[tuple[list[Any], list[Any]]] = []
+        self._turn_writes: set[str] | None = set()  # None: a write landed outside the cwd
+        self._cache_recording: tuple[Turn, str, int] | None = None  # (turn, key, terminals created before it)
+
+        # Turn scheduling: turns waiting to be sent, and turns whose messages were not yet received
         self._turn_count: int = 0
+        self._pending_turns: asyncio.Queue[Turn | None] = asyncio.Queue()  # None: wake up to recover the agent
+        self._undelivered_turns: deque[Turn] = deque()
+        self._receiving: Turn | None = None  # Turn whose messages receive_messages() is streaming
+        self._active_turn: Turn | None = None
+        self._turn_worker: asyncio.Task | None = None
+        self._prompt_task: asyncio.Task | None = None
+
+        # Agent process supervision
+        self._agent: _AgentProcess | None = None
+        self._agent_exit: asyncio.Future[int] | None = None  # Resolves with the exit code of the current agent
+        self._exit_watcher: asyncio.Task | None = None
+        self._standby: asyncio.Task[_AgentProcess] | None = None
+        self.recoveries = 0
+        introspection.register(self)
 
 
     async def __aenter__(self):
@@ -386,32 +770,230 @@ class PyACPSDKClient:
             spawn_program = agent_command[0]
             spawn_args = agent_command[1:] if len(agent_command) > 1 else []
 
+        # The agent runs in the session cwd; keep paths relative to ours pointing at the same files
+        self._agent_command = [
+            os.path.abspath(part) if os.sep in part and not os.path.isabs(part) and os.path.exists(part) else part
+            for part in (spawn_program, *spawn_args)
+        ]
+        if self.options.workspace is not None and self._workspace is None:
+            self._workspace = await asyncio.to_thread(self.options.workspace.create)
+        self._cwd = str(self._workspace.path if self._workspace is not None else self.options.cwd or os.getcwd())
+        self._open_transcript()
+        self._open_broadcast()
+        try:
+            await self._start_agent()
+        except BaseException:
+            if self._workspace is not None:
+                await asyncio.to_thread(self.options.workspace.release, self._workspace)
+                self._workspace = None
+            raise
+        if self.options.track_changes and self._watcher is None:
+            # Registering a large tree takes a while; keep the loop responsive meanwhile
+            self._watcher = await asyncio.to_thread(watch_workspace, self._cwd, loop=asyncio.get_running_loop())
+
+        self._turn_worker = asyncio.create_task(self._run_turns())
+        self._connected = True
+        self._prepare_standby()
+
+    async def _start_agent(self, resume_session_id: str | None = None) -> None:
+        """
+        Bring up an agent process with a session.
+
+        Uses the warm standby when there is one, otherwise spawns a new process. With
+        ``resume_session_id`` the session is reloaded if the agent supports it, and a new
+        session is created otherwise.
+        """
+        agent = await self._take_standby() or await self._spawn_agent()
+        self._adopt_agent(agent)
+
+        cwd = self._cwd
+        restored = False
+        if resume_session_id is not None and agent.capabilities is not None and agent.capabilities.loadSession:
+            # Falls back to a new session if the agent can't restore this one
+            with contextlib.suppress(Exception):
+                await self._load_session(resume_session_id, cwd)
+                restored = True
+
+        try:
+            if not restored:
+                session = await self._connection.newSession(
+                    NewSessionRequest(
+                        cwd=cwd,
+                        mcpServers=[],
+                    )
+                )
+                self._session_id = session.sessionId
+                self._attachment_cache.clear()
+                self._cache_chain = ""
+                self._cache_skipped.clear()
+        except RequestError as err:
+            await self._close_agent()
+            raise RuntimeError(f"New session failed: {err.to_error_obj()}") from err
+        except Exception as exc:
+            await self._close_agent()
+            raise RuntimeError(f"New session error: {exc}") from exc
+
+        await self._apply_model()
+
+    async def _apply_model(self) -> None:
+        # Set model if specified
+        if self.options.model:
+            try:
+                await self._connection.setSessionModel(
+                    SetSessionModelRequest(
+                        modelId=self.options.model,
+                        sessionId=self._session_id
+                    )
+                )
+            except Exception:
+                # Model setting is optional, don't fail if it doesn't work
+                pass
+
+    async def _load_session(self, session_id: str, cwd: str) -> None:
+        """Reload an existing session, dropping the history the agent replays while loading."""
+        self._client_impl.replaying_history = True
+        try:
+            await self._connection.loadSession(
+                LoadSessionRequest(sessionId=session_id, cwd=cwd, mcpServers=[])
+            )
+            await self._rpc_queue.join()
+        finally:
+            self._client_impl.replaying_history = False
+        self._session_id = session_id
+
+    @property
+    def can_fork(self) -> bool:
+        """Whether the connected agent advertises ``session/fork``, which ``fork_session()`` sends."""
+        return self._agent is not None and self._agent.can_fork
+
+    async def fork_session(self, session_id: str) -> str:
+        """
+        Continue in a copy of the agent session ``session_id`` (``session/fork``).
+
+        The fork starts with the source session's history, which the agent neither
+        replays nor recomputes. The source must be visible to this client's agent process,
+        e.g. because the agent persists its sessions. Only call this between turns.
+
+        Returns:
+            The id of the new session, which this client now uses
+
+        Raises:
+            RuntimeError: If the agent can't fork the session
+        """
+        if not self._connected or self._connection is None:
+            raise RuntimeError("Client not connected. Call connect() first.")
+        try:
+            response = await self._connection._conn.send_request(
+                _SESSION_FORK, {"sessionId": session_id, "cwd": self._cwd, "mcpServers": []}
+            )
+        except RequestError as err:
+            raise RuntimeError(f"Fork session failed: {err.to_error_obj()}") from err
+        if not isinstance(response, dict) or not isinstance(response.get("sessionId"), str):
+            raise RuntimeError(f"Fork session failed: unexpected response {response!r}")
+        self._session_id = response["sessionId"]
+        self._attachment_cache.clear()
+        # The turn cache can't tell what history the source had
+        self._cache_chain = uuid.uuid4().hex
+        self._cache_skipped.clear()
+        await self._apply_model()
+        return self._session_id
+
+    def _open_transcript(self) -> None:
+        transcript = self.options.transcript
+        if transcript is None or self._transcript is not None:
+            return
+        if isinstance(transcript, TranscriptStore):
+            self._transcript = transcript
+        else:
+            self._transcript = TranscriptStore(transcript)
+            self._owns_transcript = True
+
+    def _open_broadcast(self) -> None:
+        broadcast = self.options.broadcast
+        if not broadcast or self._broadcast is not None:
+            return
+        if isinstance(broadcast, BroadcastHub):
+            self._broadcast = broadcast
+        else:
+            self._broadcast = BroadcastHub()
+            self._owns_broadcast = True
+        self._broadcast_turn_start = self._broadcast._end
+
+    def _close_broadcast(self) -> None:
+        # A caller's hub may serve other clients; it is theirs to close
+        if self._broadcast is not None and self._owns_broadcast:
+            self._broadcast.close()
+        self._broadcast = None
+        self._owns_broadcast = False
+
+    async def _close_transcript(self) -> None:
+        # Commits what the writer thread has not yet; a shared store stays open for its other clients
+        if self._transcript is not None and self._owns_transcript:
+            await asyncio.to_thread(self._transcript.close)
+        elif self._transcript is not None:
+            await asyncio.to_thread(self._transcript.flush)
+        self._transcript = None
+        self._owns_transcript = False
+
+    async def _spawn_agent(self) -> _AgentProcess:
+        """Spawn an agent process and initialize its connection."""
+        spawn_program, *spawn_args = self._agent_command
+
         # Spawn the agent process
-        self._transport_cm = my_spawn_stdio_transport(
+        transport_cm = my_spawn_stdio_transport(
             spawn_program,
             *spawn_args,
-            stderr=asyncio.subprocess.PIPE,
             env={**os.environ, **self.options.env},
+            cwd=self._cwd,
+            stderr=asyncio.subprocess.PIPE,
         )
 
         # Enter the transport context manager
-        stdout, stdin, proc = await self._transport_cm.__aenter__()
+        stdout, stdin, proc = await transport_cm.__aenter__()
 
         # Create client implementation
 
-        self._client_impl = _SDKClientImplementation(self._message_queue)
+        client_impl = _SDKClientImplementation(
+            self._message_queue,
+            self.options.subscribed_updates,
+            self.options.collapse_tool_updates,
+            self.options.permission_policy,
+            self._cwd,
+            self._note_write,
+            self.options.resource_spill_threshold,
+            self._broadcast,
+        )
+
+        # Frames are only written once the process is adopted and the recorder opened
+        recorder = SessionRecorder(self.options.record_path) if self.options.record_path is not None else None
 
         # Create connection
-        self._connection = ClientSideConnection(
-            lambda _agent: self._client_impl,
+        rpc_queue = InMemoryMessageQueue()
+        connection = _SDKClientSideConnection(
+            lambda _agent: client_impl,
             stdin,
             stdout,
-            state_store=self._client_impl.state_store,
+            queue=rpc_queue,
+            state_store=client_impl.state_store,
+            dispatcher_factory=lambda queue, supervisor, store, request_runner, notification_runner: _OrderedMessageDispatcher(
+                queue=queue,
+                supervisor=supervisor,
+                store=store,
+                request_runner=request_runner,
+                notification_runner=notification_runner,
+            ),
+            observers=[recorder] if recorder is not None else [],
         )
+        agent = _AgentProcess(transport_cm, proc, connection, client_impl, rpc_queue, None, recorder)
+        try:
+            _check_acp_internals(connection, client_impl.state_store)
+        except RuntimeError:
+            await agent.close()
+            raise
 
         # Initialize the connection
-        try:
-            await self._connection.initialize(
+        initialize = asyncio.ensure_future(
+            connection.initialize(
                 InitializeRequest(
                     protocolVersion=PROTOCOL_VERSION,
                     clientCapabilities=ClientCapabilities(
@@ -420,47 +1002,97 @@ class PyACPSDKClient:
                     ),
                 )
             )
+        )
+        try:
+            # The connection does not fail pending requests on EOF, so watch the process too
+            exited = asyncio.ensure_future(proc.wait())
+            await asyncio.wait({initialize, exited}, return_when=asyncio.FIRST_COMPLETED)
+            exited.cancel()
+            if not initialize.done():
+                initialize.cancel()
+                raise ConnectionError(f"Agent process exited with code {proc.returncode} before initializing")
+            response = initialize.result()
         except RequestError as err:
-            await self._cleanup_connection()
+            await agent.close()
             raise RuntimeError(f"Initialize failed: {err.to_error_obj()}") from err
         except Exception as exc:
-            await self._cleanup_connection()
+            await agent.close()
             raise RuntimeError(f"Initialize error: {exc}") from exc
-
-        # Create new session
-        try:
-            cwd = self.options.cwd or os.getcwd()
-            session = await self._connection.newSession(
-                NewSessionRequest(
-                    cwd=str(cwd),
-                    mcpServers=[],
-                )
+        agent.capabilities = response.agentCapabilities
+        agent.can_fork = _advertises_fork(connection.initialize_response)
+        return agent
+
+    def _adopt_agent(self, agent: _AgentProcess) -> None:
+        """Make ``agent`` the process this client talks to and start watching for its exit."""
+        self._agent = agent
+        self._transport_cm = agent.transport_cm
+        self._client_impl = agent.client_impl
+        self._rpc_queue = agent.rpc_queue
+        self._connection = agent.connection
+        self._recorder = agent.recorder
+        if self._recorder is not None:
+            self._recorder.open(
+                command=list(self._agent_command),
+                cwd=self._cwd,
+                model=self.options.model,
             )
-            self._session_id = session.sessionId
-        except RequestError as err:
-            await self._cleanup_connection()
-            raise RuntimeError(f"New session failed: {err.to_error_obj()}") from err
-        except Exception as exc:
-            await self._cleanup_connection()
-            raise RuntimeError(f"New session error: {exc}") from exc
-
-        # Set model if specified
-        if self.options.model:
-            try:
-                await self._connection.setSessionModel(
-                    SetSessionModelRequest(
-                        modelId=self.options.model,
-                        sessionId=self._session_id
-                    )
-                )
-            except Exception:
-                # Model setting is optional, don't fail if it doesn't work
-                pass
-
-        self._connected = True
+        self._agent_exit = asyncio.get_running_loop().create_future()
+        self._exit_watcher = asyncio.create_task(self._watch_agent_exit(agent.process, self._agent_exit))
+
+    async def _watch_agent_exit(self, process: aio_subprocess.Process, exit_future: asyncio.Future[int]) -> None:
+        """Report an agent process that exits on its own; cancelled when we close it ourselves."""
+        returncode = await process.wait()
+        if not exit_future.done():
+            exit_future.set_result(returncode)
+        # Wake the turn worker so it recovers even if no turn is running
+        self._pending_turns.put_nowait(None)
+
+    def _prepare_standby(self) -> None:
+        """Start spawning a spare agent process in the background if options.warm_standby is set."""
+        if self.options.warm_standby and self._standby is None:
+            self._standby = asyncio.create_task(self._spawn_agent())
+
+    async def _take_standby(self) -> _AgentProcess | None:
+        """Hand over the warm standby, or None if there is none or it did not come up."""
+        standby, self._standby = self._standby, None
+        if standby is None:
+            return None
+        try:
+            agent = await standby
+        except Exception:
+            return None
+        if not agent.alive:
+            await agent.close()
+            return None
+        return agent
+
+    async def _recover_agent(self) -> None:
+        """Replace an agent process that exited, restoring its session where possible."""
+        session_id = self._session_id if self.options.restore_session else None
+        await self._close_agent()
+        await self._start_agent(resume_session_id=session_id)
+        self.recoveries += 1
+        self._prepare_standby()
+
+    @property
+    def _agent_exited(self) -> bool:
+        return self._agent_exit is not None and self._agent_exit.done()
 
     async def _cleanup_connection(self) -> None:
         """Clean up connection resources on error."""
+        await self._stop_turn_worker()
+        await self._close_agent()
+        if self._standby is not None:
+            standby, self._standby = self._standby, None
+            with contextlib.suppress(Exception):
+                await (await standby).close()
+
+    async def _close_agent(self) -> None:
+        """Close the connection and shut down the agent process."""
+        if self._exit_watcher is not None:
+            self._exit_watcher.cancel()
+            self._exit_watcher = None
+
         if self._connection:
             try:
                 await self._connection.close()
@@ -475,36 +1107,453 @@ class PyACPSDKClient:
                 pass
             self._transport_cm = None
 
+        if self._recorder:
+            self._recorder.close()
+            self._recorder = None
+        if self._agent is not None:
+            introspection.forget_process(self._agent.process.pid)
+        self._agent = None
+
     async def query(
         self,
-        prompt: str | AsyncIterable[dict],
-    ) -> None:
+        prompt: str | Iterable[PromptItem] | AsyncIterable[PromptItem],
+        *,
+        turn_timeout: float | None = None,
+        idle_timeout: float | None = None,
+        priority: int | None = None,
+        tenant: str | None = None,
+        cache_key: str | None = None,
+    ) -> Turn:
         """
         Send a new request in streaming mode. Returns immediately - messages stream via receive_messages().
 
+        Prompts are queued and sent one at a time, so the next prompt can be submitted
+        before the previous turn finished. Each turn's messages are delivered by its own
+        receive_messages() call, in submission order.
+
         Args:
-            prompt: The input prompt as a string or async iterable
-            session_id: Session identifier (not used, kept for API compatibility)
+            prompt: The input prompt as a string, or a list / async iterable of blocks. Blocks may be
+                strings, FileAttachment objects (see ``file_attachment()``), ACP content blocks or dicts.
+            turn_timeout: Deadline for the whole turn, overriding options.turn_timeout
+            idle_timeout: Longest gap without agent activity, overriding options.idle_timeout
+            priority: Admission control class, overriding options.priority
+            tenant: Admission control fairness key, overriding options.tenant
+            cache_key: With options.cache, identifies the workspace state instead of hashing the cwd
+
+        Returns:
+            The queued Turn; await it for the stop reason, or the error that ended it
         """
-        if not self._connected or not self._connection or not self._session_id:
+        # Only the turn worker talks to the agent, so turns can be queued while it recovers
+        if not self._connected:
             raise RuntimeError("Client not connected. Call connect() first.")
 
-        # Record turn start time and increment counter
-        self._turn_start_time = time.time()
+        # Convert prompt to ACP format
+        attachments: dict[bytes, str] = {}
+        prompt_blocks = await self._build_prompt_blocks(prompt, attachments)
+
+        # Queue the turn; the turn worker sends prompts one at a time in FIFO order
         self._turn_count += 1
+        turn = Turn(
+            turn_id=self._turn_count,
+            prompt=prompt_blocks,
+            turn_timeout=turn_timeout,
+            idle_timeout=idle_timeout,
+            tenant=tenant if tenant is not None else self.options.tenant,
+            priority=priority if priority is not None else self.options.priority,
+            cache_key=cache_key,
+            attachments=attachments,
+        )
+        self._undelivered_turns.append(turn)
+        self._pending_turns.put_nowait(turn)
+        return turn
 
-        # Convert prompt to ACP format
-        assert isinstance(prompt, str)
-        prompt_blocks = [acp_text_block(prompt)]
-        # Send prompt request without blocking (fire-and-forget)
-        asyncio.create_task(
+    async def _run_turns(self) -> None:
+        """Send queued turns to the agent one at a time, replacing the agent if it exited."""
+        while True:
+            turn = await self._pending_turns.get()
+            admission = await self._admit(turn) if turn is not None else None
+            try:
+                if self._agent_exited:
+                    try:
+                        await self._recover_agent()
+                    except Exception as exc:
+                        if turn is not None:
+                            await self._end_turn(turn, error=ConnectionError(f"Agent recovery failed: {exc}"))
+                        continue
+                if turn is not None:  # None only wakes the worker to recover
+                    await self._run_turn(turn)
+            finally:
+                if admission is not None:
+                    admission.release()
+
+    async def _admit(self, turn: Turn) -> Admission | None:
+        """Wait until the admission controller lets ``turn`` run."""
+        controller = self.options.admission or get_default_admission()
+        if controller is None:
+            return None
+        try:
+            return await controller.acquire(turn.tenant, turn.priority)
+        except asyncio.CancelledError:
+            await self._end_turn(turn, error=ConnectionError("Client disconnected before the turn was sent"))
+            raise
+
+    async def _run_turn(self, turn: Turn) -> None:
+        key: str | None = None
+        entry: CachedTurn | None = None
+        if self.options.cache is not None:
+            try:
+                key = await self._cache_key(turn)
+                entry = await asyncio.to_thread(self.options.cache.get, key)
+                if entry is None and self._cache_skipped and self.options.cache_catch_up:
+                    await self._catch_up()
+            except asyncio.CancelledError:
+                await self._end_turn(turn, error=ConnectionError("Client disconnected before the turn was sent"))
+                raise
+            except Exception as exc:
+                await self._end_turn(turn, error=RuntimeError(f"Turn cache failed: {exc}"))
+                return
+
+        self._active_turn = turn
+        self._message_queue.turn_id = turn.turn_id
+        if self._transcript is not None:
+            self._client_impl.transcript = functools.partial(self._transcript.append, self._session_id or "", turn.turn_id)
+        turn.start()
+        if self._broadcast is not None:
+            self._broadcast_turn_start = self._broadcast.begin_turn()
+        if self._watcher is not None:
+            await self._watcher_call(self._watcher.begin_turn)
+        if entry is not None:
+            if await self._replay_cached(turn, key, entry):
+                return
+            try:
+                if self._cache_skipped and self.options.cache_catch_up:
+                    await self._catch_up()
+            except asyncio.CancelledError:
+                await self._end_turn(turn, error=ConnectionError("Client disconnected before the turn was sent"))
+                raise
+            except Exception as exc:
+                await self._end_turn(turn, error=RuntimeError(f"Turn cache failed: {exc}"))
+                return
+
+        terminals = self._client_impl._terminal_counter
+        self._turn_writes = set()
+        if key is not None:
+            self._client_impl.recording = []
+            self._cache_recording = (turn, key, terminals)
+        stop_reason: str | None = None
+        error: BaseException | None = None
+        impl = self._client_impl
+        prompt = turn.prompt
+        if self._cache_skipped:
+            # Without catch-up the agent learns about the cached turns as context of this prompt
+            prompt = [TextContentBlock(type="text", text=_cached_history(self._cache_skipped)), *prompt]
+            self._cache_skipped.clear()
+        prompt_task = self._prompt_task = asyncio.create_task(
             self._connection.prompt(
                 PromptRequest(
                     sessionId=self._session_id,
-                    prompt=prompt_blocks,
+                    prompt=prompt,
                 )
             )
         )
+        # The request is written when the task first runs, before waiters of ``sent`` resume
+        turn.mark_sent()
+        try:
+            response = await self._watch_turn(turn, prompt_task)
+            stop_reason = response.stopReason
+            if self._client_impl is impl:
+                # The agent answered the prompt, so it has the content it embeds; a replaced
+                # agent may not
+                self._attachment_cache.update(turn.attachments)
+        except asyncio.CancelledError:
+            prompt_task.cancel()
+            await self._end_turn(turn, error=ConnectionError("Client disconnected before the turn finished"))
+            raise
+        except RequestError as err:
+            error = RuntimeError(f"Prompt failed: {err.to_error_obj()}")
+            error.__cause__ = err
+        except Exception as exc:
+            error = exc
+        await self._end_turn(turn, stop_reason, error)
+
+    async def _cache_key(self, turn: Turn) -> str:
+        cache = self.options.cache
+        workspace = turn.cache_key
+        if workspace is None:
+            workspace = await asyncio.to_thread(cache.workspace_digest, self._cwd)
+        subscribed = self.options.subscribed_updates
+        return cache.key(
+            agent_command=self._agent_command,
+            prompt=turn.prompt,
+            model=self.options.model,
+            workspace=workspace,
+            previous=self._cache_chain,
+            delivery={
+                "updates": sorted(subscribed) if subscribed is not None else None,
+                "collapse_tool_updates": self.options.collapse_tool_updates,
+            },
+        )
+
+    async def _replay_cached(self, turn: Turn, key: str, entry: CachedTurn) -> bool:
+        """
+        Finish ``turn`` from the cache: restore the files it wrote and deliver its messages again.
+
+        Returns False, after evicting the entry, if its files can't be restored; the agent
+        then answers the turn instead.
+        """
+        try:
+            written = await asyncio.to_thread(apply_files, self._cwd, entry.files)
+        except OSError:
+            with contextlib.suppress(OSError):
+                await asyncio.to_thread(self.options.cache.discard, key)
+            return False
+        turn.cached = True
+        for path, created in written:
+            self._note_write(path, created)
+        for message in entry.messages:
+            if hasattr(message, "timestamp_ns"):
+                message.timestamp_ns = time.time_ns()
+            await self._client_impl._publish(message)
+        # The agent is told about this turn before the next prompt it has to answer
+        self._cache_skipped.append((turn.prompt, entry.messages))
+        self._cache_chain = key
+        await self._end_turn(turn, entry.stop_reason)
+        return True
+
+    async def _catch_up(self) -> None:
+        """
+        Send the agent the prompts answered from the cache, so its history matches the conversation.
+
+        Only used with ``cache_catch_up``. Their messages are dropped and their file writes are
+        acknowledged without being performed, since the cache already applied them. Terminal
+        commands and other tools do run again, and each prompt costs a model turn.
+        """
+        impl = self._client_impl
+        impl.replaying_history = True
+        impl.discard_writes = True
+        try:
+            while self._cache_skipped:
+                await self._connection.prompt(
+                    PromptRequest(sessionId=self._session_id, prompt=self._cache_skipped[0][0])
+                )
+                await self._rpc_queue.join()
+                self._cache_skipped.pop(0)
+        finally:
+            impl.replaying_history = False
+            impl.discard_writes = False
+
+    async def _store_turn(self, turn: Turn, stop_reason: str | None, error: BaseException | None) -> None:
+        """Add a turn that just ended to the cache if its effects on the workspace are known."""
+        _, key, terminals = self._cache_recording
+        self._cache_recording = None
+        impl = self._client_impl
+        messages = impl.recording if impl is not None else None
+        if impl is not None:
+            impl.recording = None
+        if error is not None or stop_reason == "cancelled":
+            # The agent's state after a failed turn is unknown; later turns of the session can't match
+            self._cache_chain = uuid.uuid4().hex
+            return
+        self._cache_chain = key
+        if messages is None:
+            return
+        changes = turn.changes
+        if changes is not None:
+            if changes.overflowed:
+                return
+            paths = changes.created | changes.modified | changes.deleted
+        elif impl._terminal_counter != terminals or self._turn_writes is None:
+            # A terminal command or a write outside the cwd may have changed files we can't see
+            return
+        else:
+            paths = self._turn_writes
+        # A cache that can't be written (full disk, unpicklable message) must not fail the turn
+        with contextlib.suppress(Exception):
+            files = await asyncio.to_thread(read_files, self._cwd, sorted(paths))
+            await asyncio.to_thread(self.options.cache.put, key, CachedTurn(stop_reason or "end_turn", messages, files))
+
+    async def _watch_turn(self, turn: Turn, prompt_task: asyncio.Task) -> Any:
+        """Wait for the prompt response, enforcing the turn and idle deadlines."""
+        turn_timeout = turn.turn_timeout if turn.turn_timeout is not None else self.options.turn_timeout
+        idle_timeout = turn.idle_timeout if turn.idle_timeout is not None else self.options.idle_timeout
+        if turn_timeout is None and idle_timeout is None:
+            await asyncio.wait({prompt_task, self._agent_exit, turn.cancel_requested}, return_when=asyncio.FIRST_COMPLETED)
+            if turn.cancel_requested.done() and not prompt_task.done() and not self._agent_exited:
+                return await self._cancel_prompt(prompt_task)
+            return self._prompt_result(prompt_task)
+
+        started = time.monotonic()
+        turn_deadline = started + turn_timeout if turn_timeout is not None else None
+        while True:
+            now = time.monotonic()
+            idle_deadline = None
+            if idle_timeout is not None:
+                impl = self._client_impl
+                if impl is not None and impl.callbacks_in_flight:
+                    idle_deadline = now + idle_timeout  # Re-check once the callbacks finish
+                else:
+                    last_activity = max(impl.last_activity, started) if impl is not None else started
+                    idle_deadline = last_activity + idle_timeout
+            deadline = min(d for d in (turn_deadline, idle_deadline) if d is not None)
+
+            done, _ = await asyncio.wait(
+                {prompt_task, self._agent_exit, turn.cancel_requested},
+                timeout=max(deadline - now, 0),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if turn.cancel_requested in done and not prompt_task.done() and not self._agent_exited:
+                return await self._cancel_prompt(prompt_task)
+            if done:
+                return self._prompt_result(prompt_task)
+
+            now = time.monotonic()
+            if turn_deadline is not None and now >= turn_deadline:
+                error = TurnTimeoutError("turn", turn_timeout)
+            elif idle_deadline is not None and now >= idle_deadline and not (
+                self._client_impl is not None and self._client_impl.callbacks_in_flight
+            ):
+                error = TurnTimeoutError("idle", idle_timeout)
+            else:
+                continue
+            await self._expire_turn(prompt_task)
+            raise error
+
+    async def _cancel_prompt(self, prompt_task: asyncio.Task) -> Any:
+        """
+        Stop a turn the caller cancelled: notify the agent, kill the turn's terminals and wait
+        for the agent to answer the prompt.
+
+        An agent that doesn't answer within ``options.interrupt_grace`` is replaced.
+        """
+        with contextlib.suppress(Exception):
+            await self._connection.cancel(CancelNotification(sessionId=self._session_id))
+        # Commands the agent is waiting on would otherwise hold up its answer
+        if self._client_impl is not None:
+            await self._client_impl.kill_terminals()
+        await asyncio.wait({prompt_task, self._agent_exit}, timeout=self.options.interrupt_grace, return_when=asyncio.FIRST_COMPLETED)
+        if prompt_task.done() or self._agent_exited:
+            return self._prompt_result(prompt_task)
+        prompt_task.cancel()
+        await self._recycle_agent()
+        return PromptResponse(stopReason="cancelled")
+
+    def _prompt_result(self, prompt_task: asyncio.Task) -> Any:
+        """Result of a finished prompt, or AgentExitedError if the agent died first."""
+        if prompt_task.done():
+            return prompt_task.result()
+        prompt_task.cancel()
+        raise AgentExitedError(self._agent_exit.result())
+
+    async def _expire_turn(self, prompt_task: asyncio.Task) -> None:
+        """
+        Reclaim a turn that missed its deadline.
+
+        Escalates one step at a time, waiting ``options.interrupt_grace`` after each for the
+        prompt to finish: cancel the turn, kill its terminals, then replace the agent process.
+        """
+        grace = self.options.interrupt_grace
+        with contextlib.suppress(Exception):
+            await self.interrupt()
+        done, _ = await asyncio.wait({prompt_task}, timeout=grace)
+        if not done and self._client_impl is not None:
+            await self._client_impl.kill_terminals()
+            done, _ = await asyncio.wait({prompt_task}, timeout=grace)
+        if not done:
+            prompt_task.cancel()
+            await self._recycle_agent()
+        # The turn is reported as timed out whatever the agent answered
+        if prompt_task.done() and not prompt_task.cancelled():
+            prompt_task.exception()
+
+    async def _recycle_agent(self) -> None:
+        """Replace an unresponsive agent process with a fresh one and a new session."""
+        impl = self._client_impl
+        if impl is not None:
+            # Text the agent streamed before it stopped answering still belongs to the turn
+            await impl._flush_accumulated_message(trigger="recycle")
+            impl.transcript = None
+        await self._close_agent()
+        await self._start_agent()
+        self._prepare_standby()
+
+    async def _end_turn(self, turn: Turn, stop_reason: str | None = None, error: BaseException | None = None) -> None:
+        """Deliver the rest of a turn's messages, queue its sentinel and resolve its future."""
+        if self._active_turn is turn:
+            self._active_turn = None
+        if self._rpc_queue is not None and error is None:
+            # Let updates that arrived before the prompt response be handled first
+            await self._rpc_queue.join()
+        if self._watcher is not None and turn.started_at is not None:
+            turn.changes = await self._watcher_call(self._watcher.end_turn)
+        last_message = None
+        if self._client_impl is not None:
+            last_message = await self._client_impl._on_end_turn(turn.turn_id)
+            self._client_impl.transcript = None
+        else:
+            await self._message_queue.put(EndOfTurnMessage(turn_id=turn.turn_id))
+        try:
+            if self._cache_recording is not None and self._cache_recording[0] is turn:
+                # Stored before the turn resolves, so a disconnect right after it can't lose the entry
+                await self._store_turn(turn, stop_reason, error)
+        finally:
+            turn.finish(stop_reason, error)
+        turn.result = self._result_message(turn, last_message)
+        if self._transcript is not None:
+            self._transcript.end_turn(turn.result.session_id, turn.turn_id, turn.result, turn.prompt)
+        if self._broadcast is not None:
+            await self._broadcast.publish(turn.result)
+
+    async def _watcher_call(self, method: Callable[[], Any]) -> Any:
+        # Polling watchers walk the whole tree, which would stall the loop on a large repo
+        if self._watcher is not None and self._watcher.scans:
+            return await asyncio.to_thread(method)
+        return method()
+
+    def _note_write(self, path: Path, created: bool) -> None:
+        if self._watcher is not None:
+            self._watcher.note_write(path, created)
+        if self._turn_writes is not None:
+            try:
+                self._turn_writes.add(Path(os.path.realpath(path)).relative_to(os.path.realpath(self._cwd)).as_posix())
+            except ValueError:
+                self._turn_writes = None
+
+    async def _stop_turn_worker(self) -> None:
+        """Stop sending turns and fail every turn that has not finished."""
+        if self._turn_worker is not None:
+            self._turn_worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._turn_worker
+            self._turn_worker = None
+        while not self._pending_turns.empty():
+            turn = self._pending_turns.get_nowait()
+            if turn is None:
+                continue
+            await self._end_turn(turn, error=ConnectionError("Client disconnected before the turn was sent"))
+
+    async def _build_prompt_blocks(
+        self,
+        prompt: str | Iterable[PromptItem] | AsyncIterable[PromptItem],
+        attachments: dict[bytes, str],
+    ) -> list[Any]:
+        """ACP blocks of a prompt; content hashes of the attachments it embeds are added to ``attachments``."""
+        if isinstance(prompt, str):
+            items: list[PromptItem] = [prompt]
+        elif isinstance(prompt, AsyncIterable):
+            items = [item async for item in prompt]
+        else:
+            items = list(prompt)
+
+        blocks = []
+        for item in items:
+            if isinstance(item, FileAttachment):
+                # Hashing and encoding large files would stall the event loop
+                blocks.append(await asyncio.to_thread(prompt_block, item, self._attachment_cache, attachments))
+            else:
+                blocks.append(prompt_block(item))
+        if not blocks:
+            raise ValueError("Prompt must contain at least one block")
+        return blocks
 
     async def receive_messages(self) -> AsyncIterator[Message]:
         """
@@ -514,19 +1563,37 @@ class PyACPSDKClient:
             Message objects from the conversation, with ResultMessage as the final message
         """
         last_message = None
-        while True:
-            message = await self._message_queue.get()
-            if isinstance(message, EndOfTurnMessage):
-                # Turn is complete, stop streaming
-                break
-            setattr(message, "timestamp", datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3])
-            yield message
-            last_message = message
-
-        # Calculate timing
-        turn_end_time = time.time()
-        duration_ms = int((turn_end_time - self._turn_start_time) * 1000) if self._turn_start_time else 0
+        turn = self._undelivered_turns[0] if self._undelivered_turns else None
+        turn_id = turn.turn_id if turn is not None else self._turn_count
+        self._receiving = turn
+        try:
+            while True:
+                tag, message = await self._message_queue.get()
+                if isinstance(message, EndOfTurnMessage):
+                    if tag < turn_id:
+                        continue  # End of a cancelled turn nobody was receiving
+                    # Turn is complete, stop streaming
+                    break
+                if tag < turn_id or tag <= self._message_queue.fence:
+                    continue  # Stale: sent by the agent for an earlier or cancelled turn
+                yield message
+                last_message = message
+        finally:
+            self._receiving = None
+
+        if self._undelivered_turns and self._undelivered_turns[0] is turn:
+            self._undelivered_turns.popleft()
+        if turn is not None:
+            # The sentinel is queued just before the future resolves
+            await asyncio.wait([turn.future])
+
+        result_message = turn.result if turn is not None else None
+        if result_message is None:
+            result_message = self._result_message(turn, last_message)
+        yield result_message
 
+    def _result_message(self, turn: Turn | None, last_message: Message | None) -> ResultMessage:
+        """The ResultMessage that closes ``turn``; its text comes from the turn's last message."""
         # Extract result from last message
         result_text = None
         if last_message:
@@ -537,23 +1604,123 @@ class PyACPSDKClient:
             elif isinstance(last_message, OtherUpdate):
                 result_text = f"{last_message.update_name}: {last_message.update}"
 
-        # Create and yield ResultMessage as final message
-        result_message = ResultMessage(
-            subtype="final",
+        stop_reason = turn.stop_reason if turn is not None else "end_turn"
+        error = turn.error if turn is not None else None
+        if isinstance(error, TurnTimeoutError):
+            subtype = "error_timeout"
+            result_text = str(error)
+        elif error is not None:
+            subtype = "error"
+            result_text = str(error)
+        elif stop_reason == "end_turn":
+            subtype = "final"
+        else:
+            subtype = stop_reason or "final"
+
+        duration_ms = turn.duration_ms if turn is not None else 0
+        return ResultMessage(
+            subtype=subtype,
             duration_ms=duration_ms,
             duration_api_ms=duration_ms,  # We don't separate API time, so use same value
-            is_error=False,
-            num_turns=self._turn_count,
+            is_error=error is not None,
+            num_turns=turn.turn_id if turn is not None else self._turn_count,
             session_id=self._session_id or "",
             result=result_text,
             usage=None,
             total_cost_usd=None,
+            stop_reason=None if error is not None else stop_reason,
+            changed_files=turn.changes.as_dict() if turn is not None and turn.changes is not None else None,
+            cached=turn.cached if turn is not None else False,
         )
-        yield result_message
+
+    def stats(self) -> ClientStats:
+        """
+        What this client currently holds: queues, buffers, terminals, processes, requests and tasks.
+
+        Cheap enough to poll every second; see ``simple_acp_client.introspection``.
+        """
+        impl = self._client_impl
+        terminals = tuple(impl.terminals.values()) if impl is not None else ()
+        subprocesses = sum(1 for terminal in terminals if terminal.process.returncode is None)
+        tasks = [self._turn_worker, self._exit_watcher, self._standby, self._prompt_task]
+        tasks.extend(terminal._output_task for terminal in terminals)
+        agent = None
+        if self._agent is not None and self._agent.alive:
+            subprocesses += 1
+            agent = introspection.process_stats(self._agent.process.pid)
+        standby = self._standby
+        if standby is not None and standby.done() and not standby.cancelled() and standby.exception() is None:
+            subprocesses += standby.result().alive
+        connection = getattr(self._connection, "_conn", None)
+        supervised = getattr(getattr(connection, "_tasks", None), "_tasks", ())
+        inbound = getattr(self._rpc_queue, "_queue", None)
+        return ClientStats(
+            session_id=self._session_id,
+            connected=self._connected,
+            queued_messages=self._message_queue.qsize(),
+            pending_turns=self._pending_turns.qsize(),
+            undelivered_turns=len(self._undelivered_turns),
+            accumulated_bytes=sys.getsizeof(impl.accumulated_message) if impl is not None and impl.accumulated_message else 0,
+            tool_calls=len(impl.tool_call_requests) if impl is not None else 0,
+            terminals=len(terminals),
+            terminal_output_bytes=sum(len(terminal.output_buffer) for terminal in terminals),
+            subprocesses=subprocesses,
+            pending_requests=impl.state_store.pending_outgoing if impl is not None else 0,
+            pending_callbacks=impl.state_store.pending_incoming if impl is not None else 0,
+            inbound_frames=inbound.qsize() if inbound is not None else 0,
+            tasks=sum(1 for task in tasks if task is not None and not task.done())
+            + sum(1 for task in tuple(supervised) if not task.done()),
+            agent=agent,
+        )
+
+    def subscribe(self, *, policy: str | None = None, replay: str = "turn") -> Subscription:
+        """
+        Follow this client's messages independently of ``receive_messages()``.
+
+        Requires ``options.broadcast`` and a connected client; see ``BroadcastHub.subscribe()``
+        for the arguments. ``replay="turn"`` starts at this client's current turn, even on a
+        hub shared with other clients.
+        """
+        if self._broadcast is None:
+            raise RuntimeError("Broadcasting is off; set PyACPAgentOptions.broadcast and connect() first")
+        return self._broadcast.subscribe(policy=policy, replay=replay, turn_start=self._broadcast_turn_start)
+
+    async def cancel(self) -> str | None:
+        """
+        Cancel the running turn and return once the agent has acknowledged it.
+
+        Messages the turn has not delivered yet are discarded, so the client can be
+        queried again right away without draining the turn first. The turn's terminal
+        commands are killed. If the agent does not answer within
+        ``options.interrupt_grace`` seconds, its process is replaced. A
+        ``receive_messages()`` call streaming the turn ends with its ResultMessage.
+        Turns queued behind it still run.
+
+        Returns:
+            The cancelled turn's stop reason, or None if no turn was running
+        """
+        if not self._connected:
+            raise RuntimeError("Client not connected. Call connect() first.")
+        turn = self._active_turn
+        if turn is None:
+            return None
+        self._message_queue.fence = max(self._message_queue.fence, turn.turn_id)
+        if not turn.cancel_requested.done():
+            turn.cancel_requested.set_result(None)
+        await asyncio.wait([turn.future])
+        if self._receiving is not turn:
+            # Nobody is reading the turn, so nobody will: drop it and what it queued
+            with contextlib.suppress(ValueError):
+                self._undelivered_turns.remove(turn)
+            self._message_queue.purge()
+        return turn.stop_reason
 
     async def interrupt(self) -> None:
         """
         Send interrupt signal (only works in streaming mode).
+
+        Unlike ``cancel()`` this only notifies the agent; the turn's remaining messages
+        are still delivered.
         """
         if not self._connected or not self._connection or not self._session_id:
             raise RuntimeError("Client not connected. Call connect() first.")
@@ -563,22 +1730,16 @@ class PyACPSDKClient:
         )
 
     async def disconnect(self) -> None:
-
-
-        if self._connection:
-            try:
-                await self._connection.close()
-            except Exception:
-                pass
-            self._connection = None
-
-        # Exit transport context manager (handles process cleanup)
-        if self._transport_cm:
-            try:
-                await self._transport_cm.__aexit__(None, None, None)
-            except Exception:
-                pass
-            self._transport_cm = None
+        # Stops the turn worker, then exits the transport context manager (handles process cleanup)
+        await self._cleanup_connection()
+        await self._close_transcript()
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        if self._workspace is not None:
+            await asyncio.to_thread(self.options.workspace.release, self._workspace)
+            self._workspace = None
+        self._close_broadcast()
 
         self._connected = False
         self._session_id = None
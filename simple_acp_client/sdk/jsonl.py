@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import sys
+from typing import Any, BinaryIO
+
+
+class JsonlWriter:
+    """
+    Buffered asynchronous JSON-lines writer.
+
+    Lines are collected until ``batch_bytes`` are buffered or ``flush_interval``
+    seconds passed since the first unwritten line, then written in one call on a
+    worker thread. ``write()`` only waits when more than ``high_water`` bytes are
+    still unwritten, which pushes back on producers when the reader is slow.
+
+    Args:
+        stream: Binary stream to write to; defaults to ``sys.stdout.buffer``
+        batch_bytes: Buffered size that triggers an immediate write
+        flush_interval: Longest time a line waits in the buffer
+        high_water: Unwritten bytes above which ``write()`` blocks until a batch is written
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO | None = None,
+        *,
+        batch_bytes: int = 64 * 1024,
+        flush_interval: float = 0.05,
+        high_water: int = 1024 * 1024,
+    ) -> None:
+        self.stream = stream
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.high_water = high_water
+        self._buffer: list[bytes] = []
+        self._buffered = 0
+        self._has_data = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._write_lock = asyncio.Lock()
+        self._flusher: asyncio.Task | None = None
+        self._error: BaseException | None = None
+
+    async def write(self, payload: dict[str, Any]) -> None:
+        """Queue one JSON line, waiting only if too much output is still unwritten."""
+        if self._error is not None:
+            raise self._error
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+        line = json.dumps(payload, separators=(",", ":")).encode("utf-8") + b"\n"
+        self._buffer.append(line)
+        self._buffered += len(line)
+        self._has_data.set()
+        if self._buffered >= self.batch_bytes:
+            self._batch_full.set()
+        if self._buffered >= self.high_water:
+            self._drained.clear()
+            await self._drained.wait()
+            if self._error is not None:
+                raise self._error
+
+    async def flush(self) -> None:
+        """Write everything buffered so far."""
+        async with self._write_lock:
+            while self._buffer:
+                batch = b"".join(self._buffer)
+                self._buffer.clear()
+                self._buffered = 0
+                self._has_data.clear()
+                self._batch_full.clear()
+                try:
+                    await asyncio.to_thread(self._write_out, batch)
+                except Exception as exc:
+                    # Output is gone (e.g. reader closed the pipe); fail later writes too
+                    self._error = exc
+                    self._buffer.clear()
+                    self._buffered = 0
+                    self._drained.set()
+                    raise
+            self._drained.set()
+
+    async def close(self) -> None:
+        """Write what is still buffered; raises if any output was lost, e.g. to a closed pipe."""
+        if self._flusher is not None:
+            # Holding the lock, the flusher is not mid-write: a write cancelled while its
+            # thread still runs would race the final flush and could reorder lines
+            async with self._write_lock:
+                self._flusher.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await self._flusher
+                self._flusher = None
+        if self._error is not None:
+            raise self._error
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_data.wait()
+            if self._buffered < self.batch_bytes:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                return
+
+    def _write_out(self, data: bytes) -> None:
+        stream = self.stream if self.stream is not None else sys.stdout.buffer
+        stream.write(data)
+        stream.flush()
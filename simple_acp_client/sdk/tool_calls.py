@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from acp.schema import ToolCallProgress, ToolCallStart
+
+# Statuses after which an agent sends no further updates for a tool call
+_FINAL_STATUSES = frozenset({"completed", "failed"})
+# Ids of ended calls remembered per session, so late updates for them are ignored
+_MAX_ENDED = 1024
+
+
+@dataclass(slots=True)
+class ToolCallState:
+    """Latest known state of a tool call, merged from its start and progress updates."""
+
+    tool_call_id: str
+    title: str | None = None
+    kind: str | None = None
+    status: str | None = None
+    content: list[Any] | None = None
+    locations: list[Any] | None = None
+    raw_input: Any = None
+    raw_output: Any = None
+
+    def apply(self, update: ToolCallStart | ToolCallProgress) -> None:
+        """Merge the fields set in ``update`` into this state in place."""
+        if update.title is not None:
+            self.title = update.title
+        if update.kind is not None:
+            self.kind = update.kind
+        if update.status is not None:
+            self.status = update.status
+        if update.content is not None:
+            self.content = list(update.content)
+        if update.locations is not None:
+            self.locations = list(update.locations)
+        if update.rawInput is not None:
+            self.raw_input = update.rawInput
+        if update.rawOutput is not None:
+            self.raw_output = update.rawOutput
+
+    @property
+    def finished(self) -> bool:
+        return self.status in _FINAL_STATUSES
+
+
+class ToolCallIndex:
+    """Per-session index of in-flight tool calls keyed by ``toolCallId``.
+
+    Finished calls are dropped from the index so it only ever holds the calls
+    that are still running. Their ids are remembered, and so are those of calls
+    still open when their turn ended, so an update arriving afterwards does not
+    bring them back.
+    """
+
+    def __init__(self) -> None:
+        self._sessions: dict[str, dict[str, ToolCallState]] = {}
+        self._ended: dict[str, OrderedDict[str, None]] = {}
+
+    def apply(
+        self, session_id: str, update: ToolCallStart | ToolCallProgress
+    ) -> tuple[ToolCallState | None, bool]:
+        """Merge an update into the index.
+
+        Returns:
+            The merged state and whether this was the first update seen for the call;
+            the state is None if the call has already ended
+        """
+        if update.toolCallId in self._ended.get(session_id, ()):
+            return None, False
+        calls = self._sessions.setdefault(session_id, {})
+        state = calls.get(update.toolCallId)
+        is_new = state is None
+        if state is None:
+            state = calls[update.toolCallId] = ToolCallState(tool_call_id=update.toolCallId)
+        state.apply(update)
+        if state.finished:
+            del calls[update.toolCallId]
+            if not calls:
+                del self._sessions[session_id]
+            self._end(session_id, [update.toolCallId])
+        return state, is_new
+
+    def end_turn(self, session_id: str | None = None) -> None:
+        """Forget the calls still open when a turn ended, e.g. because it was cancelled."""
+        for sid in [session_id] if session_id is not None else list(self._sessions):
+            calls = self._sessions.pop(sid, None)
+            if calls:
+                self._end(sid, calls)
+
+    def _end(self, session_id: str, tool_call_ids) -> None:
+        ended = self._ended.setdefault(session_id, OrderedDict())
+        for tool_call_id in tool_call_ids:
+            ended[tool_call_id] = None
+        while len(ended) > _MAX_ENDED:
+            ended.popitem(last=False)
+
+    def get(self, session_id: str, tool_call_id: str) -> ToolCallState | None:
+        return self._sessions.get(session_id, {}).get(tool_call_id)
+
+    def active(self, session_id: str) -> list[ToolCallState]:
+        return list(self._sessions.get(session_id, {}).values())
+
+    def clear(self, session_id: str | None = None) -> None:
+        if session_id is None:
+            self._sessions.clear()
+            self._ended.clear()
+        else:
+            self._sessions.pop(session_id, None)
+            self._ended.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return sum(len(calls) for calls in self._sessions.values())
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from simple_acp_client.admission import DEFAULT
+from simple_acp_client.core import ResultMessage
+from simple_acp_client.workspace.watcher import WorkspaceChanges
+
+
+class TurnTimeoutError(TimeoutError):
+    """Raised into a turn whose deadline (``reason="turn"``) or idle deadline (``reason="idle"``) expired."""
+
+    def __init__(self, reason: str, timeout: float) -> None:
+        self.reason = reason
+        self.timeout = timeout
+        what = "Turn" if reason == "turn" else "Idle gap"
+        super().__init__(f"{what} exceeded {timeout:g}s deadline")
+
+    def __reduce__(self):
+        return type(self), (self.reason, self.timeout)
+
+
+class AgentExitedError(ConnectionError):
+    """Raised into a turn whose agent process exited before answering the prompt."""
+
+    def __init__(self, returncode: int | None) -> None:
+        self.returncode = returncode
+        super().__init__(f"Agent process exited with code {returncode}")
+
+    def __reduce__(self):
+        return type(self), (self.returncode,)
+
+
+def _new_future() -> asyncio.Future[str]:
+    return asyncio.get_running_loop().create_future()
+
+
+@dataclass(eq=False)
+class Turn:
+    """
+    One prompt submitted through ``PyACPSDKClient.query()``.
+
+    Turns are sent to the agent one at a time in submission order. ``future`` resolves
+    with the agent's stop reason (``end_turn``, ``max_tokens``, ``cancelled``, ...) or
+    fails with the error that ended the turn; awaiting the turn waits for it.
+    """
+
+    turn_id: int
+    prompt: list[Any]
+    future: asyncio.Future[str] = field(default_factory=_new_future, repr=False)
+    cancel_requested: asyncio.Future[None] = field(default_factory=_new_future, repr=False)  # Set by cancel()
+    sent: asyncio.Future[None] = field(default_factory=_new_future, repr=False)  # Set once the prompt was sent or the turn ended
+    turn_timeout: float | None = None  # Overrides PyACPAgentOptions.turn_timeout
+    idle_timeout: float | None = None  # Overrides PyACPAgentOptions.idle_timeout
+    tenant: str = "default"  # Admission control fairness key
+    priority: int = DEFAULT  # Admission control class; lower is admitted first
+    queued_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    changes: WorkspaceChanges | None = None  # Files changed during the turn, with options.track_changes
+    result: ResultMessage | None = None  # Set when the turn ends
+    cache_key: str | None = None  # Replaces the workspace hash in the TurnCache key
+    cached: bool = False  # Served from options.cache
+    # Content hashes of attachments the prompt embeds -> their URIs; remembered by the
+    # session once the prompt was sent, so later prompts link to them instead
+    attachments: dict[bytes, str] = field(default_factory=dict, repr=False)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    @property
+    def stop_reason(self) -> str | None:
+        if not self.future.done() or self.future.cancelled() or self.future.exception() is not None:
+            return None
+        return self.future.result()
+
+    @property
+    def error(self) -> BaseException | None:
+        if not self.future.done() or self.future.cancelled():
+            return None
+        return self.future.exception()
+
+    @property
+    def duration_ms(self) -> int:
+        if self.started_at is None:
+            return 0
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return int((end - self.started_at) * 1000)
+
+    def start(self) -> None:
+        self.started_at = time.time()
+
+    def mark_sent(self) -> None:
+        """Note that the prompt request went to the agent, which can now cancel it."""
+        if not self.sent.done():
+            self.sent.set_result(None)
+
+    def finish(self, stop_reason: str | None = None, error: BaseException | None = None) -> None:
+        """Resolve the turn with a stop reason, or fail it with ``error``."""
+        if self.future.done():
+            return
+        self.finished_at = time.time()
+        if self.started_at is None:
+            self.started_at = self.finished_at
+        self.mark_sent()
+        if error is not None:
+            self.future.set_exception(error)
+            # The error is also reported through ResultMessage; don't warn if nobody awaits it
+            self.future.exception()
+        else:
+            self.future.set_result(stop_reason or "end_turn")
+
+    async def wait(self) -> str:
+        """Wait for the turn to finish and return its stop reason."""
+        return await asyncio.shield(self.future)
+
+    def __await__(self):
+        return self.wait().__await__()
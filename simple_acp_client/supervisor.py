@@ -0,0 +1,464 @@
+"""
+Shard ``PyACPSDKClient`` instances across worker processes.
+
+Decoding JSON-RPC, building pydantic models and capturing terminal output all run
+on the event loop that owns a client, so one process hosting dozens of agents is
+bound by a single core. ``AgentSupervisor`` starts a pool of worker processes,
+each running its own event loop with a share of the clients, and hands the parent
+``RemoteClient`` proxies with the same connect / query / receive_messages /
+interrupt / disconnect API. Messages cross the process boundary over a pipe,
+batched so a burst of chunks costs one pickle and one write.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+import weakref
+import zlib
+from collections.abc import AsyncIterator
+from multiprocessing.connection import Connection
+from typing import Any
+
+from simple_acp_client.core import Message, ResultMessage
+from simple_acp_client.sdk.client import PyACPAgentOptions, PyACPSDKClient
+from simple_acp_client.sdk.turns import Turn
+
+# Commands sent to a worker:      ("call", request_id, client_id, method, args) | ("stop",)
+# Events sent back, in batches:   ("reply", request_id, result, error)
+#                                 ("message", client_id, message)
+#                                 ("turn", client_id, turn_id, stop_reason, error)
+_STOP = ("stop",)
+
+
+def _portable_error(exc: BaseException) -> BaseException:
+    """Return ``exc`` if it survives pickling, otherwise a RuntimeError describing it."""
+    try:
+        pickle.loads(pickle.dumps(exc))
+    except Exception:
+        return RuntimeError(f"{type(exc).__name__}: {exc}")
+    return exc
+
+
+def _read_pipe(conn: Connection, loop: asyncio.AbstractEventLoop, deliver: Any) -> None:
+    """Thread target: receive objects from ``conn`` and hand them to ``deliver`` on ``loop``."""
+    while True:
+        try:
+            item = conn.recv()
+        except (EOFError, OSError):
+            item = None
+        with contextlib.suppress(RuntimeError):  # Loop already closed
+            loop.call_soon_threadsafe(deliver, item)
+        if item is None:
+            return
+
+
+# ---------------------------------------------------------------------- worker side
+class _WorkerHost:
+    """Runs inside a worker process and hosts the clients assigned to it."""
+
+    def __init__(self, conn: Connection) -> None:
+        self.conn = conn
+        self.clients: dict[int, PyACPSDKClient] = {}
+        self.pumps: dict[int, asyncio.Task] = {}
+        # Turns queued per client, in order; the pump forwards one turn per entry
+        self.queued: dict[int, asyncio.Queue[Turn]] = {}
+        self.outbox: list[tuple[Any, ...]] = []
+        self.commands: asyncio.Queue[Any] = asyncio.Queue()
+        self.tasks: set[asyncio.Task] = set()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        threading.Thread(
+            target=_read_pipe, args=(self.conn, loop, self.commands.put_nowait), daemon=True
+        ).start()
+        while True:
+            command = await self.commands.get()
+            if command is None or command[0] == "stop":
+                break
+            _, request_id, client_id, method, args = command
+            task = asyncio.create_task(self._call(request_id, client_id, method, args))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        await self._shutdown()
+
+    def post(self, event: tuple[Any, ...]) -> None:
+        """Queue an event for the parent; everything posted in one loop iteration is sent together."""
+        if not self.outbox:
+            asyncio.get_running_loop().call_soon(self._flush)
+        self.outbox.append(event)
+
+    def _flush(self) -> None:
+        batch, self.outbox = self.outbox, []
+        try:
+            self.conn.send(batch)
+        except OSError:
+            self.commands.put_nowait(None)  # Parent went away
+        except Exception:
+            # Something in the batch does not pickle: send the rest, and fail calls whose reply didn't
+            for event in batch:
+                try:
+                    self.conn.send([event])
+                except OSError:
+                    self.commands.put_nowait(None)
+                    return
+                except Exception as exc:
+                    if event[0] == "reply":
+                        self.conn.send([("reply", event[1], None, RuntimeError(f"Unpicklable reply: {exc}"))])
+
+    async def _call(self, request_id: int, client_id: int, method: str, args: tuple[Any, ...]) -> None:
+        try:
+            result = await getattr(self, f"_do_{method}")(client_id, *args)
+        except Exception as exc:
+            self.post(("reply", request_id, None, _portable_error(exc)))
+        else:
+            self.post(("reply", request_id, result, None))
+
+    async def _do_connect(
+        self, client_id: int, options: PyACPAgentOptions, agent_command: str | list[str] | None
+    ) -> str | None:
+        client = PyACPSDKClient(options)
+        await client.connect(agent_command)
+        self.clients[client_id] = client
+        self.queued[client_id] = asyncio.Queue()
+        self.pumps[client_id] = asyncio.create_task(self._pump(client_id, client, self.queued[client_id]))
+        return client._session_id
+
+    async def _do_query(self, client_id: int, prompt: Any, query_kwargs: dict[str, Any]) -> int:
+        turn = await self.clients[client_id].query(prompt, **query_kwargs)
+        self.queued[client_id].put_nowait(turn)
+
+        def report(future: asyncio.Future[str]) -> None:
+            error = future.exception()
+            stop_reason = None if error is not None else future.result()
+            self.post(("turn", client_id, turn.turn_id, stop_reason, _portable_error(error) if error else None))
+
+        turn.future.add_done_callback(report)
+        return turn.turn_id
+
+    async def _do_interrupt(self, client_id: int) -> None:
+        await self.clients[client_id].interrupt()
+
+    async def _do_cancel(self, client_id: int) -> str | None:
+        return await self.clients[client_id].cancel()
+
+    async def _do_disconnect(self, client_id: int) -> None:
+        client = self.clients.pop(client_id, None)
+        if client is None:
+            return
+        await client.disconnect()
+        pump = self.pumps.pop(client_id)
+        queued = self.queued.pop(client_id)
+        # Let the pump forward the results of turns the disconnect ended before stopping it
+        await queued.join()
+        pump.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await pump
+
+    async def _pump(self, client_id: int, client: PyACPSDKClient, queued: asyncio.Queue[Turn]) -> None:
+        """Forward every turn's messages, including its ResultMessage, to the parent, one turn per query."""
+        while True:
+            # receive_messages() streams the oldest undelivered turn; started with none
+            # queued, it would end with a result that belongs to no turn
+            turn = await queued.get()
+            if turn in client._undelivered_turns:
+                async for message in client.receive_messages():
+                    self.post(("message", client_id, message))
+            else:
+                # Dropped undelivered by cancel(); the parent still expects its result
+                await asyncio.wait([turn.future])
+                self.post(("message", client_id, turn.result))
+            queued.task_done()
+
+    async def _shutdown(self) -> None:
+        for task in list(self.tasks):
+            task.cancel()
+        for client_id in list(self.clients):
+            with contextlib.suppress(Exception):
+                await self._do_disconnect(client_id)
+        if self.outbox:
+            with contextlib.suppress(Exception):
+                self._flush()
+        self.conn.close()
+
+
+def _worker_main(conn: Connection) -> None:
+    asyncio.run(_WorkerHost(conn).run())
+
+
+# ---------------------------------------------------------------------- parent side
+class _WorkerHandle:
+    """Parent-side end of one worker process."""
+
+    def __init__(self, index: int, process: multiprocessing.process.BaseProcess, conn: Connection) -> None:
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.clients: dict[int, RemoteClient] = {}  # Connected clients
+        # Clients placed here and not disconnected, connected or not; used for placement.
+        # Clients dropped without disconnect() stop counting once garbage-collected
+        self.assigned: weakref.WeakSet[RemoteClient] = weakref.WeakSet()
+        self.calls: dict[int, asyncio.Future[Any]] = {}
+        self.alive = True
+        self._request_ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+
+    def start_reader(self, loop: asyncio.AbstractEventLoop) -> None:
+        threading.Thread(
+            target=_read_pipe,
+            args=(self.conn, loop, self._deliver),
+            name=f"acp-supervisor-reader-{self.index}",
+            daemon=True,
+        ).start()
+
+    def send(self, command: tuple[Any, ...]) -> None:
+        with self._send_lock:
+            self.conn.send(command)
+
+    async def call(self, client_id: int, method: str, *args: Any) -> Any:
+        if not self.alive:
+            raise ConnectionError(f"Worker {self.index} is not running")
+        request_id = next(self._request_ids)
+        future = self.calls[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            self.send(("call", request_id, client_id, method, args))
+        except Exception:
+            del self.calls[request_id]
+            raise
+        return await future
+
+    def _deliver(self, batch: list[tuple[Any, ...]] | None) -> None:
+        if batch is None:
+            self._on_exit()
+            return
+        for event in batch:
+            kind = event[0]
+            if kind == "message":
+                client = self.clients.get(event[1])
+                if client is not None:
+                    client._messages.put_nowait(event[2])
+            elif kind == "turn":
+                client = self.clients.get(event[1])
+                if client is not None:
+                    client._finish_turn(event[2], event[3], event[4])
+            elif kind == "reply":
+                future = self.calls.pop(event[1], None)
+                if future is not None and not future.done():
+                    if event[3] is not None:
+                        future.set_exception(event[3])
+                    else:
+                        future.set_result(event[2])
+
+    def _on_exit(self) -> None:
+        """The worker's pipe closed: fail everything still waiting on it."""
+        self.alive = False
+        error = ConnectionError(f"Worker {self.index} exited (exit code {self.process.exitcode})")
+        for future in self.calls.values():
+            if not future.done():
+                future.set_exception(error)
+        self.calls.clear()
+        for client in list(self.clients.values()):
+            client._fail(error)
+
+
+class RemoteClient:
+    """
+    Proxy for a ``PyACPSDKClient`` running in a supervisor worker process.
+
+    Mirrors the client API: ``query()`` returns a ``Turn`` that resolves when the remote
+    turn finishes, and ``receive_messages()`` yields one turn's messages ending with its
+    ResultMessage. Options and prompts must be picklable.
+    """
+
+    def __init__(
+        self,
+        worker: _WorkerHandle,
+        client_id: int,
+        options: PyACPAgentOptions,
+        agent_command: str | list[str] | None,
+    ) -> None:
+        self.options = options
+        self.agent_command = agent_command
+        self.client_id = client_id
+        self.session_id: str | None = None
+        self._worker = worker
+        self._messages: asyncio.Queue[Message | BaseException] = asyncio.Queue()
+        self._turns: dict[int, Turn] = {}
+        # Turns that finished before query() had registered them: turn id -> (stop reason, error)
+        self._early_finishes: dict[int, tuple[str | None, BaseException | None]] = {}
+        self._connected = False
+        worker.assigned.add(self)
+
+    @property
+    def worker_index(self) -> int:
+        return self._worker.index
+
+    async def __aenter__(self) -> RemoteClient:
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.disconnect()
+
+    async def connect(self) -> None:
+        if self._connected:
+            raise RuntimeError("Client already connected")
+        self._worker.clients[self.client_id] = self
+        self._worker.assigned.add(self)
+        try:
+            self.session_id = await self._worker.call(self.client_id, "connect", self.options, self.agent_command)
+        except BaseException:
+            self._worker.clients.pop(self.client_id, None)
+            raise
+        self._connected = True
+
+    async def query(self, prompt: Any, **query_kwargs: Any) -> Turn:
+        """Queue a prompt on the remote client; see ``PyACPSDKClient.query()``."""
+        if not self._connected:
+            raise RuntimeError("Client not connected. Call connect() first.")
+        turn_id = await self._worker.call(self.client_id, "query", prompt, query_kwargs)
+        turn = Turn(turn_id=turn_id, prompt=[])
+        if turn_id in self._early_finishes:
+            stop_reason, error = self._early_finishes.pop(turn_id)
+            turn.finish(stop_reason, error)
+        else:
+            self._turns[turn_id] = turn
+        return turn
+
+    async def receive_messages(self) -> AsyncIterator[Message]:
+        while True:
+            message = await self._messages.get()
+            if isinstance(message, BaseException):
+                raise message
+            yield message
+            if isinstance(message, ResultMessage):
+                break
+
+    async def interrupt(self) -> None:
+        if not self._connected:
+            raise RuntimeError("Client not connected. Call connect() first.")
+        await self._worker.call(self.client_id, "interrupt")
+
+    async def cancel(self) -> str | None:
+        """Cancel the running remote turn; see ``PyACPSDKClient.cancel()``."""
+        if not self._connected:
+            raise RuntimeError("Client not connected. Call connect() first.")
+        return await self._worker.call(self.client_id, "cancel")
+
+    async def disconnect(self) -> None:
+        if self._connected and self._worker.alive:
+            with contextlib.suppress(ConnectionError):
+                await self._worker.call(self.client_id, "disconnect")
+        self._connected = False
+        self._worker.clients.pop(self.client_id, None)
+        self._worker.assigned.discard(self)
+        self._fail(ConnectionError("Client disconnected before the turn finished"))
+
+    def _finish_turn(self, turn_id: int, stop_reason: str | None, error: BaseException | None) -> None:
+        turn = self._turns.pop(turn_id, None)
+        if turn is not None:
+            turn.finish(stop_reason, error)
+        else:
+            # The query() reply was delivered first, but its caller has not resumed yet to
+            # register the turn (fast or cached turns)
+            self._early_finishes[turn_id] = (stop_reason, error)
+
+    def _fail(self, error: BaseException) -> None:
+        for turn in self._turns.values():
+            turn.finish(error=error)
+        self._turns.clear()
+        self._early_finishes.clear()
+        self._connected = False
+        # Wakes a receive_messages() call waiting on a turn that will never finish
+        self._messages.put_nowait(error)
+
+
+class AgentSupervisor:
+    """
+    Pool of worker processes that host ACP clients.
+
+    Each client lives in one worker for its whole lifetime. Clients are placed on the
+    worker with the fewest clients, or by hashing ``shard`` so related sessions share a
+    process.
+
+    Example:
+        async with AgentSupervisor(workers=8) as supervisor:
+            client = supervisor.client(PyACPAgentOptions(cwd="/repo"), ["codex-acp"])
+            await client.connect()
+            await client.query("Explain main.py")
+            async for message in client.receive_messages():
+                print(message)
+    """
+
+    def __init__(self, workers: int | None = None, *, start_method: str = "spawn") -> None:
+        self.num_workers = workers or os.cpu_count() or 1
+        self._context = multiprocessing.get_context(start_method)
+        self._workers: list[_WorkerHandle] = []
+        self._client_ids = itertools.count(1)
+
+    async def __aenter__(self) -> AgentSupervisor:
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        """Start the worker processes."""
+        if self._workers:
+            raise RuntimeError("Supervisor already started")
+        loop = asyncio.get_running_loop()
+        for index in range(self.num_workers):
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(
+                target=_worker_main, args=(child_conn,), name=f"acp-worker-{index}", daemon=True
+            )
+            # Spawning a Python interpreter blocks for a while; keep the loop responsive
+            await loop.run_in_executor(None, process.start)
+            child_conn.close()
+            worker = _WorkerHandle(index, process, parent_conn)
+            worker.start_reader(loop)
+            self._workers.append(worker)
+
+    def client(
+        self,
+        options: PyACPAgentOptions | None = None,
+        agent_command: str | list[str] | None = None,
+        *,
+        shard: str | None = None,
+    ) -> RemoteClient:
+        """Create a (not yet connected) client on a worker."""
+        live = [worker for worker in self._workers if worker.alive]
+        if not live:
+            raise RuntimeError("Supervisor has no running workers. Call start() first.")
+        if shard is not None:
+            worker = live[zlib.crc32(shard.encode()) % len(live)]
+        else:
+            # Count clients created but not connected yet too, or a burst of client() calls
+            # would all land on the same worker
+            worker = min(live, key=lambda w: len(w.assigned))
+        return RemoteClient(worker, next(self._client_ids), options or PyACPAgentOptions(), agent_command)
+
+    def load(self) -> dict[int, int]:
+        """Number of connected clients per worker index."""
+        return {worker.index: len(worker.clients) for worker in self._workers}
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Disconnect every client and stop the workers."""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            if worker.alive:
+                with contextlib.suppress(Exception):
+                    worker.send(_STOP)
+        loop = asyncio.get_running_loop()
+        for worker in workers:
+            await loop.run_in_executor(None, worker.process.join, timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                await loop.run_in_executor(None, worker.process.join)
+            worker.conn.close()
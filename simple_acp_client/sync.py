@@ -0,0 +1,276 @@
+"""
+Blocking, thread-safe facade over ``PyACPSDKClient`` for threaded applications.
+
+All sync clients in a process share one background thread running an event loop,
+so callers never start their own loop, and agent processes/sessions are reused
+across threads instead of being spawned per call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextlib
+import queue
+import threading
+from collections import deque
+from collections.abc import Iterator
+from typing import Any
+
+from simple_acp_client.core import Message
+from simple_acp_client.introspection import ClientStats
+from simple_acp_client.sdk.client import PyACPAgentOptions, PyACPSDKClient
+
+# Marks the end of a stream handed from the loop thread to a caller thread
+_END_OF_STREAM = object()
+
+
+class LoopThread:
+    """A daemon thread running an asyncio event loop that other threads submit work to."""
+
+    _shared: LoopThread | None = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, name: str = "simple-acp-client-loop") -> None:
+        self.loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    @classmethod
+    def shared(cls) -> LoopThread:
+        """Return the process-wide loop thread, starting it on first use."""
+        with cls._shared_lock:
+            if cls._shared is None or not cls._shared.is_alive():
+                cls._shared = cls()
+            return cls._shared
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive() and not self.loop.is_closed()
+
+    def submit(self, coro: Any) -> concurrent.futures.Future:
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Blocking calls cannot be made from the shared event loop thread")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Any, timeout: float | None = None) -> Any:
+        """Run a coroutine on the loop thread and block until it returns."""
+        return self.submit(coro).result(timeout)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+class SyncPyACPSDKClient:
+    """
+    Blocking client that many threads can use at once.
+
+    Keeps up to ``max_sessions`` connected ``PyACPSDKClient`` sessions, each with its
+    own agent process, created on demand and reused across calls and threads. A call
+    leases an idle session for the duration of one turn; when all sessions are busy
+    it waits for one to be released.
+
+    Example:
+        client = SyncPyACPSDKClient(PyACPAgentOptions(cwd="/repo"), ["codex-acp"], max_sessions=4)
+        for message in client.stream("Explain main.py"):
+            print(message)
+        client.close()
+    """
+
+    def __init__(
+        self,
+        options: PyACPAgentOptions | None = None,
+        agent_command: str | list[str] | None = None,
+        *,
+        max_sessions: int = 1,
+        loop_thread: LoopThread | None = None,
+    ) -> None:
+        if max_sessions < 1:
+            raise ValueError("max_sessions must be at least 1")
+        self.options = options or PyACPAgentOptions()
+        self.agent_command = agent_command
+        self.max_sessions = max_sessions
+        self._loop_thread = loop_thread or LoopThread.shared()
+        self._closed = False
+        # Only touched from the loop thread. Leases wait on the condition until a session is
+        # idle or there is room to create one
+        self._available: asyncio.Condition | None = None
+        self._idle: deque[PyACPSDKClient] = deque()
+        self._sessions: list[PyACPSDKClient] = []
+        self._creating = 0
+
+    def __enter__(self) -> SyncPyACPSDKClient:
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------ public API
+    def connect(self, timeout: float | None = None) -> None:
+        """Eagerly connect one session so the first query does not pay the startup cost."""
+        self._loop_thread.run(self._warm_up(), timeout)
+
+    def query(self, prompt: Any, *, timeout: float | None = None, **query_kwargs: Any) -> list[Message]:
+        """Run one turn and return all of its messages, ending with the ResultMessage."""
+        return list(self.stream(prompt, timeout=timeout, **query_kwargs))
+
+    def stream(self, prompt: Any, *, timeout: float | None = None, **query_kwargs: Any) -> Iterator[Message]:
+        """
+        Run one turn and yield its messages as they arrive.
+
+        Args:
+            prompt: Anything ``PyACPSDKClient.query()`` accepts
+            timeout: Seconds to wait for each message before raising TimeoutError
+            query_kwargs: Passed to ``PyACPSDKClient.query()`` (e.g. turn_timeout)
+        """
+        if self._closed:
+            raise RuntimeError("Client is closed")
+        messages: queue.SimpleQueue[Any] = queue.SimpleQueue()
+        future = self._loop_thread.submit(self._run_turn(prompt, query_kwargs, messages))
+        try:
+            while True:
+                try:
+                    item = messages.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No message from the agent within {timeout}s") from None
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Stopped early (break, exception, timeout): interrupt the turn and free the session
+            if not future.done():
+                future.cancel()
+            with contextlib.suppress(BaseException):
+                future.result()
+
+    def stats(self) -> list[ClientStats]:
+        """``PyACPSDKClient.stats()`` of every connected session."""
+        return self._loop_thread.run(self._collect_stats())
+
+    def close(self, timeout: float | None = None) -> None:
+        """Disconnect every session. The shared loop thread keeps running for other clients."""
+        if self._closed:
+            return
+        self._closed = True
+        self._loop_thread.run(self._close_sessions(), timeout)
+
+    # ------------------------------------------------------------------ loop-thread side
+    async def _collect_stats(self) -> list[ClientStats]:
+        return [client.stats() for client in self._sessions]
+
+    async def _warm_up(self) -> None:
+        client = await self._lease()
+        await self._release(client)
+
+    async def _lease(self) -> PyACPSDKClient:
+        if self._available is None:
+            self._available = asyncio.Condition()
+        async with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Client is closed")
+                if self._idle:
+                    return self._idle.popleft()
+                if len(self._sessions) + self._creating < self.max_sessions:
+                    break
+                await self._available.wait()
+            self._creating += 1
+        client = PyACPSDKClient(self.options)
+        try:
+            await client.connect(self.agent_command)
+        except BaseException:
+            async with self._available:
+                self._creating -= 1
+                # The slot is free again; let a waiter try
+                self._available.notify()
+            raise
+        async with self._available:
+            self._creating -= 1
+            if not self._closed:
+                self._sessions.append(client)
+                return client
+        # Closed while connecting: nothing will disconnect this session later
+        with contextlib.suppress(Exception):
+            await client.disconnect()
+        raise RuntimeError("Client is closed")
+
+    async def _release(self, client: PyACPSDKClient) -> None:
+        if self._closed or client not in self._sessions:
+            return
+        async with self._available:
+            self._idle.append(client)
+            self._available.notify()
+
+    async def _discard(self, client: PyACPSDKClient) -> None:
+        async with self._available:
+            if client in self._sessions:
+                self._sessions.remove(client)
+            # A waiter can create a replacement in the freed slot
+            self._available.notify()
+        with contextlib.suppress(Exception):
+            await client.disconnect()
+
+    async def _run_turn(self, prompt: Any, query_kwargs: dict[str, Any], messages: queue.SimpleQueue[Any]) -> None:
+        try:
+            client = await self._lease()
+        except BaseException as exc:
+            messages.put(exc)
+            raise
+        healthy = True
+        try:
+            await client.query(prompt, **query_kwargs)
+            async for message in client.receive_messages():
+                messages.put(message)
+        except asyncio.CancelledError:
+            healthy = await self._abandon_turn(client)
+            raise
+        except BaseException as exc:
+            messages.put(exc)
+            # Caller errors (e.g. an invalid prompt) leave the session usable; a dead agent or
+            # transport does not
+            healthy = client._connected and not client._agent_exited
+            if healthy and client._undelivered_turns:
+                healthy = await self._abandon_turn(client)
+        finally:
+            messages.put(_END_OF_STREAM)
+            if healthy:
+                await self._release(client)
+            else:
+                await self._discard(client)
+
+    async def _abandon_turn(self, client: PyACPSDKClient) -> bool:
+        """Cancel a turn whose caller stopped listening; returns whether the session is reusable."""
+        try:
+            await client.cancel()
+            if client._undelivered_turns:
+                # The turn had not started, so there was nothing to cancel; let it run out
+                await asyncio.wait_for(self._drain(client), self.options.interrupt_grace)
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    async def _drain(client: PyACPSDKClient) -> None:
+        async for _ in client.receive_messages():
+            pass
+
+    async def _close_sessions(self) -> None:
+        sessions, self._sessions = self._sessions, []
+        self._idle.clear()
+        if self._available is not None:
+            async with self._available:
+                self._available.notify_all()  # Waiting leases fail now
+        for client in sessions:
+            with contextlib.suppress(Exception):
+                await client.disconnect()
@@ -0,0 +1,360 @@
+"""
+Persistent, indexed transcripts of client sessions.
+
+``TranscriptStore`` appends every message a client delivers, and a summary row per
+turn, to a local SQLite database. Rows are indexed by session, turn and message kind,
+so past turns can be paged through and filtered without loading a whole session. The
+most recent messages are also kept in a bounded in-memory tail; everything older
+lives only on disk.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from collections.abc import Collection, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from simple_acp_client.core import Message, ResultMessage, message_to_dict
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    session_id  TEXT    NOT NULL,
+    turn_id     INTEGER NOT NULL,
+    prompt      TEXT,
+    subtype     TEXT,
+    stop_reason TEXT,
+    is_error    INTEGER NOT NULL DEFAULT 0,
+    duration_ms INTEGER,
+    finished_at REAL,
+    PRIMARY KEY (session_id, turn_id)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id           INTEGER PRIMARY KEY,
+    session_id   TEXT    NOT NULL,
+    turn_id      INTEGER NOT NULL,
+    seq          INTEGER NOT NULL,
+    kind         TEXT    NOT NULL,
+    timestamp_ns INTEGER,
+    data         TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_turn ON messages (session_id, turn_id, seq);
+CREATE INDEX IF NOT EXISTS messages_by_kind ON messages (session_id, kind, turn_id);
+"""
+
+
+@dataclass(slots=True)
+class TranscriptEntry:
+    """One stored message. ``data`` holds the message fields as JSON-compatible values."""
+
+    session_id: str
+    turn_id: int
+    seq: int
+    kind: str
+    timestamp_ns: int | None
+    data: dict[str, Any]
+
+
+@dataclass(slots=True)
+class TurnRecord:
+    """Summary of one stored turn."""
+
+    session_id: str
+    turn_id: int
+    prompt: list[dict[str, Any]] | None
+    subtype: str | None
+    stop_reason: str | None
+    is_error: bool
+    duration_ms: int | None
+    finished_at: float | None
+
+
+def _prompt_summary(blocks: Iterable[Any]) -> list[dict[str, Any]]:
+    """Prompt blocks as stored: text is kept, embedded resources are reduced to their URI."""
+    summary = []
+    for block in blocks:
+        data = block.model_dump(mode="json", by_alias=True, exclude_none=True) if hasattr(block, "model_dump") else block
+        if not isinstance(data, dict):
+            continue
+        resource = data.get("resource")
+        if isinstance(resource, dict):
+            data = {"type": data.get("type"), "uri": resource.get("uri"), "mimeType": resource.get("mimeType")}
+        summary.append(data)
+    return summary
+
+
+class TranscriptStore:
+    """
+    SQLite-backed transcript sink.
+
+    ``append()`` and ``end_turn()`` only queue the message, so they are cheap enough
+    to call from the event loop. A writer thread serializes queued messages and
+    commits them in batches: when ``batch_size`` messages are pending and when a
+    turn ends. Reads, ``flush()`` and ``close()`` write whatever is still queued
+    first, so they always see everything recorded. One store can be shared by
+    several clients.
+
+    Turns are stored under the client's turn id unless the session already has a
+    stored turn with that id or a later one, as when a reloaded session starts
+    counting again; such a turn is numbered after the session's last stored turn.
+
+    Args:
+        path: Database file (created if missing); ":memory:" keeps it in memory
+        tail_size: Number of most recent messages kept in memory for ``tail()``
+        batch_size: Pending messages that trigger a commit
+    """
+
+    def __init__(self, path: str | Path, *, tail_size: int = 256, batch_size: int = 64) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # _lock guards the queues and counters; _db_lock the connection and the turn numbering
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._pending_messages: list[tuple[str, int, int, Message]] = []
+        self._pending_turns: list[tuple[str, int, ResultMessage, list[Any]]] = []
+        self._next_seq: dict[tuple[str, int], int] = {}
+        # (session, client turn id) -> stored turn id, while the turn is being written
+        self._turn_ids: dict[tuple[str, int], int] = {}
+        # Last stored turn id per session seen by this store
+        self._last_turn: dict[str, int] = {}
+        self._tail: deque[TranscriptEntry] = deque(maxlen=tail_size)
+        self._wake = threading.Event()
+        self._closing = False
+        self._error: Exception | None = None
+        self._writer = threading.Thread(target=self._write_loop, name="transcript-writer", daemon=True)
+        self._writer.start()
+
+    def __enter__(self) -> TranscriptStore:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------ writing
+    def append(self, session_id: str, turn_id: int, message: Message) -> None:
+        """Queue one delivered message of a turn."""
+        with self._lock:
+            self._queue_message(session_id, turn_id, message)
+            wake = len(self._pending_messages) >= self.batch_size
+        if wake:
+            self._wake.set()
+
+    def end_turn(self, session_id: str, turn_id: int, result: ResultMessage, prompt: Iterable[Any] = ()) -> None:
+        """Queue a turn's ResultMessage and summary row; the turn is committed shortly after."""
+        with self._lock:
+            # Queued together, so the writer numbers the row like the turn's messages
+            self._queue_message(session_id, turn_id, result)
+            self._pending_turns.append((session_id, turn_id, result, list(prompt)))
+        self._wake.set()
+
+    def _queue_message(self, session_id: str, turn_id: int, message: Message) -> None:
+        key = (session_id, turn_id)
+        seq = self._next_seq.get(key, 0)
+        self._next_seq[key] = seq + 1
+        self._pending_messages.append((session_id, turn_id, seq, message))
+        if isinstance(message, ResultMessage):
+            del self._next_seq[key]
+
+    def flush(self) -> None:
+        """Commit queued writes in one transaction; raises the error of a failed background write."""
+        self._write()
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _write(self) -> None:
+        with self._db_lock:
+            with self._lock:
+                messages, self._pending_messages = self._pending_messages, []
+                turns, self._pending_turns = self._pending_turns, []
+            if not messages and not turns:
+                return
+            entries = []
+            # Stored ids of the turns whose ResultMessage is in this batch, in order: the
+            # client's turn id may already be reused by a later turn in the same batch
+            ended: dict[tuple[str, int], list[int]] = {}
+            for session_id, turn_id, seq, message in messages:
+                data = message_to_dict(message)
+                stored = self._stored_turn_id(session_id, turn_id)
+                if isinstance(message, ResultMessage):
+                    ended.setdefault((session_id, turn_id), []).append(self._turn_ids.pop((session_id, turn_id)))
+                entries.append(
+                    TranscriptEntry(
+                        session_id=session_id,
+                        turn_id=stored,
+                        seq=seq,
+                        kind=type(message).__name__,
+                        timestamp_ns=getattr(message, "timestamp_ns", None),
+                        data=data,
+                    )
+                )
+            rows = []
+            for session_id, turn_id, result, prompt in turns:
+                summary = _prompt_summary(prompt)
+                rows.append(
+                    (
+                        session_id,
+                        ended[(session_id, turn_id)].pop(0),
+                        json.dumps(summary, separators=(",", ":")) if summary else None,
+                        result.subtype,
+                        result.stop_reason,
+                        int(result.is_error),
+                        result.duration_ms,
+                        time.time(),
+                    )
+                )
+            with self._db:  # One transaction, committed on exit
+                self._db.executemany(
+                    "INSERT INTO messages (session_id, turn_id, seq, kind, timestamp_ns, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (e.session_id, e.turn_id, e.seq, e.kind, e.timestamp_ns, json.dumps(e.data, separators=(",", ":")))
+                        for e in entries
+                    ],
+                )
+                self._db.executemany(
+                    "INSERT INTO turns"
+                    " (session_id, turn_id, prompt, subtype, stop_reason, is_error, duration_ms, finished_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            with self._lock:
+                self._tail.extend(entries)
+
+    def _stored_turn_id(self, session_id: str, turn_id: int) -> int:
+        """Turn id under which a client's turn is stored; called with ``_db_lock`` held."""
+        key = (session_id, turn_id)
+        stored = self._turn_ids.get(key)
+        if stored is None:
+            last = self._last_turn.get(session_id)
+            if last is None:
+                row = self._db.execute("SELECT MAX(turn_id) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+                last = row[0] if row[0] is not None else 0
+            stored = self._turn_ids[key] = max(turn_id, last + 1)
+            self._last_turn[session_id] = stored
+        return stored
+
+    def _write_loop(self) -> None:
+        while not self._closing:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self._write()
+            except Exception as exc:
+                # Those messages are lost; the next flush() or read reports it
+                self._error = exc
+
+    def close(self) -> None:
+        self._closing = True
+        self._wake.set()
+        if self._writer is not threading.current_thread():
+            self._writer.join()
+        try:
+            self.flush()
+        finally:
+            with self._db_lock:
+                self._db.close()
+
+    # ------------------------------------------------------------------ reading
+    def tail(self, limit: int | None = None) -> list[TranscriptEntry]:
+        """Most recent messages across all sessions, from memory."""
+        self.flush()
+        with self._lock:
+            entries = list(self._tail)
+        return entries if limit is None else entries[-limit:]
+
+    def sessions(self) -> list[str]:
+        self.flush()
+        with self._db_lock:
+            rows = self._db.execute("SELECT DISTINCT session_id FROM turns ORDER BY session_id").fetchall()
+        return [row[0] for row in rows]
+
+    def turns(self, session_id: str, *, before: int | None = None, limit: int = 50) -> list[TurnRecord]:
+        """
+        Page through a session's turns, newest first.
+
+        Pass the ``turn_id`` of the last record of a page as ``before`` to get the next one.
+        """
+        self.flush()
+        query = (
+            "SELECT session_id, turn_id, prompt, subtype, stop_reason, is_error, duration_ms, finished_at"
+            " FROM turns WHERE session_id = ?"
+        )
+        params: list[Any] = [session_id]
+        if before is not None:
+            query += " AND turn_id < ?"
+            params.append(before)
+        query += " ORDER BY turn_id DESC LIMIT ?"
+        params.append(limit)
+        with self._db_lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [
+            TurnRecord(
+                session_id=row[0],
+                turn_id=row[1],
+                prompt=json.loads(row[2]) if row[2] else None,
+                subtype=row[3],
+                stop_reason=row[4],
+                is_error=bool(row[5]),
+                duration_ms=row[6],
+                finished_at=row[7],
+            )
+            for row in rows
+        ]
+
+    def messages(
+        self,
+        session_id: str,
+        *,
+        turn_id: int | None = None,
+        kinds: Collection[str] | None = None,
+        after: tuple[int, int] | None = None,
+        limit: int = 500,
+    ) -> list[TranscriptEntry]:
+        """
+        Messages of a session in delivery order, optionally for one turn and some kinds.
+
+        Args:
+            session_id: Session to read
+            turn_id: Only this turn
+            kinds: Message class names to include (e.g. {"TextBlock", "ToolUseBlock"})
+            after: ``(turn_id, seq)`` of the last entry of the previous page
+            limit: Page size
+        """
+        self.flush()
+        query = "SELECT session_id, turn_id, seq, kind, timestamp_ns, data FROM messages WHERE session_id = ?"
+        params: list[Any] = [session_id]
+        if turn_id is not None:
+            query += " AND turn_id = ?"
+            params.append(turn_id)
+        if kinds is not None:
+            kinds = list(kinds)
+            query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        if after is not None:
+            query += " AND (turn_id > ? OR (turn_id = ? AND seq > ?))"
+            params.extend((after[0], after[0], after[1]))
+        query += " ORDER BY turn_id, seq LIMIT ?"
+        params.append(limit)
+        with self._db_lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [
+            TranscriptEntry(
+                session_id=row[0],
+                turn_id=row[1],
+                seq=row[2],
+                kind=row[3],
+                timestamp_ns=row[4],
+                data=json.loads(row[5]),
+            )
+            for row in rows
+        ]
+
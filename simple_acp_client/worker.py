@@ -0,0 +1,95 @@
+"""
+Worker mode: run an agent on a prompt and stream its events as JSON lines.
+
+Each line is ``{"type": ..., "message": {...}}``, the same WorkerFormat the event
+emitter produces, ending with the turn's ``ResultMessage``. Output goes through
+``JsonlWriter``, which batches lines and writes them off the event loop, so a slow
+reader on the other end of the pipe slows the agent down instead of stalling the
+loop one syscall at a time.
+
+    simple-acp-worker --cwd /repo -p "Explain main.py" -- codex-acp
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+
+from simple_acp_client.core import worker_event
+from simple_acp_client.sdk.client import PyACPAgentOptions, PyACPSDKClient
+from simple_acp_client.sdk.jsonl import JsonlWriter
+
+
+async def run_worker(
+    prompts: list[str],
+    agent_command: list[str],
+    options: PyACPAgentOptions | None = None,
+    writer: JsonlWriter | None = None,
+) -> bool:
+    """
+    Run ``prompts`` as consecutive turns and stream every message as a JSON line.
+
+    Returns:
+        True if every turn finished without error
+
+    Raises:
+        BrokenPipeError: The reader closed the output before everything was written
+    """
+    writer = writer or JsonlWriter()
+    client = PyACPSDKClient(options)
+    ok = True
+    try:
+        await client.connect(agent_command)
+        # Queue every prompt up front; turns still run one after another
+        for prompt in prompts:
+            await client.query(prompt)
+        for _ in prompts:
+            async for message in client.receive_messages():
+                await writer.write(worker_event(message))
+                ok = ok and not getattr(message, "is_error", False)
+    finally:
+        await client.disconnect()
+        await writer.close()
+    return ok
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="simple-acp-worker",
+        description="Run an ACP agent on one or more prompts and stream its events as JSON lines.",
+    )
+    parser.add_argument("agent", nargs="+", help="Agent command and arguments (put them after --)")
+    parser.add_argument("-p", "--prompt", action="append", help="Prompt to send; repeat for several turns (default: stdin)")
+    parser.add_argument("--cwd", help="Session working directory")
+    parser.add_argument("--model", help="Model id to select")
+    parser.add_argument("--turn-timeout", type=float, help="Seconds a turn may run")
+    parser.add_argument("--idle-timeout", type=float, help="Seconds a turn may go without agent activity")
+    parser.add_argument("--record", help="Append the session's JSON-RPC frames to this log")
+    parser.add_argument("--flush-interval", type=float, default=0.05, help="Longest time an event is buffered")
+    args = parser.parse_args(argv)
+
+    prompts = args.prompt or [sys.stdin.read()]
+    options = PyACPAgentOptions(
+        cwd=args.cwd,
+        model=args.model,
+        turn_timeout=args.turn_timeout,
+        idle_timeout=args.idle_timeout,
+        record_path=args.record,
+    )
+    try:
+        ok = asyncio.run(run_worker(prompts, args.agent, options, JsonlWriter(flush_interval=args.flush_interval)))
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # The reader went away; the client was already disconnected. Point stdout at
+        # devnull so the interpreter's own flush at exit doesn't fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        print("simple-acp-worker: output pipe closed by reader", file=sys.stderr)
+        return 1
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
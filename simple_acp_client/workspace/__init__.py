@@ -0,0 +1,25 @@
+"""Workspace module - Per-session workspaces and change tracking for the session working directory."""
+
+from simple_acp_client.workspace.provision import (
+    StrategyUnavailable,
+    Workspace,
+    WorkspaceProvisioner,
+)
+from simple_acp_client.workspace.watcher import (
+    InotifyWatcher,
+    PollingWatcher,
+    WorkspaceChanges,
+    WorkspaceWatcher,
+    watch_workspace,
+)
+
+__all__ = [
+    "InotifyWatcher",
+    "PollingWatcher",
+    "StrategyUnavailable",
+    "Workspace",
+    "WorkspaceChanges",
+    "WorkspaceProvisioner",
+    "WorkspaceWatcher",
+    "watch_workspace",
+]
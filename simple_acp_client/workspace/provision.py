@@ -0,0 +1,263 @@
+"""
+Per-session copies of a source tree for agents working on the same repo in parallel.
+
+``WorkspaceProvisioner`` gives each session its own directory that starts out
+identical to the source tree, using the cheapest mechanism the host supports:
+
+- ``overlay``: an overlayfs mount (kernel, or ``fuse-overlayfs`` when rootless);
+  nothing is copied, writes go to a per-session upper layer
+- ``reflink``: copy-on-write file clones (``FICLONE``, on btrfs, XFS, bcachefs, ...);
+  data blocks are shared until written
+- ``hardlink``: directories are recreated and files hard-linked. Only writes that
+  replace a file (write to a temporary file, then rename) stay private, so this is
+  never picked automatically
+- ``copy``: a plain recursive copy
+
+Workspaces live under ``root`` as ``<name>/tree`` next to a ``meta.json`` recording
+the owning process. ``release()`` removes one; ``gc()`` removes those whose owner
+exited or that are older than a given age, e.g. after a crash. Each workspace
+directory carries a ``.simple-acp-workspace`` marker from the moment it is created,
+and ``gc()`` never touches a directory without one, so ``root`` can be shared with
+other data.
+"""
+
+from __future__ import annotations
+
+import errno
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+from collections.abc import Collection
+from dataclasses import dataclass
+from pathlib import Path
+
+STRATEGIES = ("overlay", "reflink", "hardlink", "copy")
+# Tried in this order by strategy="auto"
+_AUTO_STRATEGIES = ("overlay", "reflink", "copy")
+
+# Written into every workspace directory before provisioning starts; gc() only reclaims marked ones
+_MARKER = ".simple-acp-workspace"
+
+_FICLONE = 0x40049409
+_CLONE_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS}
+
+
+class StrategyUnavailable(OSError):
+    """The requested provisioning strategy does not work for this source and root."""
+
+
+@dataclass(slots=True)
+class Workspace:
+    """A provisioned session directory; agents run with ``path`` as their cwd."""
+
+    name: str
+    path: Path
+    strategy: str
+    source: Path
+    created_at: float
+
+    @property
+    def home(self) -> Path:
+        """Directory holding the tree and its bookkeeping (overlay layers, meta.json)."""
+        return self.path.parent
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkspaceProvisioner:
+    """
+    Creates, releases and garbage-collects per-session workspaces of ``source``.
+
+    Args:
+        source: Tree to replicate (e.g. a repo checkout)
+        root: Where workspaces are created; defaults to a directory in the system temp dir.
+            Reflinks and hard links need it on the same filesystem as ``source``
+        strategy: "auto" or one of overlay/reflink/hardlink/copy
+        ignore: Directory or file names left out of reflink/hardlink/copy workspaces
+    """
+
+    def __init__(
+        self,
+        source: str | Path,
+        root: str | Path | None = None,
+        *,
+        strategy: str = "auto",
+        ignore: Collection[str] = (),
+    ) -> None:
+        if strategy != "auto" and strategy not in STRATEGIES:
+            raise ValueError(f"Unknown workspace strategy {strategy!r}, expected 'auto' or one of {STRATEGIES}")
+        self.source = Path(source).resolve()
+        if not self.source.is_dir():
+            raise NotADirectoryError(f"Workspace source is not a directory: {self.source}")
+        self.root = Path(root) if root is not None else Path(tempfile.gettempdir()) / "simple-acp-workspaces"
+        self.strategy = strategy
+        self.ignore = frozenset(ignore)
+        # Strategies found not to work here, so "auto" does not retry them for every session
+        self._unavailable: set[str] = set()
+
+    # ------------------------------------------------------------------ lifecycle
+    def create(self, name: str | None = None) -> Workspace:
+        """Provision a new workspace. Blocking; run it in a thread from async code."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.gc()
+        name = name or uuid.uuid4().hex[:12]
+        home = self.root / name
+        home.mkdir()
+        (home / _MARKER).write_text(json.dumps({"pid": os.getpid()}))
+        tree = home / "tree"
+        candidates = _AUTO_STRATEGIES if self.strategy == "auto" else (self.strategy,)
+        last_error: OSError | None = None
+        for strategy in candidates:
+            if self.strategy == "auto" and strategy in self._unavailable:
+                continue
+            try:
+                getattr(self, f"_provision_{strategy}")(home, tree)
+            except StrategyUnavailable as exc:
+                self._unavailable.add(strategy)
+                last_error = exc
+                self._remove_tree(home, keep_home=True)
+                continue
+            except BaseException:
+                self._remove_tree(home)
+                raise
+            workspace = Workspace(name, tree, strategy, self.source, time.time())
+            meta = {"pid": os.getpid(), "created_at": workspace.created_at, "strategy": strategy, "source": str(self.source)}
+            (home / "meta.json").write_text(json.dumps(meta))
+            return workspace
+        self._remove_tree(home)
+        raise last_error or StrategyUnavailable(f"No workspace strategy works for {self.source}")
+
+    def release(self, workspace: Workspace) -> None:
+        """Unmount and delete a workspace."""
+        self._remove_tree(workspace.home)
+
+    def gc(self, max_age: float | None = None) -> list[str]:
+        """
+        Remove workspaces whose owning process is gone, or older than ``max_age`` seconds.
+
+        Returns:
+            Names of the removed workspaces
+        """
+        removed = []
+        if not self.root.is_dir():
+            return removed
+        now = time.time()
+        for home in self.root.iterdir():
+            if home.is_symlink() or not (home / _MARKER).is_file():
+                continue  # Not a workspace; never remove it
+            try:
+                meta = json.loads((home / "meta.json").read_text())
+            except (OSError, ValueError):
+                # Half-created: reclaim it once the process creating it is gone
+                try:
+                    marker = json.loads((home / _MARKER).read_text())
+                except (OSError, ValueError):
+                    marker = {}
+                if not _pid_alive(marker.get("pid", -1)):
+                    self._remove_tree(home)
+                    removed.append(home.name)
+                continue
+            expired = max_age is not None and now - meta.get("created_at", now) > max_age
+            if expired or not _pid_alive(meta.get("pid", -1)):
+                self._remove_tree(home)
+                removed.append(home.name)
+        return removed
+
+    # ------------------------------------------------------------------ strategies
+    def _provision_overlay(self, home: Path, tree: Path) -> None:
+        upper, work = home / "upper", home / "work"
+        for directory in (upper, work, tree):
+            directory.mkdir()
+        options = f"lowerdir={self.source},upperdir={upper},workdir={work}"
+        commands = [["mount", "-t", "overlay", "overlay", "-o", options, str(tree)]]
+        if shutil.which("fuse-overlayfs"):
+            commands.append(["fuse-overlayfs", "-o", options, str(tree)])
+        for command in commands:
+            if shutil.which(command[0]) is None:
+                continue
+            result = subprocess.run(command, capture_output=True)
+            if result.returncode == 0 and os.path.ismount(tree):
+                return
+        raise StrategyUnavailable(errno.EPERM, "overlay mounts are not permitted here", str(tree))
+
+    def _provision_reflink(self, home: Path, tree: Path) -> None:
+        self._replicate(tree, self._clone_file)
+
+    def _provision_hardlink(self, home: Path, tree: Path) -> None:
+        def link(src: str, dst: str) -> None:
+            try:
+                os.link(src, dst)
+            except OSError as exc:
+                if exc.errno in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise StrategyUnavailable(exc.errno, f"cannot hard-link into {self.root}", src) from exc
+                raise
+
+        self._replicate(tree, link)
+
+    def _provision_copy(self, home: Path, tree: Path) -> None:
+        self._replicate(tree, shutil.copy2)
+
+    @staticmethod
+    def _clone_file(src: str, dst: str) -> None:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            except OSError as exc:
+                if exc.errno in _CLONE_UNSUPPORTED:
+                    raise StrategyUnavailable(exc.errno, "filesystem does not support reflinks", src) from exc
+                raise
+        shutil.copystat(src, dst)
+
+    def _replicate(self, tree: Path, place_file) -> None:
+        """Recreate the source directory tree at ``tree``, placing each file with ``place_file``."""
+        source = str(self.source)
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames[:] = [d for d in dirnames if d not in self.ignore]
+            target = tree / os.path.relpath(dirpath, source)
+            target.mkdir(exist_ok=True)
+            for dirname in dirnames:
+                src = os.path.join(dirpath, dirname)
+                if os.path.islink(src):
+                    # os.walk does not descend into symlinked directories; keep the link itself
+                    os.symlink(os.readlink(src), target / dirname)
+            for filename in filenames:
+                if filename in self.ignore:
+                    continue
+                src = os.path.join(dirpath, filename)
+                dst = str(target / filename)
+                if os.path.islink(src):
+                    os.symlink(os.readlink(src), dst)
+                else:
+                    place_file(src, dst)
+            shutil.copystat(dirpath, target)
+
+    # ------------------------------------------------------------------ removal
+    def _remove_tree(self, home: Path, keep_home: bool = False) -> None:
+        tree = home / "tree"
+        if os.path.ismount(tree):
+            for command in (["umount", str(tree)], ["fusermount", "-u", str(tree)], ["umount", "-l", str(tree)]):
+                if shutil.which(command[0]) and subprocess.run(command, capture_output=True).returncode == 0:
+                    break
+        if keep_home:
+            for child in home.iterdir():
+                if child.name == _MARKER:
+                    continue
+                if child.is_dir() and not child.is_symlink():
+                    shutil.rmtree(child, ignore_errors=True)
+                else:
+                    child.unlink(missing_ok=True)
+        else:
+            shutil.rmtree(home, ignore_errors=True)
@@ -0,0 +1,391 @@
+"""
+Track which files in a session's workspace change during each turn.
+
+On Linux the workspace is watched with inotify (through ctypes, no extra
+dependency): the directory tree is registered once when the session starts, and
+after that each turn's change set costs only as much as the changes themselves.
+Elsewhere, or when inotify is unavailable or out of watches, a polling watcher
+snapshots file metadata at the start of a turn and diffs it at the end.
+
+Writes made through ``fs/write_text_file`` are also reported directly with
+``note_write()``, so they appear in the change set even on filesystems where
+inotify delivers nothing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+from collections.abc import Collection, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Directory names that are never watched or reported
+DEFAULT_IGNORE = frozenset({".git", ".hg", ".svn", "__pycache__"})
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+@dataclass(slots=True)
+class WorkspaceChanges:
+    """
+    Files created, modified and deleted during one turn, relative to the workspace root.
+
+    Only files are listed, never directories; deleting or moving away a directory
+    lists the files it held as ``deleted``. Successive events for a path are merged:
+    a file created and then edited is only ``created``, one created and deleted again
+    does not appear, and one deleted and re-created is ``modified``. ``overflowed``
+    means events were lost and the set may be incomplete.
+    """
+
+    created: set[str] = field(default_factory=set)
+    modified: set[str] = field(default_factory=set)
+    deleted: set[str] = field(default_factory=set)
+    overflowed: bool = False
+
+    def record(self, kind: str, path: str) -> None:
+        if kind == "created":
+            if path in self.deleted:
+                self.deleted.discard(path)
+                self.modified.add(path)
+            elif path not in self.modified:
+                self.created.add(path)
+        elif kind == "modified":
+            if path not in self.created:
+                self.modified.add(path)
+        elif kind == "deleted":
+            if path in self.created:
+                self.created.discard(path)
+            else:
+                self.modified.discard(path)
+                self.deleted.add(path)
+        else:
+            raise ValueError(f"Unknown change kind {kind!r}")
+
+    def __bool__(self) -> bool:
+        return bool(self.created or self.modified or self.deleted)
+
+    def as_dict(self) -> dict[str, list[str]]:
+        return {
+            "created": sorted(self.created),
+            "modified": sorted(self.modified),
+            "deleted": sorted(self.deleted),
+        }
+
+
+class WorkspaceWatcher:
+    """Base class: collects a change set between ``begin_turn()`` and ``end_turn()``."""
+
+    # Whether begin_turn()/end_turn() walk the tree (and should run off the event loop)
+    scans = False
+
+    def __init__(self, root: str | Path, ignore: Collection[str] = DEFAULT_IGNORE) -> None:
+        self.root = Path(os.path.realpath(root))
+        self.ignore = frozenset(ignore)
+        self.changes = WorkspaceChanges()
+
+    def start(self) -> None:
+        """Start watching. May run on a worker thread, since it can walk the whole tree."""
+
+    def stop(self) -> None:
+        """Stop watching and release OS resources."""
+
+    def begin_turn(self) -> None:
+        self.changes = WorkspaceChanges()
+
+    def end_turn(self) -> WorkspaceChanges:
+        """Return the changes since ``begin_turn()``."""
+        changes, self.changes = self.changes, WorkspaceChanges()
+        return changes
+
+    def note_write(self, path: str | Path, created: bool) -> None:
+        """Record a write the client made itself (fs/write_text_file)."""
+        relative = self._relative(path)
+        if relative is not None:
+            self.changes.record("created" if created else "modified", relative)
+
+    def _relative(self, path: str | Path) -> str | None:
+        """Workspace-relative POSIX path, or None for paths outside the root or in ignored directories."""
+        try:
+            relative = Path(os.path.realpath(path)).relative_to(self.root)
+        except ValueError:
+            return None
+        if any(part in self.ignore for part in relative.parts):
+            return None
+        return relative.as_posix()
+
+    def _walk(self, directory: Path) -> Iterator[os.DirEntry[str]]:
+        """Every entry under ``directory``, skipping ignored directories and symlinked ones."""
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name in self.ignore:
+                continue
+            yield entry
+            if entry.is_dir(follow_symlinks=False):
+                yield from self._walk(Path(entry.path))
+
+
+class PollingWatcher(WorkspaceWatcher):
+    """Portable fallback: compares (mtime, size) snapshots taken at the start and end of a turn."""
+
+    scans = True
+
+    def __init__(self, root: str | Path, ignore: Collection[str] = DEFAULT_IGNORE) -> None:
+        super().__init__(root, ignore)
+        self._snapshot: dict[str, tuple[int, int]] = {}
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for entry in self._walk(self.root):
+            if entry.is_file(follow_symlinks=False):
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                snapshot[Path(entry.path).relative_to(self.root).as_posix()] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def start(self) -> None:
+        self._snapshot = self._scan()
+
+    def begin_turn(self) -> None:
+        super().begin_turn()
+        self._snapshot = self._scan()
+
+    def end_turn(self) -> WorkspaceChanges:
+        current = self._scan()
+        for path, meta in current.items():
+            before = self._snapshot.get(path)
+            if before is None:
+                self.changes.record("created", path)
+            elif before != meta:
+                self.changes.record("modified", path)
+        for path in self._snapshot.keys() - current.keys():
+            self.changes.record("deleted", path)
+        self._snapshot = current
+        return super().end_turn()
+
+
+class _Inotify:
+    """Minimal ctypes binding for the inotify syscalls."""
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self) -> Iterator[tuple[int, int, str]]:
+        """Yield (wd, mask, name) for every queued event without blocking."""
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                yield wd, mask, name
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class InotifyWatcher(WorkspaceWatcher):
+    """
+    Watches every directory of the workspace with inotify.
+
+    Events are read on ``loop`` (the running loop by default) as they arrive, so the
+    kernel queue does not overflow during long turns. ``stop()`` must be called on
+    that loop.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        ignore: Collection[str] = DEFAULT_IGNORE,
+        loop: asyncio.AbstractEventLoop | None = None,
+    ) -> None:
+        super().__init__(root, ignore)
+        self._inotify: _Inotify | None = None
+        self._dirs: dict[int, Path] = {}  # watch descriptor -> directory
+        # Relative paths of the files under watched directories, to report those of a removed directory
+        self._files: set[str] = set()
+        self._loop = loop
+        self._reading = False
+
+    def start(self) -> None:
+        loop = self._loop or asyncio.get_running_loop()
+        self._loop = loop
+        self._inotify = _Inotify()
+        try:
+            self._watch_tree(self.root)
+        except OSError:
+            self._inotify.close()
+            self._inotify = None
+            self._dirs.clear()
+            self._files.clear()
+            raise
+        # add_reader is not thread-safe; events queue up in the kernel until it runs
+        loop.call_soon_threadsafe(self._start_reading)
+
+    def _start_reading(self) -> None:
+        if self._inotify is not None and self._loop is not None:
+            self._loop.add_reader(self._inotify.fd, self._drain)
+            self._reading = True
+
+    def stop(self) -> None:
+        if self._inotify is None:
+            return
+        if self._reading and self._loop is not None:
+            self._loop.remove_reader(self._inotify.fd)
+            self._reading = False
+        self._inotify.close()
+        self._inotify = None
+        self._dirs.clear()
+        self._files.clear()
+
+    def begin_turn(self) -> None:
+        # Changes made before the turn started belong to no turn
+        self._drain()
+        super().begin_turn()
+
+    def end_turn(self) -> WorkspaceChanges:
+        # Pick up events the kernel queued but the loop has not delivered yet
+        self._drain()
+        return super().end_turn()
+
+    def _watch_tree(self, directory: Path, report: bool = False) -> None:
+        """Watch ``directory`` and its subdirectories; with ``report``, its files count as created."""
+        self._watch_dir(directory)
+        for entry in self._walk(directory):
+            if entry.is_dir(follow_symlinks=False):
+                self._watch_dir(Path(entry.path))
+                continue
+            relative = Path(entry.path).relative_to(self.root).as_posix()
+            self._files.add(relative)
+            if report:
+                self.changes.record("created", relative)
+
+    def _watch_dir(self, directory: Path) -> None:
+        assert self._inotify is not None
+        try:
+            wd = self._inotify.add_watch(directory, _WATCH_MASK)
+        except OSError as exc:
+            if exc.errno in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return  # Gone already, or not ours to watch
+            raise
+        self._dirs[wd] = directory
+
+    def _unwatch_tree(self, directory: Path) -> None:
+        assert self._inotify is not None
+        for wd, path in list(self._dirs.items()):
+            if path == directory or path.is_relative_to(directory):
+                self._inotify.rm_watch(wd)
+                del self._dirs[wd]
+
+    def _drain(self) -> None:
+        if self._inotify is None:
+            return
+        for wd, mask, name in self._inotify.read_events():
+            if mask & _IN_Q_OVERFLOW:
+                self.changes.overflowed = True
+                continue
+            if mask & (_IN_IGNORED | _IN_DELETE_SELF):
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name or name in self.ignore:
+                continue
+            path = directory / name
+            relative = path.relative_to(self.root).as_posix()
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    try:
+                        self._watch_tree(path, report=True)
+                    except OSError:
+                        self.changes.overflowed = True  # Out of watches: changes below are missed
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    self._unwatch_tree(path)
+                    # Files still known under it were moved away with it (or their events were missed)
+                    prefix = f"{relative}/"
+                    for file in [file for file in self._files if file.startswith(prefix)]:
+                        self._files.discard(file)
+                        self.changes.record("deleted", file)
+            elif mask & (_IN_CREATE | _IN_MOVED_TO):
+                self._files.add(relative)
+                self.changes.record("created", relative)
+            elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                self._files.discard(relative)
+                self.changes.record("deleted", relative)
+            elif mask & (_IN_MODIFY | _IN_CLOSE_WRITE):
+                self.changes.record("modified", relative)
+
+
+def watch_workspace(
+    root: str | Path,
+    *,
+    ignore: Collection[str] = DEFAULT_IGNORE,
+    polling: bool = False,
+    loop: asyncio.AbstractEventLoop | None = None,
+) -> WorkspaceWatcher:
+    """
+    Create and start the best available watcher for ``root``.
+
+    Uses inotify on Linux and falls back to polling if it is unavailable or the
+    tree needs more watches than ``fs.inotify.max_user_watches`` allows. Pass the
+    event loop when calling this from another thread.
+    """
+    if not polling and sys.platform.startswith("linux"):
+        watcher: WorkspaceWatcher = InotifyWatcher(root, ignore, loop)
+        try:
+            watcher.start()
+            return watcher
+        except (OSError, AttributeError):
+            pass
+    watcher = PollingWatcher(root, ignore)
+    watcher.start()
+    return watcher
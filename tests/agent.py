@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Scripted ACP agent for the tests.
+
+Every prompt gets a thought chunk and an ``echo: <prompt>`` message, then ends
+with ``end_turn``, unless the prompt contains:
+
+- ``delay=S``: waits S seconds first; a ``session/cancel`` ends the wait
+- ``stream``: streams chunks every few milliseconds until cancelled
+- ``maxtok``: ends with ``max_tokens``
+- ``hang``: sends a message, then never answers and ignores cancels
+
+Arguments after the script path are added to every prompt, so one backend can be
+made slower than another that gets the same prompt.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import sys
+import uuid
+
+from acp import (
+    PROTOCOL_VERSION,
+    AgentSideConnection,
+    session_notification,
+    stdio_streams,
+    update_agent_message_text,
+    update_agent_thought_text,
+)
+from acp.schema import AgentCapabilities, InitializeResponse, NewSessionResponse, PromptResponse
+
+AGENT = __file__
+
+
+class ScriptedAgent:
+    def __init__(self, conn: AgentSideConnection) -> None:
+        self.conn = conn
+        self.cancelled = asyncio.Event()
+
+    async def initialize(self, params):
+        return InitializeResponse(protocolVersion=PROTOCOL_VERSION, agentCapabilities=AgentCapabilities())
+
+    async def newSession(self, params):
+        return NewSessionResponse(sessionId=f"test-{uuid.uuid4().hex[:8]}")
+
+    async def loadSession(self, params):
+        return None
+
+    async def authenticate(self, params):
+        return None
+
+    async def setSessionMode(self, params):
+        return None
+
+    async def setSessionModel(self, params):
+        return None
+
+    async def cancel(self, params):
+        self.cancelled.set()
+
+    async def extMethod(self, method, params):
+        return {}
+
+    async def extNotification(self, method, params):
+        return None
+
+    async def prompt(self, params):
+        session_id = params.sessionId
+        text = " ".join(["".join(getattr(block, "text", "") or "" for block in params.prompt), *sys.argv[1:]])
+        self.cancelled.clear()
+
+        async def send(update):
+            await self.conn.sessionUpdate(session_notification(session_id, update))
+
+        match = re.search(r"delay=([\d.]+)", text)
+        if match:
+            try:
+                await asyncio.wait_for(self.cancelled.wait(), float(match.group(1)))
+                return PromptResponse(stopReason="cancelled")
+            except TimeoutError:
+                pass
+        if "hang" in text:
+            await send(update_agent_message_text("partial"))
+            await asyncio.Event().wait()
+        if "stream" in text:
+            for index in range(100000):
+                if self.cancelled.is_set():
+                    return PromptResponse(stopReason="cancelled")
+                await send(update_agent_message_text(f"tick {index} "))
+                await asyncio.sleep(0.002)
+        await send(update_agent_thought_text("thinking"))
+        await send(update_agent_message_text(f"echo: {text}"))
+        return PromptResponse(stopReason="max_tokens" if "maxtok" in text else "end_turn")
+
+
+async def main() -> None:
+    reader, writer = await stdio_streams()
+    AgentSideConnection(lambda conn: ScriptedAgent(conn), writer, reader)
+    # Exit once the client closes stdin, as real agents do
+    while not reader.at_eof():
+        await asyncio.sleep(0.05)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
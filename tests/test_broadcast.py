@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+
+from simple_acp_client.sdk.broadcast import BroadcastHub, SubscriberLagged
+
+
+async def read(subscription, count):
+    return [await anext(subscription) for _ in range(count)]
+
+
+class BroadcastPolicyTest(unittest.IsolatedAsyncioTestCase):
+    async def test_lag_subscriber_holds_up_publishing(self):
+        hub = BroadcastHub(capacity=2)
+        subscription = hub.subscribe(policy="lag")
+        await hub.publish(0)
+        await hub.publish(1)
+        blocked = asyncio.create_task(hub.publish(2))
+        await asyncio.sleep(0.01)
+        self.assertFalse(blocked.done())
+
+        self.assertEqual(await read(subscription, 1), [0])
+        await asyncio.wait_for(blocked, 1)
+        self.assertEqual(await read(subscription, 2), [1, 2])
+        self.assertEqual(subscription.skipped, 0)
+
+    async def test_closing_a_lag_subscriber_releases_publishing(self):
+        hub = BroadcastHub(capacity=1)
+        subscription = hub.subscribe(policy="lag")
+        await hub.publish(0)
+        blocked = asyncio.create_task(hub.publish(1))
+        await asyncio.sleep(0.01)
+        subscription.close()
+        await asyncio.wait_for(blocked, 1)
+
+    async def test_skip_subscriber_jumps_to_the_oldest_buffered(self):
+        hub = BroadcastHub(capacity=2)
+        subscription = hub.subscribe(policy="skip")
+        for index in range(5):
+            await hub.publish(index)
+        self.assertEqual(await read(subscription, 2), [3, 4])
+        self.assertEqual(subscription.skipped, 3)
+
+    async def test_disconnect_subscriber_raises_once_lapped(self):
+        hub = BroadcastHub(capacity=2)
+        subscription = hub.subscribe(policy="disconnect")
+        for index in range(3):
+            await hub.publish(index)
+        with self.assertRaises(SubscriberLagged) as raised:
+            await anext(subscription)
+        self.assertEqual(raised.exception.missed, 1)
+        self.assertTrue(subscription.closed)
+        self.assertEqual(hub.subscribers, 0)
+
+    async def test_subscribers_share_the_stream_and_end_on_close(self):
+        hub = BroadcastHub(capacity=8)
+        first = hub.subscribe()
+        second = hub.subscribe()
+
+        async def collect(subscription):
+            return [message async for message in subscription]
+
+        readers = [asyncio.create_task(collect(first)), asyncio.create_task(collect(second))]
+        for index in range(3):
+            await hub.publish(index)
+        hub.close()
+        self.assertEqual(await asyncio.gather(*readers), [[0, 1, 2], [0, 1, 2]])
+
+    async def test_replay_positions(self):
+        hub = BroadcastHub(capacity=8)
+        await hub.publish("old")
+        hub.begin_turn()
+        await hub.publish("turn")
+        hub.close()
+        self.assertEqual([m async for m in hub.subscribe(replay="turn")], ["turn"])
+        self.assertEqual([m async for m in hub.subscribe(replay="oldest")], ["old", "turn"])
+        self.assertEqual([m async for m in hub.subscribe(replay="latest")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import sys
+import unittest
+
+from simple_acp_client import PyACPAgentOptions, PyACPSDKClient
+from simple_acp_client.fanout import FanOut
+from tests.agent import AGENT
+
+
+class FanOutTest(unittest.IsolatedAsyncioTestCase):
+    async def connect(self, *args, interrupt_grace=5.0):
+        client = PyACPSDKClient(PyACPAgentOptions(interrupt_grace=interrupt_grace))
+        await client.connect([sys.executable, AGENT, *args])
+        self.addAsyncCleanup(client.disconnect)
+        return client
+
+    async def test_first_interrupts_the_slow_backend(self):
+        fan = FanOut({"slow": await self.connect("delay=5"), "fast": await self.connect()})
+        outcome = await fan.query("hi", "first")
+        self.assertEqual(outcome.winner, "fast")
+        self.assertEqual(outcome.result.result, "echo: hi")
+        self.assertEqual(outcome.backends["slow"].status, "interrupted")
+
+        # The interrupt ends the slow turn long before its delay
+        await asyncio.wait_for(fan.drain(), 2)
+        # Both backends take the next prompt
+        again = await fan.query("again", "first")
+        self.assertEqual(again.result.result, "echo: again")
+        self.assertEqual(again.backends["slow"].status, "interrupted")
+        await asyncio.wait_for(fan.drain(), 2)
+
+    async def test_hedge_uses_only_the_primary_when_it_is_fast(self):
+        fan = FanOut({"primary": await self.connect(), "backup": await self.connect()}, hedge_delay=1.0)
+        outcome = await fan.query("hi", "hedge")
+        self.assertEqual(outcome.winner, "primary")
+        self.assertEqual(outcome.backends["backup"].status, "not_started")
+
+    async def test_hedge_starts_the_backup_after_the_delay(self):
+        fan = FanOut({"primary": await self.connect("delay=5"), "backup": await self.connect()}, hedge_delay=0.2)
+        outcome = await fan.query("hi", "hedge")
+        self.assertEqual(outcome.winner, "backup")
+        self.assertGreaterEqual(outcome.backends["backup"].started_at, 0.2)
+        self.assertEqual(outcome.backends["primary"].status, "interrupted")
+        await asyncio.wait_for(fan.drain(), 2)
+
+    async def test_a_loser_that_ignores_the_interrupt_is_cancelled(self):
+        fan = FanOut({"hang": await self.connect("hang", interrupt_grace=0.2), "fast": await self.connect()})
+        outcome = await fan.query("hi", "first")
+        self.assertEqual(outcome.winner, "fast")
+        snapshot = outcome.backends["hang"]
+        self.assertEqual(snapshot.status, "interrupted")
+        self.assertIsNone(snapshot.result)
+
+        # Interrupt, then cancel(), then replacing the agent process: bounded by the grace periods
+        await asyncio.wait_for(fan.drain(), 5)
+        self.assertIsNone(snapshot.result)
+
+    async def test_timeout_without_a_winner(self):
+        fan = FanOut({"slow": await self.connect("delay=5")})
+        outcome = await fan.query("hi", "first", timeout=0.2)
+        self.assertIsNone(outcome.winner)
+        self.assertEqual(outcome.backends["slow"].status, "interrupted")
+        await asyncio.wait_for(fan.drain(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import asyncio
+import sys
+import unittest
+
+from simple_acp_client import PyACPAgentOptions, ResultMessage
+from simple_acp_client.sdk.turns import TurnTimeoutError
+from simple_acp_client.supervisor import AgentSupervisor
+from tests.agent import AGENT
+
+
+class SupervisorResultMappingTest(unittest.IsolatedAsyncioTestCase):
+    async def test_each_turn_gets_its_own_result(self):
+        async with AgentSupervisor(workers=1) as supervisor:
+            client = supervisor.client(
+                PyACPAgentOptions(turn_timeout=1.0, interrupt_grace=0.2), [sys.executable, AGENT]
+            )
+            await client.connect()
+            results = []
+            turns = []
+            for prompt in ("one", "hang", "maxtok"):
+                turn = await client.query(prompt)
+                messages = [message async for message in client.receive_messages()]
+                await asyncio.wait([turn.future])
+                results.append(messages[-1])
+                turns.append(turn)
+            await client.disconnect()
+
+        self.assertTrue(all(isinstance(result, ResultMessage) for result in results))
+        self.assertEqual((turns[0].stop_reason, results[0].stop_reason), ("end_turn", "end_turn"))
+        self.assertFalse(results[0].is_error)
+        self.assertIsInstance(turns[1].error, TurnTimeoutError)
+        self.assertEqual(results[1].subtype, "error_timeout")
+        self.assertTrue(results[1].is_error)
+        self.assertEqual((turns[2].stop_reason, results[2].stop_reason), ("max_tokens", "max_tokens"))
+
+    async def test_queued_turns_are_delivered_in_order(self):
+        async with AgentSupervisor(workers=1) as supervisor:
+            client = supervisor.client(PyACPAgentOptions(), [sys.executable, AGENT])
+            await client.connect()
+            turns = [await client.query(f"turn {index}") for index in range(3)]
+            texts = []
+            for _ in turns:
+                messages = [message async for message in client.receive_messages()]
+                texts.append(messages[-1].result)
+            await client.disconnect()
+        self.assertEqual(texts, [f"echo: turn {index}" for index in range(3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from simple_acp_client import PyACPAgentOptions, PyACPSDKClient, ResultMessage, TextBlock, TranscriptStore
+from tests.agent import AGENT
+
+
+def result(stop_reason="end_turn"):
+    return ResultMessage(
+        subtype="final", duration_ms=1, duration_api_ms=1, is_error=False, num_turns=1,
+        session_id="s", stop_reason=stop_reason,
+    )
+
+
+def record(store, turn_id, text):
+    store.append("s", turn_id, TextBlock(text))
+    store.end_turn("s", turn_id, result())
+
+
+class TranscriptRenumberingTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "transcript.db"
+
+    def stored(self, store):
+        return [(entry.turn_id, entry.data["text"]) for entry in store.messages("s", kinds={"TextBlock"})]
+
+    def test_turn_ids_restarting_in_a_reopened_store(self):
+        with TranscriptStore(self.path) as store:
+            record(store, 1, "first")
+            record(store, 2, "second")
+        # A reloaded session counts its turns from 1 again
+        with TranscriptStore(self.path) as store:
+            record(store, 1, "third")
+            self.assertEqual(self.stored(store), [(1, "first"), (2, "second"), (3, "third")])
+            self.assertEqual([turn.turn_id for turn in store.turns("s")], [3, 2, 1])
+
+    def test_turn_ids_restarting_in_the_same_store(self):
+        with TranscriptStore(self.path) as store:
+            record(store, 1, "first")
+            record(store, 1, "again")
+            record(store, 5, "later")
+            self.assertEqual(self.stored(store), [(1, "first"), (2, "again"), (5, "later")])
+
+    def test_messages_and_summary_share_the_stored_id(self):
+        with TranscriptStore(self.path, batch_size=1) as store:
+            record(store, 3, "first")
+            store.append("s", 1, TextBlock("restarted"))
+            store.flush()
+            store.end_turn("s", 1, result("max_tokens"))
+            self.assertEqual(self.stored(store), [(3, "first"), (4, "restarted")])
+            self.assertEqual(store.turns("s")[0].stop_reason, "max_tokens")
+            self.assertEqual(store.turns("s")[0].turn_id, 4)
+
+
+class TranscriptClientTest(unittest.IsolatedAsyncioTestCase):
+    async def test_turns_are_recorded_without_being_read(self):
+        store = TranscriptStore(":memory:")
+        self.addCleanup(store.close)
+        client = PyACPSDKClient(PyACPAgentOptions(transcript=store))
+        await client.connect([sys.executable, AGENT])
+        try:
+            session_id = client._session_id
+            await (await client.query("unread"))
+            await client.query("stream")
+            await asyncio.sleep(0.2)
+            await client.cancel()
+        finally:
+            await client.disconnect()
+
+        turns = store.turns(session_id)
+        self.assertEqual([(turn.turn_id, turn.stop_reason) for turn in turns], [(2, "cancelled"), (1, "end_turn")])
+        self.assertEqual(turns[1].prompt, [{"type": "text", "text": "unread"}])
+        texts = [entry.data["text"] for entry in store.messages(session_id, turn_id=1, kinds={"TextBlock"})]
+        self.assertEqual(texts, ["echo: unread"])
+
+
+if __name__ == "__main__":
+    unittest.main()
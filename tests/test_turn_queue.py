@@ -0,0 +1,79 @@
+import asyncio
+import sys
+import unittest
+
+from simple_acp_client import EndOfTurnMessage, PyACPAgentOptions, PyACPSDKClient, ResultMessage, TextBlock
+from simple_acp_client.sdk.client import _TurnQueue
+from tests.agent import AGENT
+
+
+class TurnQueueFenceTest(unittest.TestCase):
+    def drain(self, queue):
+        items = []
+        while not queue.empty():
+            items.append(queue.get_nowait())
+        return items
+
+    def test_messages_of_a_fenced_turn_are_dropped(self):
+        queue = _TurnQueue()
+        queue.turn_id = 1
+        queue.put_nowait(TextBlock("before"))
+        queue.fence = 1
+        queue.put_nowait(TextBlock("after"))
+        end = EndOfTurnMessage(turn_id=1)
+        queue.put_nowait(end)
+        items = self.drain(queue)
+        self.assertEqual([(turn_id, getattr(message, "text", message)) for turn_id, message in items], [(1, "before"), (1, end)])
+
+    def test_purge_keeps_later_turns(self):
+        queue = _TurnQueue()
+        queue.turn_id = 1
+        queue.put_nowait(TextBlock("old"))
+        queue.turn_id = 2
+        queue.put_nowait(TextBlock("new"))
+        queue.fence = 1
+        queue.purge()
+        self.assertEqual([(turn_id, message.text) for turn_id, message in self.drain(queue)], [(2, "new")])
+
+
+class CancelTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = PyACPSDKClient(PyACPAgentOptions(interrupt_grace=1.0))
+        await self.client.connect([sys.executable, AGENT])
+
+    async def asyncTearDown(self):
+        await self.client.disconnect()
+
+    async def test_cancel_unread_turn_then_query_again(self):
+        turn = await self.client.query("stream")
+        await asyncio.sleep(0.2)
+        self.assertEqual(await self.client.cancel(), "cancelled")
+        self.assertEqual(turn.stop_reason, "cancelled")
+
+        await self.client.query("after")
+        messages = [message async for message in self.client.receive_messages()]
+        text = "".join(message.text for message in messages if isinstance(message, TextBlock))
+        self.assertEqual(text, "echo: after")
+        self.assertEqual(messages[-1].stop_reason, "end_turn")
+
+    async def test_cancel_ends_a_turn_being_read(self):
+        await self.client.query("stream")
+        messages = []
+
+        async def read():
+            async for message in self.client.receive_messages():
+                messages.append(message)
+
+        reader = asyncio.create_task(read())
+        await asyncio.sleep(0.2)
+        self.assertEqual(await self.client.cancel(), "cancelled")
+        await asyncio.wait_for(reader, 5)
+        self.assertIsInstance(messages[-1], ResultMessage)
+        self.assertEqual(messages[-1].stop_reason, "cancelled")
+
+    async def test_cancel_without_a_turn(self):
+        self.assertIsNone(await self.client.cancel())
+
+
+if __name__ == "__main__":
+    unittest.main()